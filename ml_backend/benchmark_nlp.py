@@ -0,0 +1,140 @@
+"""
+NLP Benchmarks
+Micro-benchmarks for the voice-search request path
+
+Run: python benchmark_nlp.py
+"""
+
+import json
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+from nlp_ner import QueryAnalyzer
+
+
+VOICE_QUERIES = [
+    "phim hành động hay nhất 2023",
+    "tìm phim của đạo diễn christopher nolan",
+    "phim kinh dị mới nhất",
+    "best horror movies from 2010 to 2020",
+    "tom cruise action movies",
+    "phim hoạt hình cho trẻ em",
+    "phim tình cảm hàn quốc",
+    "top 10 phim hay nhất mọi thời đại",
+]
+
+
+def time_per_call(func: Callable[[str], object], queries: List[str], repeat: int = 200) -> float:
+    """Average microseconds per call over repeat passes of the queries"""
+    for query in queries:
+        func(query)  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for query in queries:
+            func(query)
+    return (time.perf_counter() - start) / (repeat * len(queries)) * 1e6
+
+
+def previous_search_features(extractor, text: str) -> Dict[str, object]:
+    """extract_search_features as it was before features were lazy: two preprocessing passes, every feature"""
+    tokens = extractor.preprocessor.preprocess(text, remove_stopwords=False)
+    clean_tokens = extractor.preprocessor.preprocess(text, remove_stopwords=True)
+    entities = extractor.entity_recognizer.extract_entities(text)
+    year_min, year_max = extractor.entity_recognizer.extract_year_range(text)
+    return {
+        'original_text': text,
+        'tokens': tokens,
+        'clean_tokens': clean_tokens,
+        'bigrams': extractor.preprocessor.extract_ngrams(tokens, n=2),
+        'trigrams': extractor.preprocessor.extract_ngrams(tokens, n=3),
+        'word_frequency': extractor.preprocessor.get_word_frequency(clean_tokens),
+        'entities': entities,
+        'year_range': {'min': year_min, 'max': year_max},
+        'has_genre': len(entities['genres']) > 0,
+        'has_year': len(entities['years']) > 0,
+        'has_person': len(entities['people']) > 0,
+        'has_time_expression': len(entities['time_expressions']) > 0,
+        'has_rating_expression': len(entities['rating_expressions']) > 0,
+        'has_popularity_expression': len(entities['popularity_expressions']) > 0,
+        'token_count': len(tokens),
+        'unique_token_count': len(set(tokens)),
+    }
+
+
+def benchmark_search_features(repeat: int = 200) -> Dict[str, float]:
+    """Per-request analyze_query cost with the previous eager features versus features read on demand"""
+    analyzer = QueryAnalyzer()
+    extractor = analyzer.feature_extractor
+
+    extractor.extract_search_features = lambda text: previous_search_features(extractor, text)
+    previous_us = time_per_call(analyzer.analyze_query, VOICE_QUERIES, repeat)
+    del extractor.extract_search_features
+
+    lazy_us = time_per_call(analyzer.analyze_query, VOICE_QUERIES, repeat)
+    return {
+        'analyze_previous_us': previous_us,
+        'analyze_on_demand_us': lazy_us,
+        'saved_us': previous_us - lazy_us,
+    }
+
+
+# Service components built the way lifespan used to, each with private dependencies
+_SEPARATE_STARTUP = """
+from nlp_preprocessing import NLPPreprocessor
+from nlp_intent_classifier import IntentClassifier
+from nlp_ner import QueryAnalyzer, SemanticMatcher
+from nlp_semantic_similarity import SemanticSimilarityCalculator, FuzzyMatcher
+from nlp_query_expansion import NLPQueryProcessor
+components = [NLPPreprocessor(), IntentClassifier(), QueryAnalyzer(), SemanticMatcher(),
+              SemanticSimilarityCalculator(), FuzzyMatcher(), NLPQueryProcessor()]
+"""
+
+# The same components from the shared registry
+_REGISTRY_STARTUP = """
+from nlp_components import default_registry
+registry = default_registry()
+components = [registry.get(name) for name in ('preprocessor', 'intent_classifier', 'query_analyzer',
+              'semantic_matcher', 'similarity_calculator', 'fuzzy_matcher', 'query_processor')]
+"""
+
+_MEASURE_STARTUP = """
+import json, time
+from nlp_components import peak_rss_mb
+rss_before = peak_rss_mb()
+start = time.perf_counter()
+exec(STARTUP)
+seconds = time.perf_counter() - start
+rss = peak_rss_mb()
+print(json.dumps({'seconds': seconds, 'rss_mb': rss, 'rss_growth_mb': None if rss is None else rss - rss_before}))
+"""
+
+
+def measure_startup(startup: str) -> Dict[str, float]:
+    """Construction time and peak RSS of a startup snippet in a fresh interpreter (imports excluded)"""
+    # Import the modules first so only construction is timed
+    imports = '\n'.join(line for line in startup.splitlines() if line.startswith('from '))
+    script = imports + '\n' + _MEASURE_STARTUP.replace('STARTUP', repr(startup))
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def benchmark_startup() -> Dict[str, Dict[str, float]]:
+    """Service component construction with separate instances versus the shared registry"""
+    return {
+        'separate_instances': measure_startup(_SEPARATE_STARTUP),
+        'shared_registry': measure_startup(_REGISTRY_STARTUP),
+    }
+
+
+if __name__ == "__main__":
+    print("Search features (voice-search path)")
+    results = benchmark_search_features()
+    for name, value in results.items():
+        print(f"  {name:28} {value:8.1f}")
+
+    print("\nService startup (component construction)")
+    for name, result in benchmark_startup().items():
+        rss = "n/a" if result['rss_mb'] is None else f"{result['rss_mb']:.1f} MB (+{result['rss_growth_mb']:.1f} MB)"
+        print(f"  {name:28} {result['seconds'] * 1000:8.1f} ms   peak RSS {rss}")
@@ -14,6 +14,11 @@ import warnings
 from typing import List, Dict, Tuple, Optional
 from pathlib import Path
 
+from nlp_catalog_index import CatalogIndex
+from nlp_autocomplete import TitleTypeahead
+from nlp_query_expansion import create_translator
+from nlp_language import LanguageDetector
+
 warnings.filterwarnings('ignore')
 
 # Import libraries for Tang 1 (BiLSTM + Attention)
@@ -40,13 +45,6 @@ except ImportError:
     SENTENCE_TRANSFORMERS_AVAILABLE = False
     print("⚠️ sentence-transformers not available. SBERT features will be disabled.")
 
-try:
-    from googletrans import Translator
-    TRANSLATOR_AVAILABLE = True
-except ImportError:
-    TRANSLATOR_AVAILABLE = False
-    print("⚠️ googletrans not available. Translation will be disabled.")
-
 
 # ==============================
 # Helper Functions
@@ -105,7 +103,7 @@ class HybridSearchEngine:
     - Tang 2: Hybrid search (TF-IDF + SBERT)
     """
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", translator=None, language_detector=None):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
         
@@ -118,22 +116,23 @@ class HybridSearchEngine:
         self.intent_classifier = None
         self.tokenizer = None
         self.translator = None
+        self.catalog_index = None
+        self.title_typeahead = None
         
         # Configuration
         self.MAX_VOCAB_SIZE = 10000
         self.MAX_LEN = 30
         self.EMBEDDING_DIM = 128
+        self.PERSON_BOOST = 0.1  # added to movies featuring a person the query only sounds like
         
         # Device
         self.device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
         print(f"🔧 Using device: {self.device}")
         
-        # Initialize translator
-        if TRANSLATOR_AVAILABLE:
-            try:
-                self.translator = Translator()
-            except:
-                self.translator = None
+        # Initialize translator (offline phrase table unless TRANSLATION_BACKEND=google);
+        # the NLP service passes the one its query translator uses
+        self.translator = translator or create_translator()
+        self.language_detector = language_detector or LanguageDetector()
     
     def load_dataset(self, dataset_path: Optional[str] = None):
         """Load movie dataset"""
@@ -154,6 +153,11 @@ class HybridSearchEngine:
         self.df['genres'] = self.df['genres'].fillna("")
         self.df = self.df.dropna(subset=['movie_title', 'movie_info']).reset_index(drop=True)
         
+        # The filter index reads the comma-separated genre and people lists, so build it before cleaning
+        self.catalog_index = CatalogIndex.from_dataframe(self.df)
+        # Typeahead shows the titles as written, ranked by tmdb_popularity
+        self.title_typeahead = TitleTypeahead.from_dataframe(self.df)
+        
         # Clean text fields
         print("🧹 Cleaning data...")
         self.df['movie_title'] = self.df['movie_title'].apply(clean_text)
@@ -279,12 +283,7 @@ class HybridSearchEngine:
             translated_texts = []
             for text in manual_df['text_original']:
                 try:
-                    if self.translator.detect(text).lang != 'en':
-                        translated_texts.append(
-                            self.translator.translate(text, dest='en').text
-                        )
-                    else:
-                        translated_texts.append(text)
+                    translated_texts.append(self.translator.translate(text))
                 except:
                     translated_texts.append(text)
             manual_df['text'] = [clean_text(t) for t in translated_texts]
@@ -373,23 +372,47 @@ class HybridSearchEngine:
         # For now, we'll need to retrain or save tokenizer separately
         print("⚠️ Note: Tokenizer needs to be rebuilt. Please ensure training data is available.")
     
-    def search_hybrid(self, query: str, top_k: int = 5) -> List[Dict]:
+    def search_hybrid(self, query: str, top_k: int = 5, search_parameters: Optional[Dict] = None) -> List[Dict]:
         """
         Hybrid search with BiLSTM intent classification
         
         Returns:
             List of movie results with scores
         """
+        return self.search_with_facets(query, top_k, search_parameters)['results']
+    
+    def search_with_facets(self, query: str, top_k: int = 5, search_parameters: Optional[Dict] = None) -> Dict:
+        """
+        Hybrid search restricted to the movies matching QueryAnalyzer search_parameters
+        
+        Genre, year and people filters select the candidates before any
+        scoring; people only guessed from how the query sounds raise the
+        score of their movies instead. The hybrid score picks the top_k
+        candidates; a sort_by the catalog supports then orders them instead
+        of the score.
+        
+        Returns:
+            Dict with results, the number of matching movies and genre/year facets
+        """
         start_time = time.time()
         
-        # Step 1: Translate if needed
+        # Step 0: Structured filters
+        search_parameters = search_parameters or {}
+        candidates = facets = None
+        if self.catalog_index is not None:
+            bitmap = self.catalog_index.filter(search_parameters)
+            facets = self.catalog_index.facets(bitmap)
+            candidates = self.catalog_index.rows(bitmap)
+        
+        if candidates is not None and len(candidates) == 0:
+            return {'results': [], 'total': 0, 'facets': facets}
+        
+        # Step 1: Translate if needed (English queries are detected locally and kept)
         query_to_search = query
-        if self.translator:
+        if self.translator and self.language_detector.detect(query) != 'en':
             try:
-                detected_lang = self.translator.detect(query).lang.lower()
-                if detected_lang != 'en':
-                    translated = self.translator.translate(query, dest='en')
-                    query_to_search = translated.text
+                query_to_search = self.translator.translate(query)
+                if query_to_search != query:
                     print(f"🌐 Translated: '{query}' -> '{query_to_search}'")
             except Exception as e:
                 print(f"⚠️ Translation error: {e}")
@@ -423,28 +446,42 @@ class HybridSearchEngine:
         # Step 3: Calculate scores (Tang 2)
         results = []
         
+        # Only the candidate rows are scored
+        rows = np.arange(len(self.df)) if candidates is None else candidates
+        
         if self.sbert_model and self.movie_embeddings is not None:
             query_emb = self.sbert_model.encode(query_to_search, convert_to_tensor=True)
-            sbert_scores = util.cos_sim(query_emb, self.movie_embeddings)[0]
+            embeddings = self.movie_embeddings if candidates is None else self.movie_embeddings[torch.from_numpy(rows).to(self.device)]
+            sbert_scores = util.cos_sim(query_emb, embeddings)[0]
             sbert_scores = sbert_scores.cpu()
         else:
-            sbert_scores = torch.zeros(len(self.df))
+            sbert_scores = torch.zeros(len(rows))
         
         if self.tfidf_vectorizer and self.tfidf_matrix is not None:
             query_clean = clean_text(query_to_search)
             query_vec = self.tfidf_vectorizer.transform([query_clean])
-            tfidf_scores = cosine_similarity(query_vec, self.tfidf_matrix).flatten()
+            matrix = self.tfidf_matrix if candidates is None else self.tfidf_matrix[rows]
+            tfidf_scores = cosine_similarity(query_vec, matrix).flatten()
             tfidf_scores_tensor = torch.from_numpy(tfidf_scores).float()
         else:
-            tfidf_scores_tensor = torch.zeros(len(self.df))
+            tfidf_scores_tensor = torch.zeros(len(rows))
         
-        # Step 4: Combine scores
+        # Step 4: Combine scores (the best candidates are then put in sort_by order)
         final_scores = (alpha * sbert_scores) + ((1 - alpha) * tfidf_scores_tensor)
-        top_results = torch.topk(final_scores, k=min(top_k, len(self.df)))
+        if self.catalog_index is not None:
+            boosted = self.catalog_index.people_bitmap(search_parameters.get('boost_people') or [])
+            if boosted is not None:
+                featured = torch.from_numpy(self.catalog_index.mask_from_bitmap(boosted)[rows]).float()
+                final_scores = final_scores + self.PERSON_BOOST * featured
+            positions = self.catalog_index.top_positions(
+                rows, final_scores.numpy(), top_k, search_parameters.get('sort_by'))
+            top_results = final_scores[torch.from_numpy(positions)], torch.from_numpy(positions)
+        else:
+            top_results = torch.topk(final_scores, k=min(top_k, len(rows)))
         
         # Step 5: Format results
-        for score, idx in zip(top_results.values, top_results.indices):
-            movie = self.df.iloc[idx.item()]
+        for score, idx in zip(*top_results):
+            movie = self.df.iloc[int(rows[idx.item()])]
             results.append({
                 'movie_title': movie['movie_title'],
                 'genres': movie['genres'],
@@ -458,7 +495,11 @@ class HybridSearchEngine:
         elapsed_time = (time.time() - start_time) * 1000
         print(f"⏱️ Search completed in {elapsed_time:.2f}ms")
         
-        return results
+        return {
+            'results': results,
+            'total': len(self.df) if facets is None else facets['total'],
+            'facets': facets
+        }
 
 
 
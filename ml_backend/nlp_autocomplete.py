@@ -0,0 +1,283 @@
+"""
+Autocomplete Module
+Prefix trie whose nodes keep their top-k completions, so a suggestion lookup
+costs one step per typed character whatever the size of the query history,
+and a typeahead over catalog titles that tolerates one typing error
+"""
+
+import re
+import heapq
+import bisect
+import threading
+import unicodedata
+from collections import Counter
+from typing import List, Dict, Tuple, Iterable, Iterator, Sequence, Set, Any, Optional
+
+from nlp_language import strip_accents
+from nlp_gazetteer import normalize_name
+
+
+# Sorts after every character a title key can contain
+_KEY_END = '\U0010ffff'
+# Shorter prefixes are completed exactly: one edit in two letters matches almost anything
+MIN_FUZZY_PREFIX = 3
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase NFC text with runs of whitespace collapsed"""
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', query.lower())).strip()
+
+
+class _TrieNode:
+    __slots__ = ('children', 'top')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.top: List[str] = []  # best completions below this node, highest score first
+
+
+class CompletionTrie:
+    """Queries by character, each node holding the top_k best completions under it
+
+    Scores may only go up (counts, or forward-decayed popularity); an update
+    re-ranks the top lists along one path. Accented queries are also reachable
+    without accents. Writers hold a lock and replace top lists instead of
+    changing them in place, so lookups need no lock.
+    """
+
+    def __init__(self, top_k: int = 10):
+        self.top_k = top_k
+        self.root = _TrieNode()
+        self.scores: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, scored_queries: Iterable[Tuple[str, float]], top_k: int = 10) -> 'CompletionTrie':
+        trie = cls(top_k)
+        for query, score in scored_queries:
+            trie.update(query, score)
+        return trie
+
+    def add(self, query: str, count: float = 1.0) -> float:
+        """Raise the score of query by count and return the new score"""
+        query = normalize_query(query)
+        if not query:
+            return 0.0
+        with self._lock:
+            score = self.scores.get(query, 0.0) + count
+            self._update(query, score)
+        return score
+
+    def update(self, query: str, score: float):
+        """Set the score of query; it must not be lower than the current one"""
+        query = normalize_query(query)
+        if query:
+            with self._lock:
+                self._update(query, max(score, self.scores.get(query, score)))
+
+    def _update(self, query: str, score: float):
+        self.scores[query] = score
+        keys = {query, strip_accents(query)}
+        visited = set()
+        for key in keys:
+            node = self.root
+            for char in key:
+                node = node.children.setdefault(char, _TrieNode())
+                if id(node) not in visited:
+                    visited.add(id(node))
+                    node.top = self._ranked(node.top, query)
+
+    def _ranked(self, top: List[str], query: str) -> List[str]:
+        if query not in top:
+            if len(top) >= self.top_k and self.scores[top[-1]] >= self.scores[query]:
+                return top
+            top = top + [query]
+        # Stable sort: among equal scores the earlier query stays first
+        return sorted(top, key=lambda completion: -self.scores[completion])[:self.top_k]
+
+    def complete(self, prefix: str, limit: int = 5) -> List[str]:
+        """Up to limit completions of prefix, best first"""
+        node = self.root
+        for char in normalize_query(prefix):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.top[:limit]
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+    def __contains__(self, query: str) -> bool:
+        return normalize_query(query) in self.scores
+
+
+def title_key(text: str) -> str:
+    """Lowercase title without punctuation or accents; a trailing space is kept for prefixes"""
+    key = strip_accents(normalize_name(text))
+    return key + ' ' if key and text[-1:].isspace() else key
+
+
+class TitleTypeahead:
+    """Catalog titles completed from a prefix that may contain one typing error
+
+    Title keys are kept in one sorted list, so a prefix is a bisected range
+    and the letters that can follow a prefix are found by jumping across
+    that range. Prefixes shared by more than scan_limit titles keep their
+    top_k most popular titles, precomputed; smaller ranges are scanned.
+    Exact completions come first, then completions of prefixes one edit
+    away (deletion, insertion, substitution or swap of adjacent letters),
+    each group by popularity.
+    """
+
+    def __init__(self, titles: Sequence[str], popularity: Sequence[float],
+                 years: Optional[Sequence[Optional[int]]] = None, top_k: int = 10, scan_limit: int = 64):
+        self.top_k = top_k
+        self.scan_limit = scan_limit
+
+        entries = [(title_key(title), row) for row, title in enumerate(titles) if isinstance(title, str)]
+        entries = [(key, row) for key, row in entries if key]
+        entries.sort()
+        self.keys: List[str] = [key for key, _ in entries]
+        self.rows: List[int] = [row for _, row in entries]
+        self.titles: List[str] = [titles[row] for row in self.rows]
+        self.popularity: List[float] = [
+            float(popularity[row]) if popularity[row] == popularity[row] else 0.0  # NaN -> 0
+            for row in self.rows
+        ]
+        self.years: List[Optional[int]] = [years[row] for row in self.rows] if years is not None else [None] * len(self.rows)
+        self.heavy: Dict[str, List[int]] = self._precompute_heavy_prefixes()
+
+    @classmethod
+    def from_dataframe(cls, df, **kwargs) -> 'TitleTypeahead':
+        """Index movie_title, ranked by tmdb_popularity, with the year of original_release_date if present"""
+        import pandas as pd
+
+        titles = df['movie_title'].tolist()
+        if 'tmdb_popularity' in df.columns:
+            popularity = pd.to_numeric(df['tmdb_popularity'], errors='coerce').fillna(0.0).tolist()
+        else:
+            popularity = [0.0] * len(titles)
+        years = None
+        if 'original_release_date' in df.columns:
+            dates = pd.to_datetime(df['original_release_date'], errors='coerce')
+            years = [None if pd.isna(year) else int(year) for year in dates.dt.year]
+        return cls(titles, popularity, years, **kwargs)
+
+    def _precompute_heavy_prefixes(self) -> Dict[str, List[int]]:
+        by_popularity = sorted(range(len(self.keys)), key=lambda position: -self.popularity[position])
+        heavy = {}
+        depth = 1
+        while True:
+            counts = Counter(key[:depth] for key in self.keys if len(key) >= depth)
+            prefixes = {prefix for prefix, count in counts.items() if count > self.scan_limit}
+            if not prefixes:
+                return heavy
+            for prefix in prefixes:
+                heavy[prefix] = []
+            for position in by_popularity:
+                top = heavy.get(self.keys[position][:depth]) if len(self.keys[position]) >= depth else None
+                if top is not None and len(top) < self.top_k:
+                    top.append(position)
+            depth += 1
+
+    def _range(self, prefix: str, lo: int = 0, hi: Optional[int] = None) -> Tuple[int, int]:
+        hi = len(self.keys) if hi is None else hi
+        start = bisect.bisect_left(self.keys, prefix, lo, hi)
+        return start, bisect.bisect_left(self.keys, prefix + _KEY_END, start, hi)
+
+    def _top(self, prefix: str) -> List[int]:
+        """Positions of the most popular titles starting with prefix"""
+        if prefix in self.heavy:
+            return self.heavy[prefix]
+        lo, hi = self._range(prefix)
+        return heapq.nlargest(self.top_k, range(lo, hi), key=self.popularity.__getitem__)
+
+    def _next_chars(self, prefix: str, lo: int, hi: int) -> Iterator[str]:
+        """Distinct letters following prefix in keys[lo:hi], which all start with it"""
+        depth = len(prefix)
+        while lo < hi:
+            key = self.keys[lo]
+            if len(key) == depth:
+                lo += 1
+                continue
+            char = key[depth]
+            yield char
+            lo = bisect.bisect_left(self.keys, prefix + char + _KEY_END, lo, hi)
+
+    def fuzzy_prefixes(self, prefix: str) -> Set[str]:
+        """Title prefixes one edit away from prefix"""
+        variants = set()
+        lo, hi = 0, len(self.keys)
+        for i in range(len(prefix)):
+            head, rest = prefix[:i], prefix[i:]
+            lo, hi = self._range(head, lo, hi)
+            if lo == hi:
+                break
+            variants.add(head + rest[1:])
+            if len(rest) > 1:
+                variants.add(head + rest[1] + rest[0] + rest[2:])
+            for char in self._next_chars(head, lo, hi):
+                if char != rest[0]:
+                    variants.add(head + char + rest[1:])
+                variants.add(head + char + rest)
+        variants.discard(prefix)
+        return {variant for variant in variants if variant and self._exists(variant)}
+
+    def _exists(self, prefix: str) -> bool:
+        position = bisect.bisect_left(self.keys, prefix)
+        return position < len(self.keys) and self.keys[position].startswith(prefix)
+
+    def suggest(self, text: str, limit: int = 5, fuzzy: bool = True) -> List[Dict[str, Any]]:
+        """Up to limit titles completing text, exact completions first, each group by popularity"""
+        prefix = title_key(text)
+        if not prefix:
+            return []
+
+        positions = self._top(prefix)[:limit]
+        exact = len(positions)
+        if fuzzy and len(positions) < limit and len(prefix) >= MIN_FUZZY_PREFIX:
+            candidates = {position for variant in self.fuzzy_prefixes(prefix) for position in self._top(variant)}
+            candidates.difference_update(positions)
+            positions = positions + heapq.nlargest(limit - exact, candidates,
+                                                   key=lambda position: (self.popularity[position], -position))
+
+        return [
+            {
+                'title': self.titles[position],
+                'year': self.years[position],
+                'popularity': self.popularity[position],
+                'exact': rank < exact,
+            }
+            for rank, position in enumerate(positions)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+# Example usage
+if __name__ == "__main__":
+    import time
+    import random
+
+    trie = CompletionTrie()
+    for query in ['action movies 2024', 'avatar', 'avengers endgame', 'phim hành động', 'phim hài']:
+        trie.add(query)
+    trie.add('avengers endgame', 3)
+
+    for prefix in ['a', 'av', 'phim h', 'phim ha', 'x']:
+        print(f"{prefix!r:12} -> {trie.complete(prefix)}")
+
+    random.seed(0)
+    words = ['action', 'comedy', 'horror', 'movie', 'best', 'new', 'avatar', 'batman', 'love', 'war']
+    for _ in range(100_000):
+        trie.add(' '.join(random.choices(words, k=3)), random.random())
+    start = time.perf_counter()
+    for _ in range(10_000):
+        trie.complete('best act')
+    print(f"✅ {len(trie)} queries, {(time.perf_counter() - start) / 10_000 * 1e6:.1f}µs per lookup")
+
+    typeahead = TitleTypeahead(['Avatar', 'Avatar: The Way of Water', 'The Avengers', 'Amélie', 'The Dark Knight'],
+                               [120.5, 300.2, 95.0, 20.1, 80.7])
+    for text in ['ava', 'avatr', 'the avn', 'ame', 'the dark knigt']:
+        print(f"{text!r:16} -> {[suggestion['title'] for suggestion in typeahead.suggest(text)]}")
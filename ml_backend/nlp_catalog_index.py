@@ -0,0 +1,293 @@
+"""
+Catalog Filter Index Module
+Per-genre and per-year bitmaps, sorted year/rating/popularity permutations and
+person posting lists for applying QueryAnalyzer search parameters to the catalog
+"""
+
+from typing import List, Dict, Any, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from nlp_gazetteer import normalize_name
+
+
+# Query genres that the catalog labels under another word
+# ('science fiction & fantasy', 'mystery & suspense', 'musical & performing arts')
+GENRE_ALIASES = {
+    'scifi': 'science',
+    'sci fi': 'science',
+    'science fiction': 'science',
+    'thriller': 'suspense',
+    'music': 'musical',
+    'sport': 'sports',
+}
+
+# sort_by values produced by the rule engine -> (column key, descending)
+SORT_ORDERS = {
+    'rating': ('rating', True),
+    'popularity': ('popularity', True),
+    'release_date_desc': ('release_date', True),
+    'release_date_asc': ('release_date', False),
+}
+
+# Bits set in each byte value, for numpy builds without bitwise_count
+_BYTE_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def popcount(bitmaps: np.ndarray, axis: Optional[int] = None):
+    """Number of set bits in a uint64 bitmap, or per bitmap along axis of a stack"""
+    if hasattr(np, 'bitwise_count'):
+        counts = np.bitwise_count(bitmaps)
+    else:
+        counts = _BYTE_POPCOUNT[bitmaps.view(np.uint8)]
+    return int(counts.sum()) if axis is None else counts.sum(axis=axis, dtype=np.int64)
+
+
+class CatalogIndex:
+    """Structured filters, sorts and facets over a movie catalog
+
+    A filter is a uint64 bitmap with one bit per catalog row. Genres and
+    years have one bitmap each, year ranges are cut from a year-sorted
+    permutation and people map to sorted row posting lists, so a filter
+    touches only the rows it selects. Sorting walks a precomputed
+    permutation and facets are popcounts of ANDed bitmaps.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.n_words = (size + 63) // 64
+        self.genre_bitmaps: Dict[str, np.ndarray] = {}  # rows of _genre_stack
+        self.genre_words: Dict[str, List[str]] = {}  # word -> genre labels containing it
+        self.year_bitmaps: Dict[int, np.ndarray] = {}  # rows of _year_stack
+        self.year_order = np.zeros(0, dtype=np.int64)  # rows with a year, by year
+        self.sorted_years = np.zeros(0, dtype=np.int64)
+        self.people: Dict[str, np.ndarray] = {}  # normalized name -> sorted rows
+        self.sort_orders: Dict[str, np.ndarray] = {}  # sort_by -> rows, best first
+        self.sort_ranks: Dict[str, np.ndarray] = {}  # sort_by -> position of each row in sort_orders
+        self._genre_stack = np.zeros((0, self.n_words), dtype=np.uint64)
+        self._year_stack = np.zeros((0, self.n_words), dtype=np.uint64)
+        self._all = self.bitmap_from_mask(np.ones(size, dtype=bool))
+
+    # ===== Bitmaps =====
+
+    def bitmap_from_mask(self, mask: np.ndarray) -> np.ndarray:
+        """Pack a boolean row mask into a uint64 bitmap"""
+        packed = np.packbits(mask, bitorder='little')
+        padded = np.zeros(self.n_words * 8, dtype=np.uint8)
+        padded[:len(packed)] = packed
+        return padded.view(np.uint64)
+
+    def bitmap_from_rows(self, rows: np.ndarray) -> np.ndarray:
+        mask = np.zeros(self.size, dtype=bool)
+        mask[rows] = True
+        return self.bitmap_from_mask(mask)
+
+    def mask_from_bitmap(self, bitmap: np.ndarray) -> np.ndarray:
+        return np.unpackbits(bitmap.view(np.uint8), bitorder='little')[:self.size].astype(bool)
+
+    def rows(self, bitmap: np.ndarray) -> np.ndarray:
+        """Selected row numbers in catalog order"""
+        return np.flatnonzero(self.mask_from_bitmap(bitmap))
+
+    # ===== Building =====
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> 'CatalogIndex':
+        """Index the catalog columns that are present
+
+        Uses genres (comma-separated labels), directors and actors
+        (comma-separated names), original_release_date, tomatometer_rating
+        and tmdb_popularity.
+        """
+        index = cls(len(df))
+
+        if 'genres' in df.columns:
+            index._index_genres(df['genres'])
+
+        people_rows: Dict[str, List[int]] = {}
+        for column in ('directors', 'actors'):
+            if column not in df.columns:
+                continue
+            for row, names in enumerate(df[column]):
+                if not isinstance(names, str):
+                    continue
+                for name in names.split(','):
+                    key = normalize_name(name)
+                    if key:
+                        people_rows.setdefault(key, []).append(row)
+        index.people = {name: np.unique(rows) for name, rows in people_rows.items()}
+
+        if 'original_release_date' in df.columns:
+            dates = pd.to_datetime(df['original_release_date'], errors='coerce')
+            index._index_years(dates.dt.year.to_numpy(dtype=float, na_value=np.nan))
+            days = dates.to_numpy(dtype='datetime64[D]').astype(np.int64).astype(float)
+            days[dates.isna().to_numpy()] = np.nan
+            index._add_sort_keys('release_date', days)
+        if 'tomatometer_rating' in df.columns:
+            index._add_sort_keys('rating', pd.to_numeric(df['tomatometer_rating'], errors='coerce').to_numpy(dtype=float))
+        if 'tmdb_popularity' in df.columns:
+            index._add_sort_keys('popularity', pd.to_numeric(df['tmdb_popularity'], errors='coerce').to_numpy(dtype=float))
+
+        return index
+
+    def _index_genres(self, column: Iterable[Any]):
+        label_rows: Dict[str, List[int]] = {}
+        for row, labels in enumerate(column):
+            if not isinstance(labels, str):
+                continue
+            for label in labels.split(','):
+                label = normalize_name(label)
+                if label:
+                    label_rows.setdefault(label, []).append(row)
+
+        # One (labels x words) stack, so facets count every label at once
+        self._genre_stack = np.array([self.bitmap_from_rows(np.array(rows)) for rows in label_rows.values()],
+                                     dtype=np.uint64).reshape(len(label_rows), self.n_words)
+        for label, bitmap in zip(label_rows, self._genre_stack):
+            self.genre_bitmaps[label] = bitmap
+            for word in label.split():
+                self.genre_words.setdefault(word, []).append(label)
+
+    def _index_years(self, years: np.ndarray):
+        known = np.flatnonzero(~np.isnan(years))
+        self.year_order = known[np.argsort(years[known], kind='stable')]
+        self.sorted_years = years[self.year_order].astype(np.int64)
+
+        boundaries = np.flatnonzero(np.diff(self.sorted_years)) + 1
+        groups = [rows for rows in np.split(self.year_order, boundaries) if len(rows)]
+        self._year_stack = np.array([self.bitmap_from_rows(rows) for rows in groups],
+                                    dtype=np.uint64).reshape(len(groups), self.n_words)
+        for rows, bitmap in zip(groups, self._year_stack):
+            self.year_bitmaps[int(years[rows[0]])] = bitmap
+
+    def _add_sort_keys(self, key: str, values: np.ndarray):
+        """Precompute the permutations for every sort_by using this key; missing values sort last"""
+        missing = np.isnan(values)
+        for sort_by, (sort_key, descending) in SORT_ORDERS.items():
+            if sort_key != key:
+                continue
+            ordered = np.where(missing, np.inf, -values if descending else values)
+            order = np.argsort(ordered, kind='stable')
+            ranks = np.empty_like(order)
+            ranks[order] = np.arange(len(order))
+            self.sort_orders[sort_by] = order
+            self.sort_ranks[sort_by] = ranks
+
+    # ===== Queries =====
+
+    def genre_bitmap(self, genre: str) -> Optional[np.ndarray]:
+        """Rows with any catalog label containing the genre, or None if no label does"""
+        genre = normalize_name(genre)
+        word = GENRE_ALIASES.get(genre, genre)
+        labels = self.genre_words.get(word) or ([word] if word in self.genre_bitmaps else [])
+        if not labels:
+            return None
+        bitmap = self.genre_bitmaps[labels[0]].copy()
+        for label in labels[1:]:
+            bitmap |= self.genre_bitmaps[label]
+        return bitmap
+
+    def year_range_bitmap(self, year_min: Optional[int], year_max: Optional[int]) -> np.ndarray:
+        low = 0 if year_min is None else np.searchsorted(self.sorted_years, year_min, side='left')
+        high = len(self.sorted_years) if year_max is None else np.searchsorted(self.sorted_years, year_max, side='right')
+        return self.bitmap_from_rows(self.year_order[low:high])
+
+    def filter(self, search_parameters: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Bitmap of the rows matching QueryAnalyzer search_parameters
+
+        Genres are ORed (the recognizer may pick up a spurious one, and most
+        multi-genre queries are happy with either); genres the catalog has
+        no label for are ignored. People are ANDed, since naming two people
+        asks for the movies they share; people the catalog does not know
+        (names from the built-in dictionaries, misheard names) are ignored,
+        so an extraction mistake does not empty the results. boost_people,
+        names only guessed from how the query sounds, never filter (see
+        people_bitmap). Year bounds come from filters or year_range.
+        """
+        bitmap = self._all.copy()
+        if not search_parameters:
+            return bitmap
+
+        genre_bitmaps = [b for b in map(self.genre_bitmap, search_parameters.get('genres') or []) if b is not None]
+        if genre_bitmaps:
+            any_genre = genre_bitmaps[0].copy()
+            for genre_bitmap in genre_bitmaps[1:]:
+                any_genre |= genre_bitmap
+            bitmap &= any_genre
+
+        filters = search_parameters.get('filters') or {}
+        year_range = search_parameters.get('year_range') or {}
+        year_min = filters.get('year_min') or year_range.get('min')
+        year_max = filters.get('year_max') or year_range.get('max')
+        if (year_min or year_max) and len(self.sorted_years):
+            bitmap &= self.year_range_bitmap(year_min, year_max)
+
+        for person in search_parameters.get('people') or []:
+            rows = self.people.get(normalize_name(person))
+            if rows is not None:
+                bitmap &= self.bitmap_from_rows(rows)
+
+        return bitmap
+
+    def people_bitmap(self, people: Iterable[str]) -> Optional[np.ndarray]:
+        """Rows featuring any of the people, or None if the catalog knows none of them"""
+        known = [rows for rows in (self.people.get(normalize_name(person)) for person in people) if rows is not None]
+        if not known:
+            return None
+        return self.bitmap_from_rows(np.concatenate(known))
+
+    def sorted_rows(self, bitmap: np.ndarray, sort_by: str, limit: Optional[int] = None) -> Optional[np.ndarray]:
+        """Selected rows in sort_by order, or None if the catalog cannot sort that way"""
+        order = self.sort_orders.get(sort_by)
+        if order is None:
+            return None
+        selected = order[self.mask_from_bitmap(bitmap)[order]]
+        return selected if limit is None else selected[:limit]
+
+    def top_positions(self, rows: np.ndarray, scores: np.ndarray, limit: int,
+                      sort_by: Optional[str] = None) -> np.ndarray:
+        """Positions in rows of the limit best scores, in sort_by order if the catalog can sort that way
+
+        The scores pick the rows and sort_by only orders them, so a sorted
+        query still returns what it asked for.
+        """
+        top = np.argsort(-scores, kind='stable')[:limit]
+        ranks = self.sort_ranks.get(sort_by) if sort_by else None
+        if ranks is not None:
+            top = top[np.argsort(ranks[rows[top]], kind='stable')]
+        return top
+
+    def facets(self, bitmap: np.ndarray) -> Dict[str, Any]:
+        """Genre and year histograms of the selected rows"""
+        genre_counts = popcount(self._genre_stack & bitmap, axis=1)
+        year_counts = popcount(self._year_stack & bitmap, axis=1)
+        genres = sorted(
+            ((label, int(count)) for label, count in zip(self.genre_bitmaps, genre_counts) if count),
+            key=lambda item: -item[1]
+        )
+        return {
+            'total': popcount(bitmap),
+            'genres': dict(genres),
+            'years': {year: int(count) for year, count in zip(self.year_bitmaps, year_counts) if count},
+        }
+
+
+# Example usage
+if __name__ == "__main__":
+    catalog = pd.DataFrame({
+        'movie_title': ['Inception', 'The Dark Knight', 'Toy Story', 'Heat'],
+        'genres': ['Action & Adventure, Science Fiction & Fantasy', 'Action & Adventure, Drama',
+                   'Animation, Comedy, Kids & Family', 'Action & Adventure, Mystery & Suspense'],
+        'directors': ['Christopher Nolan', 'Christopher Nolan', 'John Lasseter', 'Michael Mann'],
+        'actors': ['Leonardo DiCaprio, Tom Hardy', 'Christian Bale, Heath Ledger', 'Tom Hanks', 'Al Pacino'],
+        'original_release_date': ['2010-07-16', '2008-07-18', '1995-11-22', '1995-12-15'],
+        'tomatometer_rating': [87, 94, 100, 87],
+    })
+    index = CatalogIndex.from_dataframe(catalog)
+
+    params = {'genres': ['action'], 'year_range': {'min': 2000, 'max': None}, 'people': [], 'filters': {}}
+    bitmap = index.filter(params)
+    print('action since 2000:', list(catalog['movie_title'][index.rows(bitmap)]))
+    print('by rating:', list(catalog['movie_title'][index.sorted_rows(bitmap, 'rating')]))
+    print('facets:', index.facets(index.filter({'genres': ['action']})))
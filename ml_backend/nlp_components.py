@@ -0,0 +1,108 @@
+"""
+Component Registry Module
+Builds each NLP component once and shares it read-only between the components
+that depend on it
+"""
+
+import sys
+import time
+from typing import Dict, Any, Callable, Optional
+
+from nlp_preprocessing import NLPPreprocessor
+from nlp_intent_classifier import IntentClassifier
+from nlp_ner import EntityRecognizer, FeatureExtractor, QueryAnalyzer, SemanticMatcher
+from nlp_semantic_similarity import SemanticSimilarityCalculator, FuzzyMatcher
+from nlp_language import LanguageDetector
+from nlp_query_expansion import (
+    QueryExpander, QueryTranslator, NLPQueryProcessor, SpellCorrector, SPELL_DICTIONARY_PATH, create_translator
+)
+
+
+class ComponentRegistry:
+    """Named components, each built on first request and reused afterwards
+
+    A factory receives the registry, so it asks for its dependencies by
+    name instead of constructing private copies. Shared components must be
+    read-only after construction.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[['ComponentRegistry'], Any]] = {}
+        self._components: Dict[str, Any] = {}
+        self.build_seconds: Dict[str, float] = {}  # own construction time, dependencies excluded
+
+    def register(self, name: str, factory: Callable[['ComponentRegistry'], Any]):
+        """Add or replace a factory; a component already built under the name is dropped"""
+        self._factories[name] = factory
+        self._components.pop(name, None)
+
+    def get(self, name: str) -> Any:
+        if name in self._components:
+            return self._components[name]
+        if name not in self._factories:
+            raise KeyError(f"No component registered as '{name}'")
+
+        start = time.perf_counter()
+        dependencies_before = sum(self.build_seconds.values())
+        component = self._factories[name](self)
+        dependencies = sum(self.build_seconds.values()) - dependencies_before
+        self.build_seconds[name] = time.perf_counter() - start - dependencies
+
+        self._components[name] = component
+        return component
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._components
+
+
+def default_registry(intent_cascade: bool = False) -> ComponentRegistry:
+    """Registry wiring the service components around one preprocessor, one entity recognizer and one translator"""
+    registry = ComponentRegistry()
+    registry.register('preprocessor', lambda r: NLPPreprocessor())
+    registry.register('intent_classifier', lambda r: IntentClassifier(
+        cascade=intent_cascade, preprocessor=r.get('preprocessor')
+    ))
+    registry.register('entity_recognizer', lambda r: EntityRecognizer(preprocessor=r.get('preprocessor')))
+    registry.register('feature_extractor', lambda r: FeatureExtractor(
+        entity_recognizer=r.get('entity_recognizer'), preprocessor=r.get('preprocessor')
+    ))
+    registry.register('query_analyzer', lambda r: QueryAnalyzer(feature_extractor=r.get('feature_extractor')))
+    registry.register('semantic_matcher', lambda r: SemanticMatcher(query_analyzer=r.get('query_analyzer')))
+    registry.register('similarity_calculator', lambda r: SemanticSimilarityCalculator(preprocessor=r.get('preprocessor')))
+    registry.register('fuzzy_matcher', lambda r: FuzzyMatcher(preprocessor=r.get('preprocessor')))
+    registry.register('query_expander', lambda r: QueryExpander(preprocessor=r.get('preprocessor')))
+    registry.register('translator', lambda r: create_translator())
+    registry.register('language_detector', lambda r: LanguageDetector())
+    registry.register('query_translator', lambda r: QueryTranslator(
+        translator=r.get('translator'), language_detector=r.get('language_detector')
+    ))
+    registry.register('spell_corrector', lambda r: SpellCorrector.from_dictionary(SPELL_DICTIONARY_PATH))
+    registry.register('query_processor', lambda r: NLPQueryProcessor(
+        preprocessor=r.get('preprocessor'),
+        query_expander=r.get('query_expander'),
+        query_translator=r.get('query_translator'),
+        spell_corrector=r.get('spell_corrector')
+    ))
+    return registry
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB, or None where it is not available"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+# Example usage
+if __name__ == "__main__":
+    registry = default_registry()
+    for name in ('query_analyzer', 'semantic_matcher', 'query_processor', 'similarity_calculator', 'fuzzy_matcher'):
+        registry.get(name)
+
+    for name, seconds in registry.build_seconds.items():
+        print(f"{name:24} {seconds * 1000:8.1f} ms")
+    print(f"peak RSS: {peak_rss_mb()} MB")
@@ -0,0 +1,504 @@
+"""
+Gazetteer Module
+Multi-pattern dictionary matching with an Aho-Corasick automaton, and a
+catalog-derived gazetteer stored as a memory-mapped front-coded string table
+"""
+
+import os
+import re
+import sys
+import mmap
+import bisect
+import zlib
+import struct
+from collections import deque
+from typing import List, Dict, Tuple, Any, Iterable, Iterator, Optional
+
+import numpy as np
+
+
+class AhoCorasickMatcher:
+    """Find every dictionary phrase in a text with a single left-to-right scan
+
+    Each phrase carries one or more payloads. Matches must start and end on
+    word boundaries, so short keys such as "ma" never fire inside "man".
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]  # state -> {char: next state}
+        self._fail: List[int] = [0]
+        self._outputs: List[List[int]] = [[]]  # state -> ids of phrases ending here
+        self._phrases: List[str] = []
+        self._payloads: List[List[Any]] = []
+        self._phrase_ids: Dict[str, int] = {}
+        self._built = False
+
+    def add(self, phrase: str, payload: Any):
+        """Register a phrase; adding the same phrase again appends another payload"""
+        phrase_id = self._phrase_ids.get(phrase)
+        if phrase_id is not None:
+            if payload not in self._payloads[phrase_id]:
+                self._payloads[phrase_id].append(payload)
+            return
+
+        phrase_id = len(self._phrases)
+        self._phrase_ids[phrase] = phrase_id
+        self._phrases.append(phrase)
+        self._payloads.append([payload])
+
+        state = 0
+        for char in phrase:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append(phrase_id)
+        self._built = False
+
+    def build(self):
+        """Compute failure links breadth-first and merge outputs along them"""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            queue.append(state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+
+                # A state also reports every phrase that ends at its failure state
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+        self._built = True
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str, List[Any]]]:
+        """Return (start, end, phrase, payloads) for each whole-word match, in text order"""
+        if not self._built:
+            self.build()
+
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+
+            for phrase_id in self._outputs[state]:
+                end = position + 1
+                start = end - len(self._phrases[phrase_id])
+                if _is_boundary(text, start - 1) and _is_boundary(text, end):
+                    matches.append((start, end, self._phrases[phrase_id], self._payloads[phrase_id]))
+
+        # Outputs at one position come from the longest phrase down; report by start offset
+        matches.sort(key=lambda match: (match[0], match[1]))
+        return matches
+
+    def __len__(self) -> int:
+        return len(self._phrases)
+
+
+def _is_boundary(text: str, index: int) -> bool:
+    """True if index is outside the text or points at a non-word character"""
+    return index < 0 or index >= len(text) or not text[index].isalnum()
+
+
+def _prefix_value(key: bytes) -> int:
+    """First 8 bytes as an integer that orders the same way as the bytes"""
+    return int.from_bytes(key[:8].ljust(8, b'\0'), 'big')
+
+
+def _filter_positions(key: bytes, n_bits: int, n_hashes: int) -> Iterator[int]:
+    """Bloom filter bit positions by double hashing (inlined in FrontCodedTable._filter_hit)"""
+    h1 = zlib.crc32(key)
+    h2 = zlib.adler32(key) | 1
+    for i in range(n_hashes):
+        yield (h1 + i * h2) % n_bits
+
+
+def normalize_name(text: str) -> str:
+    """Lowercase and replace punctuation with spaces ('J.J. Abrams' -> 'j j abrams')"""
+    return ' '.join(re.sub(r'[^\w\s]|_', ' ', str(text).lower()).split())
+
+
+class FrontCodedTable:
+    """Sorted string table with front coding, read through mmap
+
+    Strings are stored in blocks. The first string of a block is stored in
+    full, the rest as (shared prefix length, suffix). Lookups binary-search
+    the block heads and decode a single block, so the table never has to be
+    materialized as Python strings. Every string carries a small integer of
+    flags.
+
+    A Bloom filter over every string and every word-aligned prefix of one
+    ('the', 'the dark', ...) lets phrase scans skip the table for words that
+    cannot start or continue an entry.
+
+    File layout (little-endian):
+        header      magic, version, count, block_size, n_blocks, max_words, data_size, filter_bits
+        offsets     uint32[n_blocks]  byte offset of each block in data
+        prefixes    uint64[n_blocks]  first 8 bytes of each block head, big-endian
+        flags       uint8[count]
+        data        per string: prefix length (byte), suffix length (byte), suffix
+        filter      filter_bits / 8 bytes
+    """
+
+    MAGIC = b'FCT1'
+    VERSION = 1
+    HEADER = struct.Struct('<4sIIIIIII')
+    FILTER_HASHES = 4
+    FILTER_BITS_PER_KEY = 12
+
+    def __init__(self, buffer, offsets: np.ndarray, head_prefixes: np.ndarray, flags: np.ndarray,
+                 data_start: int, filter_start: int, filter_bits: int,
+                 count: int, block_size: int, max_words: int):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._head_prefixes = head_prefixes
+        self._flags = flags
+        self._data_start = data_start
+        self._filter_start = filter_start
+        self._filter_bits = filter_bits
+        self.count = count
+        self.block_size = block_size
+        self.max_words = max_words
+        self.path: Optional[str] = None
+
+    @classmethod
+    def write(cls, path: str, entries: Dict[str, int], block_size: int = 8):
+        """Write {string: flags} to path; strings longer than 255 bytes are skipped"""
+        items = sorted(
+            (key.encode('utf-8'), flag) for key, flag in entries.items()
+            if key and len(key.encode('utf-8')) <= 255
+        )
+
+        offsets, head_prefixes, flags, data = [], [], [], bytearray()
+        filter_keys = set()
+        previous = b''
+        max_words = 0
+        for i, (key, flag) in enumerate(items):
+            words = key.split(b' ')
+            filter_keys.add(key)
+            for n in range(1, len(words)):
+                filter_keys.add(b' '.join(words[:n]) + b' ')
+
+            if i % block_size == 0:
+                offsets.append(len(data))
+                head_prefixes.append(_prefix_value(key))
+                shared = 0
+            else:
+                shared = min(len(previous), len(key), 255)
+                for j in range(shared):
+                    if previous[j] != key[j]:
+                        shared = j
+                        break
+            suffix = key[shared:]
+            data += bytes((shared, len(suffix))) + suffix
+            flags.append(flag)
+            previous = key
+            max_words = max(max_words, len(words))
+
+        filter_bits = max(64, len(filter_keys) * cls.FILTER_BITS_PER_KEY) // 8 * 8
+        bloom = bytearray(filter_bits // 8)
+        for key in filter_keys:
+            for bit in _filter_positions(key, filter_bits, cls.FILTER_HASHES):
+                bloom[bit >> 3] |= 1 << (bit & 7)
+
+        # Write next to the target and rename, so readers never see a partial table;
+        # the pid keeps workers building the same table at startup off each other's temp file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(cls.HEADER.pack(
+                cls.MAGIC, cls.VERSION, len(items), block_size, len(offsets), max_words, len(data), filter_bits
+            ))
+            f.write(np.asarray(offsets, dtype='<u4').tobytes())
+            f.write(np.asarray(head_prefixes, dtype='<u8').tobytes())
+            f.write(np.asarray(flags, dtype=np.uint8).tobytes())
+            f.write(bytes(data))
+            f.write(bytes(bloom))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path: str) -> 'FrontCodedTable':
+        """Memory-map a table written by write()"""
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b''
+
+        if len(buffer) < cls.HEADER.size:
+            raise ValueError(f"{path} is not a front-coded table")
+        magic, version, count, block_size, n_blocks, max_words, data_size, filter_bits = cls.HEADER.unpack_from(buffer, 0)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(f"{path} is not a front-coded table (version {cls.VERSION})")
+
+        position = cls.HEADER.size
+        offsets = np.frombuffer(buffer, dtype='<u4', count=n_blocks, offset=position)
+        head_prefixes = np.frombuffer(buffer, dtype='<u8', count=n_blocks, offset=position + 4 * n_blocks)
+        if sys.byteorder == 'little':
+            # Plain memoryview indexing (and bisect over it) is much cheaper than numpy scalar access
+            view = memoryview(buffer)
+            offsets = view[position:position + 4 * n_blocks].cast('I')
+            head_prefixes = view[position + 4 * n_blocks:position + 12 * n_blocks].cast('Q')
+        position += 12 * n_blocks
+        flags = np.frombuffer(buffer, dtype=np.uint8, count=count, offset=position)
+        position += count
+        if len(buffer) != position + data_size + filter_bits // 8:
+            raise ValueError(f"{path} is truncated")
+
+        table = cls(buffer, offsets, head_prefixes, flags, position, position + data_size, filter_bits,
+                    count, block_size, max_words)
+        table.path = path
+        return table
+
+    def might_contain(self, key: str) -> bool:
+        """False only if key is certainly not in the table"""
+        return self._filter_hit(key.encode('utf-8'))
+
+    def might_extend(self, key: str) -> bool:
+        """False only if no string in the table starts with key + ' '"""
+        return self._filter_hit(key.encode('utf-8') + b' ')
+
+    def _filter_hit(self, key: bytes) -> bool:
+        buffer, start, n_bits = self._buffer, self._filter_start, self._filter_bits
+        h1 = zlib.crc32(key)
+        h2 = zlib.adler32(key) | 1
+        for i in range(self.FILTER_HASHES):
+            bit = (h1 + i * h2) % n_bits
+            if not buffer[start + (bit >> 3)] >> (bit & 7) & 1:
+                return False
+        return True
+
+    def _head(self, block: int) -> bytes:
+        start = self._data_start + self._offsets[block]
+        return self._buffer[start + 2:start + 2 + self._buffer[start + 1]]
+
+    def _scan(self, block: int) -> Iterator[Tuple[int, bytes]]:
+        """Yield (index, string) for every string in a block"""
+        position = self._data_start + self._offsets[block]
+        index = block * self.block_size
+        stop = min(index + self.block_size, self.count)
+        key = b''
+        while index < stop:
+            shared, length = self._buffer[position], self._buffer[position + 1]
+            key = key[:shared] + self._buffer[position + 2:position + 2 + length]
+            yield index, key
+            position += 2 + length
+            index += 1
+
+    def _block_for(self, key: bytes) -> int:
+        """Index of the last block whose head is <= key, or -1"""
+        # The 8-byte head prefixes narrow the search to blocks that tie on them
+        prefix = _prefix_value(key)
+        low = bisect.bisect_left(self._head_prefixes, prefix)
+        high = bisect.bisect_right(self._head_prefixes, prefix)
+        while low < high:
+            middle = (low + high) // 2
+            if self._head(middle) <= key:
+                low = middle + 1
+            else:
+                high = middle
+        return low - 1
+
+    def probe(self, key: str) -> Tuple[int, bool]:
+        """Return (flags of key or 0, whether any longer string starts with key + ' ')"""
+        if not self.count:
+            return 0, False
+        encoded = key.encode('utf-8')
+        extension = encoded + b' '
+        block = max(self._block_for(encoded), 0)
+
+        # Decode forward from the block head; blocks are contiguous and a head
+        # shares no prefix, so the scan can run on into the next block
+        buffer = self._buffer
+        position = self._data_start + self._offsets[block]
+        index = block * self.block_size
+        candidate = b''
+        flags = 0
+        while index < self.count:
+            shared, length = buffer[position], buffer[position + 1]
+            position += 2
+            candidate = candidate[:shared] + buffer[position:position + length]
+            if candidate == encoded:
+                flags = int(self._flags[index])
+            elif candidate > encoded:
+                return flags, candidate.startswith(extension)
+            position += length
+            index += 1
+        return flags, False
+
+    def scan_prefix(self, prefix: str) -> Iterator[Tuple[str, int]]:
+        """Yield (string, flags) for every string starting with prefix, in sorted order"""
+        if not self.count:
+            return
+        encoded = prefix.encode('utf-8')
+        block = max(self._block_for(encoded), 0)
+
+        # Decode forward from the block head, as in probe
+        buffer = self._buffer
+        position = self._data_start + self._offsets[block]
+        index = block * self.block_size
+        candidate = b''
+        while index < self.count:
+            shared, length = buffer[position], buffer[position + 1]
+            position += 2
+            candidate = candidate[:shared] + buffer[position:position + length]
+            if candidate.startswith(encoded):
+                yield candidate.decode('utf-8'), int(self._flags[index])
+            elif candidate > encoded:
+                return
+            position += length
+            index += 1
+
+    def get(self, key: str) -> int:
+        """Flags stored for key, 0 if absent"""
+        return self.probe(key)[0]
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) != 0
+
+    def __iter__(self) -> Iterator[Tuple[str, int]]:
+        for block in range(len(self._offsets)):
+            for index, key in self._scan(block):
+                yield key.decode('utf-8'), int(self._flags[index])
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class CatalogGazetteer:
+    """People and titles extracted from the movie dataset
+
+    Names are kept in a memory-mapped FrontCodedTable, so loading is a single
+    mmap and tens of thousands of entries cost no Python objects.
+    """
+
+    DIRECTOR = 1
+    ACTOR = 2
+    TITLE = 4
+    PERSON = DIRECTOR | ACTOR
+
+    def __init__(self, table: FrontCodedTable):
+        self.table = table
+
+    @classmethod
+    def open(cls, path: str) -> 'CatalogGazetteer':
+        return cls(FrontCodedTable.open(path))
+
+    @classmethod
+    def collect_entries(cls, titles: Iterable[str], directors: Iterable[str],
+                        actors: Iterable[str]) -> Dict[str, int]:
+        """Merge catalog columns into {normalized name: flags}
+
+        The people columns hold comma-separated names.
+        """
+        entries: Dict[str, int] = {}
+
+        def add(name, flag):
+            key = normalize_name(name)
+            if key:
+                entries[key] = entries.get(key, 0) | flag
+
+        for title in titles:
+            if isinstance(title, str):
+                add(title, cls.TITLE)
+        for column, flag in ((directors, cls.DIRECTOR), (actors, cls.ACTOR)):
+            for names in column:
+                if isinstance(names, str):
+                    for name in names.split(','):
+                        add(name, flag)
+        return entries
+
+    @classmethod
+    def build(cls, dataset_path: str, output_path: str) -> 'CatalogGazetteer':
+        """Extract every title, director and cast member from the dataset CSV"""
+        import pandas as pd
+
+        df = pd.read_csv(dataset_path, usecols=lambda column: column in ('movie_title', 'directors', 'actors'))
+        empty = [None] * len(df)
+        entries = cls.collect_entries(
+            df['movie_title'] if 'movie_title' in df else empty,
+            df['directors'] if 'directors' in df else empty,
+            df['actors'] if 'actors' in df else empty,
+        )
+        FrontCodedTable.write(output_path, entries)
+        return cls.open(output_path)
+
+    @classmethod
+    def load_or_build(cls, output_path: str, dataset_path: Optional[str] = None) -> Optional['CatalogGazetteer']:
+        """Open the table, rebuilding it first if the dataset is newer; None if neither exists"""
+        dataset_exists = dataset_path is not None and os.path.exists(dataset_path)
+        if os.path.exists(output_path):
+            if not dataset_exists or os.path.getmtime(output_path) >= os.path.getmtime(dataset_path):
+                try:
+                    return cls.open(output_path)
+                except ValueError:
+                    pass
+        if dataset_exists:
+            return cls.build(dataset_path, output_path)
+        return None
+
+    def find_all(self, text: str, kinds: int = PERSON | TITLE,
+                 stopwords: Iterable[str] = ()) -> List[Tuple[str, int]]:
+        """Return (name, flags) for catalog entries in text, leftmost-longest and non-overlapping
+
+        Single-word entries are ignored unless they make up the whole text,
+        since one-word titles ('up', 'her') would otherwise match everywhere.
+        For the same reason matches made only of stopwords are ignored.
+        """
+        words = normalize_name(text).split()
+        table = self.table
+        max_words = table.max_words
+        matches = []
+
+        start = 0
+        while start < len(words):
+            best_end, best_flags = 0, 0
+            key = words[start]
+            end = start + 1
+            content = words[start] not in stopwords
+            while True:
+                if content and (end - start > 1 or len(words) == 1) and table.might_contain(key):
+                    flags = table.get(key)
+                    if flags & kinds:
+                        best_end, best_flags = end, flags
+                if end >= len(words) or end - start >= max_words or not table.might_extend(key):
+                    break
+                content = content or words[end] not in stopwords
+                key = f"{key} {words[end]}"
+                end += 1
+
+            if best_end:
+                matches.append((' '.join(words[start:best_end]), best_flags))
+                start = best_end
+            else:
+                start += 1
+
+        return matches
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+
+# Example usage
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        # python nlp_gazetteer.py <dataset.csv> <catalog_gazetteer.bin>
+        gazetteer = CatalogGazetteer.build(sys.argv[1], sys.argv[2])
+        print(f"{len(gazetteer)} catalog names -> {sys.argv[2]} ({os.path.getsize(sys.argv[2])} bytes)")
+    else:
+        matcher = AhoCorasickMatcher()
+        matcher.add('ma', ('genres', 'horror'))
+        matcher.add('tom cruise', ('people', 'tom cruise'))
+        matcher.add('cruise', ('keyword', 'cruise'))
+
+        for text in ["phim ma tom cruise", "spider man"]:
+            print(text, '->', matcher.find_all(text))
@@ -3,11 +3,74 @@ Intent Classification Module
 Implements Naive Bayes and SVM classifiers from scratch
 """
 
-import math
+import os
+import copy
 import json
-from collections import defaultdict, Counter
-from typing import List, Dict, Tuple, Any
+import hashlib
+import threading
+import zipfile
+from collections import Counter
+from typing import List, Dict, Tuple, Any, Optional
+
+import numpy as np
+from scipy import sparse
+
 from nlp_preprocessing import NLPPreprocessor, TFIDFVectorizer
+from nlp_rules import DEFAULT_RULE_ENGINE
+
+# Bump when the layout of the saved .npz artifact changes
+MODEL_FORMAT_VERSION = 2
+
+# Confidence reported when a rule decides the intent
+RULE_CONFIDENCE = 0.8
+
+# Stages a cascade classification can exit from
+CASCADE_STAGES = ('rules', 'models')
+
+
+def _count_matrix(documents: List[List[str]], vocabulary: Dict[str, int]) -> sparse.csr_matrix:
+    """Build a sparse (documents x vocab) count matrix, ignoring unknown words"""
+    indptr = [0]
+    indices = []
+    for doc in documents:
+        indices.extend(vocabulary[word] for word in doc if word in vocabulary)
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.float32)
+    matrix = sparse.csr_matrix(
+        (data, np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int32)),
+        shape=(len(documents), len(vocabulary))
+    )
+    # Repeated words are summed into a single count
+    matrix.sum_duplicates()
+    return matrix
+
+
+def _vocabulary_array(vocabulary: Dict[str, int]) -> np.ndarray:
+    """Vocabulary as a string array ordered by token id"""
+    words = [''] * len(vocabulary)
+    for word, idx in vocabulary.items():
+        words[idx] = word
+    return np.array(words, dtype=str)
+
+
+def _vocabulary_dict(words: np.ndarray) -> Dict[str, int]:
+    """Inverse of _vocabulary_array"""
+    return {word: idx for idx, word in enumerate(words.tolist())}
+
+
+def _artifact_checksum(arrays: Dict[str, np.ndarray]) -> str:
+    """SHA-256 over the names, dtypes, shapes and contents of the model arrays"""
+    digest = hashlib.sha256()
+    for key in sorted(arrays):
+        array = np.ascontiguousarray(arrays[key])
+        digest.update(f"{key}:{array.dtype.str}:{array.shape}".encode('utf-8'))
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def _grow(array: np.ndarray, rows: int, cols: int) -> np.ndarray:
+    """Zero-pad a 2-D array up to (rows, cols)"""
+    return np.pad(array, ((0, rows - array.shape[0]), (0, cols - array.shape[1])))
 
 
 class NaiveBayesClassifier:
@@ -15,175 +78,249 @@ class NaiveBayesClassifier:
     
     def __init__(self):
         self.class_probs = {}  # P(class)
-        self.word_probs = defaultdict(lambda: defaultdict(float))  # P(word|class)
-        self.vocabulary = set()
-        self.classes = set()
+        self.vocabulary = {}  # word -> column in feature_log_prob
+        self.classes = []
+        self.class_counts = np.zeros(0)  # documents seen per class
+        self.word_counts = np.zeros((0, 0))  # word occurrences, classes x vocab
+        self.class_log_prior = np.zeros(0, dtype=np.float32)  # log P(class)
+        self.feature_log_prob = np.zeros((0, 0), dtype=np.float32)  # log P(word|class), classes x vocab
         
     def train(self, documents: List[List[str]], labels: List[str]):
-        """Train Naive Bayes classifier"""
-        # Count classes
-        class_counts = Counter(labels)
-        total_docs = len(labels)
-        
-        # Calculate P(class)
-        for cls, count in class_counts.items():
-            self.class_probs[cls] = count / total_docs
-            self.classes.add(cls)
+        """Train Naive Bayes classifier from scratch"""
+        self.vocabulary = {}
+        self.classes = []
+        self.class_counts = np.zeros(0)
+        self.word_counts = np.zeros((0, 0))
+        self.partial_fit(documents, labels)
+    
+    def partial_fit(self, documents: List[List[str]], labels: List[str],
+                    sample_weight: Optional[List[float]] = None):
+        """Add documents to the counts and refresh the probabilities
+
+        sample_weight scales each document's counts (e.g. < 1 for weak labels).
+        """
+        if not documents:
+            return
+        
+        weights = np.ones(len(documents)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+        
+        # Register new classes and assign ids to new words
+        for cls in sorted(set(labels) - set(self.classes)):
+            self.classes.append(cls)
+        class_index = {cls: i for i, cls in enumerate(self.classes)}
+        for doc in documents:
+            for word in doc:
+                if word not in self.vocabulary:
+                    self.vocabulary[word] = len(self.vocabulary)
         
-        # Count words per class
-        word_counts_per_class = defaultdict(Counter)
-        total_words_per_class = defaultdict(int)
+        self.class_counts = np.pad(self.class_counts, (0, len(self.classes) - len(self.class_counts)))
+        self.word_counts = _grow(self.word_counts, len(self.classes), len(self.vocabulary))
         
-        for doc, label in zip(documents, labels):
-            for word in doc:
-                self.vocabulary.add(word)
-                word_counts_per_class[label][word] += 1
-                total_words_per_class[label] += 1
+        # Count classes
+        label_ids = np.array([class_index[label] for label in labels])
+        self.class_counts += np.bincount(label_ids, weights=weights, minlength=len(self.classes))
+        
+        # Count words per class: (classes x documents) @ (documents x vocab)
+        doc_word_counts = _count_matrix(documents, self.vocabulary)
+        doc_classes = sparse.csr_matrix(
+            (weights, (label_ids, np.arange(len(documents)))),
+            shape=(len(self.classes), len(documents))
+        )
+        self.word_counts += (doc_classes @ doc_word_counts).toarray()
+        
+        self._update_probabilities()
+    
+    def _update_probabilities(self):
+        """Recompute P(class) and log P(word|class) from the counts"""
+        total_docs = self.class_counts.sum()
+        self.class_probs = {
+            cls: float(count / total_docs) for cls, count in zip(self.classes, self.class_counts)
+        }
+        with np.errstate(divide='ignore'):
+            self.class_log_prior = np.log(self.class_counts / total_docs).astype(np.float32)
         
-        # Calculate P(word|class) with Laplace smoothing
+        # Calculate log P(word|class) with Laplace smoothing:
+        # (count + 1) / (total + vocab_size)
         vocab_size = len(self.vocabulary)
-        
-        for cls in self.classes:
-            for word in self.vocabulary:
-                word_count = word_counts_per_class[cls][word]
-                total_words = total_words_per_class[cls]
-                # Laplace smoothing: (count + 1) / (total + vocab_size)
-                self.word_probs[cls][word] = (word_count + 1) / (total_words + vocab_size)
+        totals = self.word_counts.sum(axis=1, keepdims=True)
+        self.feature_log_prob = (
+            np.log(self.word_counts + 1) - np.log(totals + vocab_size)
+        ).astype(np.float32)
+    
+    def _joint_log_likelihood(self, document: List[str]) -> np.ndarray:
+        """log P(class) + sum of log P(word|class) for known words"""
+        ids = [self.vocabulary[word] for word in document if word in self.vocabulary]
+        return self.class_log_prior + self.feature_log_prob[:, ids].sum(axis=1)
+    
+    @staticmethod
+    def _softmax(scores: np.ndarray) -> np.ndarray:
+        """Convert log scores to probabilities along the last axis"""
+        exp_scores = np.exp(scores - scores.max(axis=-1, keepdims=True))
+        return exp_scores / exp_scores.sum(axis=-1, keepdims=True)
     
     def predict(self, document: List[str]) -> Tuple[str, float]:
         """Predict class for document"""
-        class_scores = {}
-        
-        for cls in self.classes:
-            # Start with log probability of class
-            score = math.log(self.class_probs[cls])
-            
-            # Add log probabilities of words
-            for word in document:
-                if word in self.vocabulary:
-                    score += math.log(self.word_probs[cls][word])
-            
-            class_scores[cls] = score
-        
-        # Get class with highest score
-        predicted_class = max(class_scores, key=class_scores.get)
-        
-        # Convert log probabilities to probabilities
-        max_score = max(class_scores.values())
-        exp_scores = {cls: math.exp(score - max_score) for cls, score in class_scores.items()}
-        total = sum(exp_scores.values())
-        confidence = exp_scores[predicted_class] / total
-        
-        return predicted_class, confidence
+        probs = self._softmax(self._joint_log_likelihood(document))
+        best = int(np.argmax(probs))
+        return self.classes[best], float(probs[best])
     
     def predict_proba(self, document: List[str]) -> Dict[str, float]:
         """Get probability distribution over classes"""
-        class_scores = {}
-        
-        for cls in self.classes:
-            score = math.log(self.class_probs[cls])
-            for word in document:
-                if word in self.vocabulary:
-                    score += math.log(self.word_probs[cls][word])
-            class_scores[cls] = score
+        probs = self._softmax(self._joint_log_likelihood(document))
+        return {cls: float(p) for cls, p in zip(self.classes, probs)}
+    
+    def predict_batch(self, documents: List[List[str]]) -> List[Tuple[str, float]]:
+        """Predict classes for many documents with one sparse matrix product"""
+        if not documents:
+            return []
         
-        # Convert to probabilities
-        max_score = max(class_scores.values())
-        exp_scores = {cls: math.exp(score - max_score) for cls, score in class_scores.items()}
-        total = sum(exp_scores.values())
+        counts = _count_matrix(documents, self.vocabulary)
+        scores = np.asarray(counts @ self.feature_log_prob.T) + self.class_log_prior
+        probs = self._softmax(scores)
+        best = probs.argmax(axis=1)
         
-        return {cls: exp_score / total for cls, exp_score in exp_scores.items()}
+        return [(self.classes[i], float(probs[row, i])) for row, i in enumerate(best)]
 
 
 class SimpleSVM:
-    """Simplified SVM using gradient descent"""
+    """Simplified linear SVM trained with mini-batch gradient descent"""
     
-    def __init__(self, learning_rate: float = 0.001, lambda_param: float = 0.01, n_iterations: int = 1000):
+    def __init__(self, learning_rate: float = 0.001, lambda_param: float = 0.01, n_iterations: int = 1000,
+                 batch_size: int = 32, random_state: int = 42):
         self.learning_rate = learning_rate
         self.lambda_param = lambda_param
         self.n_iterations = n_iterations
-        self.weights = {}
-        self.bias = {}
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.weights = np.zeros((0, 0), dtype=np.float32)  # classes x vocab
+        self.bias = np.zeros(0, dtype=np.float32)
         self.classes = []
-        
-    def _create_feature_vector(self, document: List[str], vocabulary: List[str]) -> List[float]:
-        """Create feature vector from document"""
-        word_count = Counter(document)
-        return [word_count.get(word, 0) for word in vocabulary]
+        self.vocabulary = {}  # word -> column in weights
     
     def train(self, documents: List[List[str]], labels: List[str]):
-        """Train SVM using one-vs-rest approach"""
+        """Train SVM using one-vs-rest approach, all classes at once"""
         # Build vocabulary
-        vocabulary = sorted(set(word for doc in documents for word in doc))
+        self.vocabulary = {word: idx for idx, word in enumerate(sorted(set(word for doc in documents for word in doc)))}
         
         # Get unique classes
         self.classes = sorted(set(labels))
         
-        # Convert documents to feature vectors
-        X = [self._create_feature_vector(doc, vocabulary) for doc in documents]
-        n_features = len(vocabulary)
-        
-        # Train one classifier per class
-        for target_class in self.classes:
-            # Create binary labels (1 for target class, -1 for others)
-            y = [1 if label == target_class else -1 for label in labels]
-            
-            # Initialize weights
-            weights = [0.0] * n_features
-            bias = 0.0
-            
-            # Gradient descent
-            for iteration in range(self.n_iterations):
-                for i, x in enumerate(X):
-                    # Calculate margin
-                    margin = y[i] * (sum(w * xi for w, xi in zip(weights, x)) + bias)
-                    
-                    # Update weights
-                    if margin < 1:
-                        # Misclassified or within margin
-                        for j in range(n_features):
-                            weights[j] += self.learning_rate * (y[i] * x[j] - 2 * self.lambda_param * weights[j])
-                        bias += self.learning_rate * y[i]
-                    else:
-                        # Correctly classified
-                        for j in range(n_features):
-                            weights[j] += self.learning_rate * (-2 * self.lambda_param * weights[j])
-            
-            self.weights[target_class] = weights
-            self.bias[target_class] = bias
+        weights = np.zeros((len(self.classes), len(self.vocabulary)))
+        bias = np.zeros(len(self.classes))
+        rng = np.random.default_rng(self.random_state)
         
-        self.vocabulary = vocabulary
+        self._gradient_descent(documents, labels, weights, bias, self.n_iterations, rng)
     
-    def predict(self, document: List[str]) -> Tuple[str, float]:
-        """Predict class for document"""
-        x = self._create_feature_vector(document, self.vocabulary)
-        
-        scores = {}
-        for cls in self.classes:
-            score = sum(w * xi for w, xi in zip(self.weights[cls], x)) + self.bias[cls]
-            scores[cls] = score
+    def partial_fit(self, documents: List[List[str]], labels: List[str], n_epochs: int = 50,
+                    sample_weight: Optional[List[float]] = None):
+        """Continue training on new documents without starting over
+
+        New words and classes start with zero weights. sample_weight scales
+        each document's hinge-loss gradient.
+        """
+        if not documents:
+            return
+        
+        for cls in sorted(set(labels) - set(self.classes)):
+            self.classes.append(cls)
+        for doc in documents:
+            for word in doc:
+                if word not in self.vocabulary:
+                    self.vocabulary[word] = len(self.vocabulary)
         
-        predicted_class = max(scores, key=scores.get)
+        weights = _grow(self.weights.astype(np.float64), len(self.classes), len(self.vocabulary))
+        bias = np.pad(self.bias.astype(np.float64), (0, len(self.classes) - len(self.bias)))
+        rng = np.random.default_rng([self.random_state, len(documents), len(self.vocabulary)])
         
-        # Normalize scores to get confidence
-        max_score = max(scores.values())
-        min_score = min(scores.values())
+        self._gradient_descent(documents, labels, weights, bias, n_epochs, rng, sample_weight)
+    
+    def _gradient_descent(self, documents: List[List[str]], labels: List[str], weights: np.ndarray,
+                          bias: np.ndarray, n_epochs: int, rng: np.random.Generator,
+                          sample_weight: Optional[List[float]] = None):
+        """Run mini-batch gradient descent epochs and store the result"""
+        # Sparse design matrix and one-vs-rest targets (1 for the class, -1 for others)
+        X = _count_matrix(documents, self.vocabulary).astype(np.float64)
+        label_array = np.array(labels)
+        Y = np.where(label_array[:, None] == np.array(self.classes)[None, :], 1.0, -1.0)
+        if sample_weight is not None:
+            Y_weighted = Y * np.asarray(sample_weight, dtype=np.float64)[:, None]
+        else:
+            Y_weighted = Y
+        
+        n_samples = X.shape[0]
+        
+        # Mini-batch gradient descent on the hinge loss with L2 regularization.
+        # Gradients are summed over the batch so one epoch moves the weights
+        # as far as a pass of per-sample updates would.
+        for iteration in range(n_epochs):
+            order = rng.permutation(n_samples)
+            for start in range(0, n_samples, self.batch_size):
+                batch = order[start:start + self.batch_size]
+                X_batch = X[batch]
+                Y_batch = Y[batch]
+                
+                # Samples inside the margin contribute y * x
+                margins = Y_batch * (X_batch @ weights.T + bias)
+                active = np.where(margins < 1, Y_weighted[batch], 0.0)
+                
+                weights += self.learning_rate * (
+                    np.asarray(X_batch.T @ active).T - 2 * self.lambda_param * len(batch) * weights
+                )
+                bias += self.learning_rate * active.sum(axis=0)
+        
+        self.weights = weights.astype(np.float32)
+        self.bias = bias.astype(np.float32)
+    
+    def _confidence(self, scores: np.ndarray) -> Tuple[int, float]:
+        """Pick the best class and min-max normalize its score"""
+        best = int(np.argmax(scores))
+        max_score = scores.max()
+        min_score = scores.min()
         if max_score != min_score:
-            confidence = (scores[predicted_class] - min_score) / (max_score - min_score)
+            confidence = (scores[best] - min_score) / (max_score - min_score)
         else:
             confidence = 1.0 / len(self.classes)
-        
-        return predicted_class, confidence
+        return best, float(confidence)
+    
+    def decision_function(self, document: List[str]) -> np.ndarray:
+        """Sparse dot product of the document's word counts with every class"""
+        ids = [self.vocabulary[word] for word in document if word in self.vocabulary]
+        return self.weights[:, ids].sum(axis=1) + self.bias
+    
+    def predict(self, document: List[str]) -> Tuple[str, float]:
+        """Predict class for document"""
+        best, confidence = self._confidence(self.decision_function(document))
+        return self.classes[best], confidence
+    
+    def predict_batch(self, documents: List[List[str]]) -> List[Tuple[str, float]]:
+        """Predict classes for many documents with one sparse matrix product"""
+        if not documents:
+            return []
+        
+        scores = np.asarray(_count_matrix(documents, self.vocabulary) @ self.weights.T) + self.bias
+        results = []
+        for row in scores:
+            best, confidence = self._confidence(row)
+            results.append((self.classes[best], confidence))
+        return results
 
 
 class IntentClassifier:
     """Main intent classifier combining multiple algorithms"""
     
-    def __init__(self):
-        self.preprocessor = NLPPreprocessor()
-        self.naive_bayes = NaiveBayesClassifier()
-        self.svm = SimpleSVM()
+    def __init__(self, cascade: bool = False, preprocessor: Optional[NLPPreprocessor] = None):
+        self.preprocessor = preprocessor or NLPPreprocessor()
+        # Both models live in one tuple so an update can swap them in together
+        self._models = (NaiveBayesClassifier(), SimpleSVM())
+        self._update_lock = threading.Lock()
         self.trained = False
+        self.cascade = cascade
+        
+        self.rule_engine = DEFAULT_RULE_ENGINE
+        
+        # Cascade exit counters, shared across request threads
+        self._stats_lock = threading.Lock()
+        self._stage_exits = Counter()
         
         # Define intents
         self.intent_definitions = {
@@ -217,10 +354,37 @@ class IntentClassifier:
             }
         }
     
-    def train_from_examples(self):
-        """Train classifiers with example data"""
-        # Training examples
-        training_data = [
+    @property
+    def naive_bayes(self) -> NaiveBayesClassifier:
+        return self._models[0]
+    
+    @property
+    def svm(self) -> SimpleSVM:
+        return self._models[1]
+    
+    def swap_models(self, naive_bayes: NaiveBayesClassifier, svm: SimpleSVM):
+        """Replace both models at once; requests already running keep the old pair"""
+        self._models = (naive_bayes, svm)
+        self.trained = True
+    
+    def partial_fit(self, documents: List[List[str]], labels: List[str],
+                    sample_weight: Optional[List[float]] = None):
+        """Update copies of both models with new examples, then swap them in"""
+        if not documents:
+            return
+        
+        if not self.trained:
+            self.train_from_examples()
+        
+        with self._update_lock:
+            naive_bayes, svm = copy.deepcopy(self._models)
+            naive_bayes.partial_fit(documents, labels, sample_weight=sample_weight)
+            svm.partial_fit(documents, labels, sample_weight=sample_weight)
+            self.swap_models(naive_bayes, svm)
+    
+    def _example_training_data(self) -> List[Tuple[List[str], str]]:
+        """Built-in training examples"""
+        return [
             # Search by title
             (['find', 'avenger', 'movie'], 'search_by_title'),
             (['search', 'spider', 'man'], 'search_by_title'),
@@ -264,26 +428,104 @@ class IntentClassifier:
             (['dien', 'vien', 'brad', 'pitt'], 'search_by_actor'),
             (['starring', 'robert', 'downey'], 'search_by_actor'),
         ]
+    
+    def training_fingerprint(self) -> str:
+        """Hash of the training examples and hyperparameters a saved model was built from"""
+        payload = {
+            'examples': self._example_training_data(),
+            'svm': [self.svm.learning_rate, self.svm.lambda_param, self.svm.n_iterations,
+                    self.svm.batch_size, self.svm.random_state]
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+    
+    def train_from_examples(self):
+        """Train classifiers with example data"""
+        training_data = self._example_training_data()
         
         documents = [doc for doc, _ in training_data]
         labels = [label for _, label in training_data]
         
         # Train both classifiers
-        self.naive_bayes.train(documents, labels)
-        self.svm.train(documents, labels)
-        self.trained = True
+        naive_bayes = NaiveBayesClassifier()
+        svm = SimpleSVM()
+        naive_bayes.train(documents, labels)
+        svm.train(documents, labels)
+        self.swap_models(naive_bayes, svm)
     
-    def classify_intent(self, text: str) -> Dict[str, Any]:
-        """Classify intent of user query"""
+    def classify_intent(self, text: str, cascade: Optional[bool] = None) -> Dict[str, Any]:
+        """Classify intent of user query
+
+        In cascade mode an unambiguous rule match is returned directly and
+        the statistical models only run for the remaining queries.
+        """
+        if cascade is None:
+            cascade = self.cascade
+        
         # Preprocess text
         tokens = self.preprocessor.preprocess(text)
         
+        if cascade:
+            rule_result = self._classify_by_rules(tokens)
+            if rule_result is not None:
+                self._record_exit('rules')
+                return rule_result
+        
         if not self.trained:
             self.train_from_examples()
         
         # Get predictions from both classifiers
-        nb_intent, nb_confidence = self.naive_bayes.predict(tokens)
-        svm_intent, svm_confidence = self.svm.predict(tokens)
+        naive_bayes, svm = self._models
+        nb_prediction = naive_bayes.predict(tokens)
+        svm_prediction = svm.predict(tokens)
+        
+        if cascade:
+            self._record_exit('models')
+        return self._combine_predictions(tokens, nb_prediction, svm_prediction)
+    
+    def classify_batch(self, texts: List[str], cascade: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """Classify many queries at once, returning results in input order"""
+        if cascade is None:
+            cascade = self.cascade
+        
+        # Preprocess each distinct text once; batches from logs repeat a lot
+        unique_texts = list(dict.fromkeys(texts))
+        documents = [self.preprocessor.preprocess(text) for text in unique_texts]
+        
+        results_by_text = {}
+        if cascade:
+            for text, tokens in zip(unique_texts, documents):
+                rule_result = self._classify_by_rules(tokens)
+                if rule_result is not None:
+                    results_by_text[text] = rule_result
+        
+        # Score the remaining documents with one matrix product per classifier
+        pending = [(text, tokens) for text, tokens in zip(unique_texts, documents) if text not in results_by_text]
+        if pending:
+            if not self.trained:
+                self.train_from_examples()
+            
+            naive_bayes, svm = self._models
+            pending_documents = [tokens for _, tokens in pending]
+            nb_predictions = naive_bayes.predict_batch(pending_documents)
+            svm_predictions = svm.predict_batch(pending_documents)
+            
+            for (text, tokens), nb_prediction, svm_prediction in zip(pending, nb_predictions, svm_predictions):
+                results_by_text[text] = self._combine_predictions(tokens, nb_prediction, svm_prediction)
+        
+        results = [results_by_text[text] for text in texts]
+        
+        if cascade:
+            rule_exits = sum(1 for result in results if result['stage'] == 'rules')
+            self._record_exit('rules', rule_exits)
+            self._record_exit('models', len(results) - rule_exits)
+        
+        return results
+    
+    def _combine_predictions(self, tokens: List[str], nb_prediction: Tuple[str, float],
+                             svm_prediction: Tuple[str, float]) -> Dict[str, Any]:
+        """Ensemble Naive Bayes, SVM and rule-based predictions"""
+        nb_intent, nb_confidence = nb_prediction
+        svm_intent, svm_confidence = svm_prediction
         
         # Ensemble: average confidence
         if nb_intent == svm_intent:
@@ -304,7 +546,7 @@ class IntentClassifier:
         # If rule-based is confident, use it
         if rule_based_intent and final_confidence < 0.7:
             final_intent = rule_based_intent
-            final_confidence = 0.8
+            final_confidence = RULE_CONFIDENCE
         
         return {
             'intent': final_intent,
@@ -312,83 +554,151 @@ class IntentClassifier:
             'naive_bayes': {'intent': nb_intent, 'confidence': nb_confidence},
             'svm': {'intent': svm_intent, 'confidence': svm_confidence},
             'rule_based': rule_based_intent,
-            'tokens': tokens
+            'tokens': tokens,
+            'stage': 'models'
         }
     
     def _rule_based_classification(self, tokens: List[str]) -> str:
         """Rule-based intent classification"""
-        token_set = set(tokens)
-        
-        # Check for year patterns
-        if any(token.isdigit() and len(token) == 4 for token in tokens):
-            return 'search_by_year'
-        
-        # Check for genre keywords
-        genre_keywords = {'action', 'comedy', 'horror', 'romance', 'thriller', 'drama', 'scifi'}
-        if token_set & genre_keywords:
-            return 'search_by_genre'
-        
-        # Check for popularity keywords
-        popularity_keywords = {'popular', 'trending', 'hot', 'pho', 'bien'}
-        if token_set & popularity_keywords:
-            return 'search_popular'
-        
-        # Check for rating keywords
-        rating_keywords = {'best', 'top', 'hay', 'nhat', 'good', 'great'}
-        if token_set & rating_keywords:
-            return 'search_high_rating'
-        
-        # Check for similarity keywords
-        similarity_keywords = {'similar', 'like', 'tuong', 'tu', 'giong'}
-        if token_set & similarity_keywords:
-            return 'search_similar'
-        
-        # Check for actor keywords
-        actor_keywords = {'actor', 'actress', 'dien', 'vien', 'starring', 'cast'}
-        if token_set & actor_keywords:
-            return 'search_by_actor'
+        # Highest-priority rule wins; defaults to title search
+        return self.rule_engine.decide(tokens).intent
+    
+    def unambiguous_rule_intent(self, tokens: List[str]) -> Optional[str]:
+        """The rule intent if exactly one rule fires, else None"""
+        matched = self.rule_engine.decide(tokens).intents
+        return matched[0] if len(matched) == 1 else None
+    
+    def _classify_by_rules(self, tokens: List[str]) -> Optional[Dict[str, Any]]:
+        """Cascade first stage: answer from rules alone when exactly one rule fires"""
+        intent = self.unambiguous_rule_intent(tokens)
+        if intent is None:
+            return None
         
-        # Default to title search
-        return 'search_by_title'
+        return {
+            'intent': intent,
+            'confidence': RULE_CONFIDENCE,
+            'naive_bayes': None,
+            'svm': None,
+            'rule_based': intent,
+            'tokens': tokens,
+            'stage': 'rules'
+        }
+    
+    def _record_exit(self, stage: str, count: int = 1):
+        """Count which cascade stage answered"""
+        with self._stats_lock:
+            self._stage_exits[stage] += count
+    
+    def cascade_metrics(self) -> Dict[str, Any]:
+        """Per-stage exit counts and rates for cascade classification"""
+        with self._stats_lock:
+            exits = {stage: self._stage_exits[stage] for stage in CASCADE_STAGES}
+        total = sum(exits.values())
+        return {
+            'total': total,
+            'exits': exits,
+            'exit_rates': {stage: (count / total if total else 0.0) for stage, count in exits.items()}
+        }
     
     def save_model(self, filepath: str):
-        """Save trained model"""
-        model_data = {
-            'naive_bayes': {
-                'class_probs': self.naive_bayes.class_probs,
-                'word_probs': dict(self.naive_bayes.word_probs),
-                'vocabulary': list(self.naive_bayes.vocabulary),
-                'classes': list(self.naive_bayes.classes)
-            },
-            'svm': {
-                'weights': self.svm.weights,
-                'bias': self.svm.bias,
-                'classes': self.svm.classes,
-                'vocabulary': self.svm.vocabulary if hasattr(self.svm, 'vocabulary') else []
-            }
+        """Save trained model as a versioned binary (.npz) artifact"""
+        naive_bayes, svm = self._models
+        arrays = {
+            'nb_classes': np.array(naive_bayes.classes),
+            'nb_class_counts': naive_bayes.class_counts,
+            'nb_word_counts': naive_bayes.word_counts,
+            'nb_class_log_prior': naive_bayes.class_log_prior,
+            'nb_feature_log_prob': naive_bayes.feature_log_prob,
+            'nb_vocabulary': _vocabulary_array(naive_bayes.vocabulary),
+            'svm_classes': np.array(svm.classes),
+            'svm_weights': svm.weights,
+            'svm_bias': svm.bias,
+            'svm_vocabulary': _vocabulary_array(svm.vocabulary),
+        }
+        metadata = {
+            'format_version': np.array(MODEL_FORMAT_VERSION),
+            'training_fingerprint': np.array(self.training_fingerprint()),
+            'checksum': np.array(_artifact_checksum(arrays)),
         }
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(model_data, f, ensure_ascii=False, indent=2)
+        # Write to a temporary file first so readers never see a partial artifact
+        directory = os.path.dirname(os.path.abspath(filepath))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{filepath}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays, **metadata)
+        os.replace(tmp_path, filepath)
     
     def load_model(self, filepath: str):
-        """Load trained model"""
-        with open(filepath, 'r', encoding='utf-8') as f:
-            model_data = json.load(f)
+        """Load a model saved by save_model
+
+        Raises ValueError if the artifact is corrupt, from another format
+        version, or was trained on different examples.
+        """
+        try:
+            with np.load(filepath, allow_pickle=False) as artifact:
+                model_data = {key: artifact[key] for key in artifact.files}
+        except (zipfile.BadZipFile, EOFError) as e:
+            # A truncated or partly copied archive
+            raise ValueError(f"Intent model artifact is corrupt: {e}")
+        
+        try:
+            format_version = int(model_data.pop('format_version'))
+            training_fingerprint = str(model_data.pop('training_fingerprint'))
+            checksum = str(model_data.pop('checksum'))
+        except KeyError as e:
+            raise ValueError(f"Intent model artifact is missing {e}")
+        
+        if format_version != MODEL_FORMAT_VERSION:
+            raise ValueError(
+                f"Intent model artifact has format version {format_version}, expected {MODEL_FORMAT_VERSION}"
+            )
+        if checksum != _artifact_checksum(model_data):
+            raise ValueError("Intent model artifact checksum mismatch")
+        if training_fingerprint != self.training_fingerprint():
+            raise ValueError("Intent model artifact is stale (training data changed)")
         
         # Load Naive Bayes
-        self.naive_bayes.class_probs = model_data['naive_bayes']['class_probs']
-        self.naive_bayes.word_probs = defaultdict(lambda: defaultdict(float), model_data['naive_bayes']['word_probs'])
-        self.naive_bayes.vocabulary = set(model_data['naive_bayes']['vocabulary'])
-        self.naive_bayes.classes = set(model_data['naive_bayes']['classes'])
+        naive_bayes = NaiveBayesClassifier()
+        naive_bayes.classes = model_data['nb_classes'].tolist()
+        naive_bayes.class_counts = model_data['nb_class_counts']
+        naive_bayes.word_counts = model_data['nb_word_counts']
+        naive_bayes.class_log_prior = model_data['nb_class_log_prior']
+        naive_bayes.class_probs = {
+            cls: float(np.exp(log_prior))
+            for cls, log_prior in zip(naive_bayes.classes, naive_bayes.class_log_prior)
+        }
+        naive_bayes.feature_log_prob = model_data['nb_feature_log_prob']
+        naive_bayes.vocabulary = _vocabulary_dict(model_data['nb_vocabulary'])
         
         # Load SVM
-        self.svm.weights = model_data['svm']['weights']
-        self.svm.bias = model_data['svm']['bias']
-        self.svm.classes = model_data['svm']['classes']
-        self.svm.vocabulary = model_data['svm']['vocabulary']
+        svm = SimpleSVM()
+        svm.classes = model_data['svm_classes'].tolist()
+        svm.weights = model_data['svm_weights']
+        svm.bias = model_data['svm_bias']
+        svm.vocabulary = _vocabulary_dict(model_data['svm_vocabulary'])
         
-        self.trained = True
+        self.swap_models(naive_bayes, svm)
+    
+    def load_or_train(self, filepath: str) -> bool:
+        """Load a prebuilt artifact, or train from examples and save one
+
+        Returns True if the artifact was loaded, False if the model was retrained.
+        """
+        try:
+            self.load_model(filepath)
+            return True
+        except FileNotFoundError:
+            print(f"⚠️ Intent model not found at {filepath}. Training from examples...")
+        except (ValueError, OSError) as e:
+            print(f"⚠️ Could not use intent model at {filepath} ({e}). Retraining...")
+        
+        self.train_from_examples()
+        try:
+            self.save_model(filepath)
+        except OSError as e:
+            print(f"⚠️ Could not save intent model to {filepath}: {e}")
+        return False
 
 
 # Example usage
@@ -0,0 +1,190 @@
+"""
+Language Detection Module
+Local Vietnamese/English detection for search queries, so English queries
+never reach the translator
+"""
+
+import re
+import math
+import unicodedata
+from collections import Counter
+from typing import List, Dict, Set, Iterable, Optional
+
+from nlp_preprocessing import VietnameseTokenizer, StopWordsRemover, VIETNAMESE_GENRE_MAP
+from nlp_translation import DOMAIN_LEXICON, MODIFIER_LEXICON
+
+
+# Letters only Vietnamese uses; one of them decides the language on its own
+VIETNAMESE_DIACRITICS = frozenset(VietnameseTokenizer().vietnamese_chars) - set('aeiouy')
+
+# Syllable table for Vietnamese written without accents: onset + rhyme
+ONSETS = ('ngh', 'ng', 'gh', 'gi', 'kh', 'nh', 'ph', 'qu', 'th', 'tr', 'ch',
+          'b', 'c', 'd', 'g', 'h', 'k', 'l', 'm', 'n', 'p', 'r', 's', 't', 'v', 'x')
+RHYMES = frozenset("""
+    a ac ach ai am an ang anh ao ap at au ay
+    e ec ech em en eng enh eo ep et eu
+    i ia ich iec iem ien iep iet ieu im in inh ip it iu
+    o oa oac oach oai oan oang oanh oao oap oat oay oc oe oem oen oeo oet oi om on ong oo ooc op ot
+    u ua uan uang uat uay uc ue uen uet ui um un ung uoc uoi uom uon uong uop uot up ut uu
+    uy uya uych uyen uyet uynh uyt uyu
+    y yem yen yet yeu
+""".split())
+SYLLABLE_PATTERN = re.compile(
+    r'^(?:%s)?(?:%s)$' % ('|'.join(ONSETS), '|'.join(sorted(RHYMES, key=len, reverse=True)))
+)
+
+# Telex input typed without an IME: doubled letters and w mark vowels, a trailing key marks the tone
+TELEX_MARKS = re.compile(r'dd|aa|aw|ee|oo|ow|uw|w')
+TELEX_TONES = 'sfrxj'
+
+WORD_PATTERN = re.compile(r'[^\W\d_]+')
+
+# Sample queries that train the character n-gram profiles next to the lexicons
+VIETNAMESE_SAMPLES = (
+    "tim phim hanh dong moi nhat", "phim kinh di hay nhat nam nay", "phim hoat hinh cho tre em",
+    "cho toi xem phim tinh cam han quoc", "phim ve chien tranh viet nam", "phim hai huoc gia dinh",
+    "goi y phim khoa hoc vien tuong", "phim co dien vien chinh la ai", "toi muon xem phim bo trung quoc",
+    "nhung bo phim duoc danh gia cao", "phim chieu rap thang nay", "phim ma kinh di thai lan",
+    "phim sieu anh hung moi ra mat", "phim ve tinh ban va tinh yeu", "phim tai lieu ve thien nhien",
+)
+ENGLISH_SAMPLES = (
+    "find action movies from last year", "best horror films of all time", "funny comedy for the whole family",
+    "movies like the dark knight", "show me new releases this week", "top rated sci-fi thriller",
+    "romantic drama with a happy ending", "films directed by christopher nolan", "animated movies for kids",
+    "war movie based on a true story", "what should i watch tonight", "highest grossing superhero movies",
+    "space adventure with aliens and robots", "crime thriller about a bank heist", "classic western movies",
+)
+
+
+def strip_accents(text: str) -> str:
+    """Lowercase text with Vietnamese diacritics removed (đ becomes d)"""
+    text = unicodedata.normalize('NFD', text.lower().replace('đ', 'd'))
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def is_syllable(word: str) -> bool:
+    """Whether an unaccented word is a well-formed Vietnamese syllable"""
+    return SYLLABLE_PATTERN.match(word) is not None
+
+
+def telex_syllable(word: str) -> Optional[str]:
+    """The plain syllable a Telex-typed word spells, or None if it is not one"""
+    stripped = word[:-1] if len(word) > 1 and word[-1] in TELEX_TONES else word
+    decoded = TELEX_MARKS.sub(lambda match: 'u' if match.group() == 'w' else match.group()[0], stripped)
+    if decoded != word and is_syllable(decoded):
+        return decoded
+    return None
+
+
+class CharNgramProfile:
+    """Add-one smoothed character trigram log-probabilities of one language"""
+
+    def __init__(self, texts: Iterable[str], n: int = 3):
+        self.n = n
+        self.counts = Counter()
+        for text in texts:
+            for word in WORD_PATTERN.findall(text.lower()):
+                self.counts.update(self.ngrams(word))
+        self.total = sum(self.counts.values())
+        self.unseen = math.log(1 / (self.total + len(self.counts) + 1))
+
+    def ngrams(self, word: str) -> List[str]:
+        padded = f' {word} '
+        return [padded[i:i + self.n] for i in range(max(1, len(padded) - self.n + 1))]
+
+    def log_probability(self, word: str) -> float:
+        denominator = self.total + len(self.counts) + 1
+        return sum(
+            math.log((self.counts[gram] + 1) / denominator) if gram in self.counts else self.unseen
+            for gram in self.ngrams(word)
+        )
+
+
+class LanguageDetector:
+    """Decide whether a query is Vietnamese or English without a network call
+
+    A Vietnamese letter settles it at once. Otherwise every word votes: words
+    only one vocabulary knows vote for it, words that cannot be a Vietnamese
+    syllable (plain or Telex) vote English, and the rest vote by comparing the
+    character n-gram profiles of the two languages.
+    """
+
+    def __init__(self, vietnamese_texts: Iterable[str] = (), english_texts: Iterable[str] = ()):
+        english_stopwords = StopWordsRemover().english_stopwords
+        vietnamese = [strip_accents(text) for text in
+                      [*DOMAIN_LEXICON, *MODIFIER_LEXICON, *VIETNAMESE_GENRE_MAP, *VIETNAMESE_SAMPLES, *vietnamese_texts]]
+        english = [*DOMAIN_LEXICON.values(), *MODIFIER_LEXICON.values(), *VIETNAMESE_GENRE_MAP.values(),
+                   *english_stopwords, *ENGLISH_SAMPLES, *english_texts]
+
+        self.vietnamese_profile = CharNgramProfile(vietnamese)
+        self.english_profile = CharNgramProfile(english)
+        vietnamese_words = self._vocabulary(vietnamese)
+        english_words = self._vocabulary(english)
+        self.vietnamese_words: Set[str] = vietnamese_words - english_words
+        self.english_words: Set[str] = english_words - vietnamese_words
+
+    @staticmethod
+    def _vocabulary(texts: Iterable[str]) -> Set[str]:
+        return {word for text in texts for word in WORD_PATTERN.findall(text.lower())}
+
+    def word_score(self, word: str) -> float:
+        """Evidence in [-1, 1] that a lowercase ascii word is Vietnamese (positive) or English"""
+        if word in self.vietnamese_words:
+            return 1.0
+        if word in self.english_words:
+            return -1.0
+        if not is_syllable(word):
+            decoded = telex_syllable(word)
+            if decoded is None:
+                return -1.0
+            if decoded in self.vietnamese_words or TELEX_MARKS.search(word):
+                return 1.0
+        ratio = self.vietnamese_profile.log_probability(word) - self.english_profile.log_probability(word)
+        return max(-1.0, min(1.0, ratio / 4))
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Vietnamese and English evidence summed over the words of text"""
+        vietnamese = english = 0.0
+        for word in WORD_PATTERN.findall(text.lower()):
+            score = self.word_score(word)
+            if score > 0:
+                vietnamese += score
+            else:
+                english -= score
+        return {'vi': vietnamese, 'en': english}
+
+    def detect(self, text: str) -> str:
+        """'vi' or 'en'; text without letters counts as English"""
+        text = text.lower()
+        if any(char in VIETNAMESE_DIACRITICS for char in text):
+            return 'vi'
+        scores = self.scores(text)
+        return 'vi' if scores['vi'] > scores['en'] else 'en'
+
+    def is_english(self, text: str) -> bool:
+        return self.detect(text) == 'en'
+
+
+# Example usage
+if __name__ == "__main__":
+    import time
+
+    detector = LanguageDetector()
+    queries = [
+        "Find action movies from 2024",
+        "tìm phim hành động mới nhất",
+        "tim phim hanh dong moi nhat",
+        "phimf hanhf ddoongj",
+        "best comedy films",
+        "phim kinh di thai lan",
+        "the dark knight",
+        "avatar",
+    ]
+    for query in queries:
+        print(f"{detector.detect(query)}  {query}")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        for query in queries:
+            detector.detect(query)
+    print(f"✅ {(time.perf_counter() - start) / (1000 * len(queries)) * 1e6:.1f}µs per query")
@@ -3,17 +3,92 @@ Named Entity Recognition (NER) Module
 Custom implementation for recognizing movie-related entities
 """
 
+import os
 import re
-from typing import List, Dict, Tuple, Set
+from typing import List, Dict, Tuple, Set, Optional, Any, NamedTuple, Iterable
 from collections import defaultdict
+
+import numpy as np
+from scipy import sparse
+
 from nlp_preprocessing import NLPPreprocessor
+from nlp_rules import DEFAULT_RULE_ENGINE, RuleDecision
+from nlp_gazetteer import AhoCorasickMatcher, CatalogGazetteer, normalize_name
+from nlp_phonetic import PhoneticIndex, strip_accents
+from nlp_translation import DOMAIN_LEXICON, MODIFIER_LEXICON
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Catalog people/title table built from the movie dataset (see CatalogGazetteer.build)
+CATALOG_GAZETTEER_PATH = os.getenv("CATALOG_GAZETTEER_PATH", os.path.join(_DATA_DIR, "catalog_gazetteer.bin"))
+# Phonetic keys of the catalog names (see PhoneticIndex.load_or_build)
+PHONETIC_INDEX_PATH = os.getenv("PHONETIC_INDEX_PATH", os.path.join(_DATA_DIR, "phonetic_index.bin"))
+
+# Everyday words of movie searches; with the stopwords and lexicons they are
+# never read as a misheard name ('movies at night' is not 'amy night')
+COMMON_QUERY_WORDS = {
+    'movie', 'movies', 'film', 'films', 'show', 'shows', 'series', 'season', 'episode', 'trailer',
+    'watch', 'see', 'find', 'search', 'play', 'recommend', 'want', 'like', 'love', 'need', 'look', 'looking',
+    'today', 'tonight', 'night', 'day', 'week', 'weekend', 'month', 'year', 'years', 'time', 'now',
+    'dark', 'light', 'funny', 'scary', 'sad', 'happy', 'great', 'nice', 'fun', 'long', 'short',
+    'kids', 'kid', 'family', 'friends', 'people', 'story', 'stories', 'life', 'world', 'home',
+    'about', 'something', 'anything', 'please', 'english', 'vietnamese', 'subtitle', 'subtitles',
+}
+
+
+# Vietnamese to English genre mapping
+GENRE_MAPPING = {
+    'hành động': 'action',
+    'hanh dong': 'action',
+    'phiêu lưu': 'adventure',
+    'phieu luu': 'adventure',
+    'hoạt hình': 'animation',
+    'hoat hinh': 'animation',
+    'hài': 'comedy',
+    'hai': 'comedy',
+    'hài kịch': 'comedy',
+    'tội phạm': 'crime',
+    'toi pham': 'crime',
+    'tài liệu': 'documentary',
+    'tai lieu': 'documentary',
+    'chính kịch': 'drama',
+    'chinh kich': 'drama',
+    'gia đình': 'family',
+    'gia dinh': 'family',
+    'viễn tưởng': 'fantasy',
+    'vien tuong': 'fantasy',
+    'lịch sử': 'history',
+    'lich su': 'history',
+    'kinh dị': 'horror',
+    'kinh di': 'horror',
+    'ma': 'horror',
+    'âm nhạc': 'music',
+    'am nhac': 'music',
+    'bí ẩn': 'mystery',
+    'bi an': 'mystery',
+    'lãng mạn': 'romance',
+    'lang man': 'romance',
+    'tình cảm': 'romance',
+    'tinh cam': 'romance',
+    'khoa học viễn tưởng': 'scifi',
+    'khoa hoc vien tuong': 'scifi',
+    'thể thao': 'sport',
+    'the thao': 'sport',
+    'gay cấn': 'thriller',
+    'gay can': 'thriller',
+    'chiến tranh': 'war',
+    'chien tranh': 'war',
+    'cao bồi': 'western',
+    'cao boi': 'western',
+}
 
 
 class EntityRecognizer:
     """Custom NER for movie domain"""
     
-    def __init__(self):
-        self.preprocessor = NLPPreprocessor()
+    def __init__(self, catalog_path: Optional[str] = None, phonetic_path: Optional[str] = None,
+                 preprocessor: Optional[NLPPreprocessor] = None):
+        self.preprocessor = preprocessor or NLPPreprocessor()
         
         # Movie genres (English)
         self.genres = {
@@ -24,50 +99,7 @@ class EntityRecognizer:
         }
         
         # Vietnamese to English genre mapping
-        self.genre_mapping = {
-            'hành động': 'action',
-            'hanh dong': 'action',
-            'phiêu lưu': 'adventure',
-            'phieu luu': 'adventure',
-            'hoạt hình': 'animation',
-            'hoat hinh': 'animation',
-            'hài': 'comedy',
-            'hai': 'comedy',
-            'hài kịch': 'comedy',
-            'tội phạm': 'crime',
-            'toi pham': 'crime',
-            'tài liệu': 'documentary',
-            'tai lieu': 'documentary',
-            'chính kịch': 'drama',
-            'chinh kich': 'drama',
-            'gia đình': 'family',
-            'gia dinh': 'family',
-            'viễn tưởng': 'fantasy',
-            'vien tuong': 'fantasy',
-            'lịch sử': 'history',
-            'lich su': 'history',
-            'kinh dị': 'horror',
-            'kinh di': 'horror',
-            'ma': 'horror',
-            'âm nhạc': 'music',
-            'am nhac': 'music',
-            'bí ẩn': 'mystery',
-            'bi an': 'mystery',
-            'lãng mạn': 'romance',
-            'lang man': 'romance',
-            'tình cảm': 'romance',
-            'tinh cam': 'romance',
-            'khoa học viễn tưởng': 'scifi',
-            'khoa hoc vien tuong': 'scifi',
-            'thể thao': 'sport',
-            'the thao': 'sport',
-            'gay cấn': 'thriller',
-            'gay can': 'thriller',
-            'chiến tranh': 'war',
-            'chien tranh': 'war',
-            'cao bồi': 'western',
-            'cao boi': 'western',
-        }
+        self.genre_mapping = dict(GENRE_MAPPING)
         
         # Time-related keywords
         self.time_keywords = {
@@ -121,96 +153,122 @@ class EntityRecognizer:
             'ngo thanh van', 'ngô thanh vân', 'ly hai', 'lý hải'
         }
         
-        # Common speech recognition errors mapping
-        self.name_corrections = {
-            'non': 'nolan',
-            'chrystal non': 'christopher nolan',
-            'crystal non': 'christopher nolan',
-            'no lan': 'nolan',
-            'tom crew': 'tom cruise',
-            'tom cruz': 'tom cruise',
-            'leo dicaprio': 'leonardo dicaprio',
-            'leo di caprio': 'leonardo dicaprio',
-            'robert downey': 'robert downey jr',
-            'chris evan': 'chris evans',
-            'chris hemsworth': 'chris hemsworth',
+        self.gazetteer = self._build_gazetteer()
+        
+        # Every director, cast member and title in the catalog (memory-mapped, optional)
+        self.catalog = self._open_catalog(catalog_path or CATALOG_GAZETTEER_PATH)
+        
+        # Words that announce a person, and which kind of person
+        self.person_cues = {
+            ('dao', 'dien'): CatalogGazetteer.DIRECTOR,
+            ('director',): CatalogGazetteer.DIRECTOR,
+            ('dien', 'vien'): CatalogGazetteer.ACTOR,
+            ('actor',): CatalogGazetteer.ACTOR,
+            ('actress',): CatalogGazetteer.ACTOR,
+            ('starring',): CatalogGazetteer.ACTOR,
         }
+        
+        # Words of ordinary queries, which only a cue lets into a misheard name
+        self.common_words = self._build_common_words()
+        
+        # Sounds-like lookup for misheard names ('crystal non' -> christopher nolan)
+        self.phonetic_indexes = [
+            PhoneticIndex.from_names((person, CatalogGazetteer.PERSON) for person in self.famous_people)
+        ]
+        if self.catalog is not None:
+            phonetic_path = phonetic_path or PHONETIC_INDEX_PATH
+            if os.path.exists(phonetic_path):
+                try:
+                    self.phonetic_indexes.append(PhoneticIndex.open(phonetic_path))
+                except ValueError as e:
+                    print(f"⚠️ Ignoring phonetic index: {e}")
+    
+    def _open_catalog(self, path: str) -> Optional[CatalogGazetteer]:
+        if not os.path.exists(path):
+            return None
+        try:
+            return CatalogGazetteer.open(path)
+        except ValueError as e:
+            print(f"⚠️ Ignoring catalog gazetteer: {e}")
+            return None
+    
+    def _build_common_words(self) -> Set[str]:
+        """Unaccented words of the stopwords, keyword dictionaries and translation lexicons"""
+        phrases = [
+            *self.preprocessor.stopwords_remover.all_stopwords, *COMMON_QUERY_WORDS,
+            *self.genres, *self.genre_mapping, *self.time_keywords, *self.rating_keywords,
+            *self.popularity_keywords, *DOMAIN_LEXICON, *DOMAIN_LEXICON.values(),
+            *MODIFIER_LEXICON, *MODIFIER_LEXICON.values(),
+        ]
+        return {strip_accents(word) for phrase in phrases for word in normalize_name(phrase).split()}
+    
+    def _build_gazetteer(self) -> AhoCorasickMatcher:
+        """Compile every keyword dictionary into one automaton"""
+        gazetteer = AhoCorasickMatcher()
+        
+        for genre in self.genres:
+            gazetteer.add(genre, ('genres', genre))
+        for viet_genre, eng_genre in self.genre_mapping.items():
+            gazetteer.add(viet_genre, ('genres', eng_genre))
+        for keyword in self.time_keywords:
+            gazetteer.add(keyword, ('time_expressions', keyword))
+        for keyword in self.rating_keywords:
+            gazetteer.add(keyword, ('rating_expressions', keyword))
+        for keyword in self.popularity_keywords:
+            gazetteer.add(keyword, ('popularity_expressions', keyword))
+        for person in self.famous_people:
+            gazetteer.add(person, ('people', person))
+        
+        gazetteer.build()
+        return gazetteer
     
     def extract_entities(self, text: str) -> Dict[str, List[str]]:
         """Extract all entities from text"""
         text_lower = text.lower()
         
-        # Apply name corrections first
-        for wrong, correct in self.name_corrections.items():
-            if wrong in text_lower:
-                text_lower = text_lower.replace(wrong, correct)
-        
         entities = {
             'genres': [],
             'years': [],
             'titles': [],
             'people': [],
+            'sounds_like_people': [],  # people only matched by sound, without a cue
             'time_expressions': [],
             'rating_expressions': [],
             'popularity_expressions': []
         }
         
-        # Extract genres (English)
-        for genre in self.genres:
-            if genre in text_lower:
-                entities['genres'].append(genre)
-        
-        # Extract genres (Vietnamese → English)
-        for viet_genre, eng_genre in self.genre_mapping.items():
-            if viet_genre in text_lower:
-                if eng_genre not in entities['genres']:
-                    entities['genres'].append(eng_genre)
+        # Genres (English and Vietnamese), time/rating/popularity keywords
+        # and people all come from one scan
+        matched_words = set()
+        for _, _, phrase, payloads in self.gazetteer.find_all(text_lower):
+            matched_words.update(phrase.split())
+            for entity_type, value in payloads:
+                if value not in entities[entity_type]:
+                    entities[entity_type].append(value)
+        
+        # Catalog people and titles also match lower-case voice transcripts
+        stopwords = self.preprocessor.stopwords_remover.all_stopwords
+        if self.catalog is not None:
+            for name, flags in self.catalog.find_all(text_lower, stopwords=stopwords):
+                matched_words.update(name.split())
+                if flags & CatalogGazetteer.PERSON:
+                    if name not in entities['people']:
+                        entities['people'].append(name)
+                elif name not in entities['titles']:
+                    entities['titles'].append(name)
         
         # Extract years
-        year_pattern = r'\b(19|20)\d{2}\b'
+        year_pattern = r'\b(?:19|20)\d{2}\b'
         years = re.findall(year_pattern, text)
-        entities['years'] = list(set(years))
+        entities['years'] = list(dict.fromkeys(years))
         
-        # Extract time expressions
-        for keyword in self.time_keywords:
-            if keyword in text_lower:
-                entities['time_expressions'].append(keyword)
-        
-        # Extract rating expressions
-        for keyword in self.rating_keywords:
-            if keyword in text_lower:
-                entities['rating_expressions'].append(keyword)
-        
-        # Extract popularity expressions
-        for keyword in self.popularity_keywords:
-            if keyword in text_lower:
-                entities['popularity_expressions'].append(keyword)
-        
-        # Extract people (actors/directors)
-        for person in self.famous_people:
-            if person in text_lower:
-                entities['people'].append(person)
-        
-        # Fuzzy matching for people names (handle speech recognition errors)
-        # Check if text contains "dao dien" (director) or "dien vien" (actor)
-        if 'dao dien' in text_lower or 'đạo diễn' in text_lower or 'director' in text_lower:
-            # Try to find director name after these keywords
-            words = text_lower.split()
-            for i, word in enumerate(words):
-                if word in ['dao', 'đạo', 'director'] and i + 1 < len(words):
-                    # Get next few words as potential name
-                    potential_name = ' '.join(words[i+1:min(i+4, len(words))])
-                    # Fuzzy match with famous directors
-                    for person in self.famous_people:
-                        if 'nolan' in person and ('nolan' in potential_name or 'non' in potential_name):
-                            entities['people'].append('christopher nolan')
-                            break
-                        elif 'spielberg' in person and 'spielberg' in potential_name:
-                            entities['people'].append('steven spielberg')
-                            break
-                        elif 'tarantino' in person and 'tarantino' in potential_name:
-                            entities['people'].append('quentin tarantino')
-                            break
+        # Names misheard by speech recognition, matched by how they sound
+        for name, flags, cued in self._match_misheard_names(text_lower, matched_words, stopwords):
+            entity_type = 'people' if flags & CatalogGazetteer.PERSON else 'titles'
+            if name not in entities[entity_type]:
+                entities[entity_type].append(name)
+                if entity_type == 'people' and not cued:
+                    entities['sounds_like_people'].append(name)
         
         # Extract potential movie titles (capitalized sequences)
         for pattern in self.title_patterns:
@@ -219,9 +277,80 @@ class EntityRecognizer:
         
         return entities
     
+    def _phonetic_match(self, text: str, kinds: int, surname: bool = False,
+                        max_text_distance: Optional[float] = None) -> Optional[Tuple[str, int]]:
+        """Closest name, as (name, flags); the built-in famous names are tried before the catalog"""
+        for index in self.phonetic_indexes:
+            if surname:
+                match = index.match_surname(text, kinds, max_text_distance)
+            else:
+                match = index.match(text, kinds, max_text_distance)
+            if match is not None:
+                return match[:2]
+        return None
+    
+    def _match_misheard_names(self, text: str, matched_words: Set[str],
+                              stopwords: Set[str]) -> List[Tuple[str, int, bool]]:
+        """Phonetic lookup over word spans the dictionaries did not resolve, as (name, flags, cued)
+        
+        After a cue such as 'dao dien' a span of one to three words is tried,
+        longest first ('dao dien non'). Elsewhere any word span could sound
+        like one of thousands of catalog names, so only spans of two or three
+        uncommon words are tried, and their spelling must nearly match.
+        """
+        words = normalize_name(text).split()
+        plain = [strip_accents(word) for word in words]
+        found = []
+        
+        # Cue words start a name but are never part of one
+        cues, cue_positions = {}, set()
+        for i in range(len(words)):
+            for cue, cue_kinds in self.person_cues.items():
+                if tuple(plain[i:i + len(cue)]) == cue:
+                    cues[i] = (cue_kinds, i + len(cue))
+                    cue_positions.update(range(i, i + len(cue)))
+                    break
+        
+        def free(start, end, cued):
+            span = words[start:end]
+            if (len(span) != end - start
+                    or any(position in cue_positions for position in range(start, end))
+                    or any(word in matched_words or word.isdigit() for word in span)):
+                return False
+            if cued:
+                return not all(word in stopwords for word in span)
+            return not any(word in stopwords or plain_word in self.common_words
+                           for word, plain_word in zip(span, plain[start:end]))
+        
+        i = 0
+        while i < len(words):
+            cued = i in cues
+            kinds, start = cues.get(i, (CatalogGazetteer.PERSON | CatalogGazetteer.TITLE, i))
+            max_text_distance = None if cued else PhoneticIndex.UNCUED_TEXT_DISTANCE
+            
+            match, end = None, start
+            for length in (3, 2):
+                if free(start, start + length, cued):
+                    match = self._phonetic_match(' '.join(words[start:start + length]), kinds,
+                                                 max_text_distance=max_text_distance)
+                    if match:
+                        end = start + length
+                        break
+            if match is None and cued and free(start, start + 1, cued):
+                match = self._phonetic_match(words[start], kinds, surname=True)
+                end = start + 1
+            
+            if match is not None:
+                found.append((*match, cued))
+                i = end
+            else:
+                i = max(start, i + 1)
+        
+        return found
+    
     def extract_year_range(self, text: str) -> Tuple[int, int]:
         """Extract year range from text"""
-        years = re.findall(r'\b(19|20)\d{2}\b', text)
+        years = re.findall(r'\b(?:19|20)\d{2}\b', text)
         
         if not years:
             return None, None
@@ -239,114 +368,165 @@ class EntityRecognizer:
         return []
 
 
+class SearchFeatures(dict):
+    """Search features computed on first access and memoized
+    
+    Behaves like the dict extract_search_features used to return. Reading a
+    key computes only that feature and what it depends on; iterating,
+    items() or to_dict() compute everything.
+    """
+    
+    FEATURE_NAMES = (
+        'original_text', 'tokens', 'clean_tokens', 'bigrams', 'trigrams', 'word_frequency',
+        'entities', 'year_range', 'has_genre', 'has_year', 'has_person', 'has_time_expression',
+        'has_rating_expression', 'has_popularity_expression', 'token_count', 'unique_token_count'
+    )
+    
+    # has_* flag -> entity list it reports on
+    ENTITY_FLAGS = {
+        'has_genre': 'genres',
+        'has_year': 'years',
+        'has_person': 'people',
+        'has_time_expression': 'time_expressions',
+        'has_rating_expression': 'rating_expressions',
+        'has_popularity_expression': 'popularity_expressions',
+    }
+    
+    def __init__(self, extractor: 'FeatureExtractor', text: str):
+        super().__init__(original_text=text)
+        self._extractor = extractor
+        self._text = text
+        self._stemmed = None  # [(stem, is_stopword)] from one preprocessing pass
+    
+    def _stemmed_tokens(self) -> List[Tuple[str, bool]]:
+        if self._stemmed is None:
+            self._stemmed = self._extractor.preprocessor.stem_tokens(self._text)
+        return self._stemmed
+    
+    def _compute(self, key: str):
+        extractor = self._extractor
+        if key == 'tokens':
+            return [stem for stem, _ in self._stemmed_tokens()]
+        if key == 'clean_tokens':
+            return [stem for stem, is_stopword in self._stemmed_tokens() if not is_stopword]
+        if key == 'bigrams':
+            return extractor.preprocessor.extract_ngrams(self['tokens'], n=2)
+        if key == 'trigrams':
+            return extractor.preprocessor.extract_ngrams(self['tokens'], n=3)
+        if key == 'word_frequency':
+            return extractor.preprocessor.get_word_frequency(self['clean_tokens'])
+        if key == 'entities':
+            return extractor.entity_recognizer.extract_entities(self._text)
+        if key == 'year_range':
+            year_min, year_max = extractor.entity_recognizer.extract_year_range(self._text)
+            return {'min': year_min, 'max': year_max}
+        if key in self.ENTITY_FLAGS:
+            return len(self['entities'][self.ENTITY_FLAGS[key]]) > 0
+        if key == 'token_count':
+            return len(self['tokens'])
+        if key == 'unique_token_count':
+            return len(set(self['tokens']))
+        raise KeyError(key)
+    
+    def __missing__(self, key: str):
+        value = self._compute(key)
+        self[key] = value
+        return value
+    
+    def get(self, key: str, default=None):
+        return self[key] if key in self.FEATURE_NAMES else dict.get(self, key, default)
+    
+    def __contains__(self, key) -> bool:
+        return key in self.FEATURE_NAMES or dict.__contains__(self, key)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Every feature as a plain dict"""
+        return {key: self[key] for key in self.FEATURE_NAMES}
+    
+    def keys(self):
+        return self.to_dict().keys()
+    
+    def values(self):
+        return self.to_dict().values()
+    
+    def items(self):
+        return self.to_dict().items()
+    
+    def __iter__(self):
+        return iter(self.FEATURE_NAMES)
+    
+    def __len__(self) -> int:
+        return len(self.FEATURE_NAMES)
+    
+    def __eq__(self, other) -> bool:
+        return self.to_dict() == (other.to_dict() if isinstance(other, SearchFeatures) else other)
+    
+    def __ne__(self, other) -> bool:
+        return not self == other
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+
 class FeatureExtractor:
     """Extract features for NLP tasks"""
     
-    def __init__(self):
-        self.entity_recognizer = EntityRecognizer()
-        self.preprocessor = NLPPreprocessor()
-    
-    def extract_search_features(self, text: str) -> Dict[str, any]:
-        """Extract comprehensive search features"""
-        # Basic preprocessing
-        tokens = self.preprocessor.preprocess(text, remove_stopwords=False)
-        clean_tokens = self.preprocessor.preprocess(text, remove_stopwords=True)
-        
-        # Entity recognition
-        entities = self.entity_recognizer.extract_entities(text)
-        
-        # Extract n-grams
-        bigrams = self.preprocessor.extract_ngrams(tokens, n=2)
-        trigrams = self.preprocessor.extract_ngrams(tokens, n=3)
-        
-        # Word frequency
-        word_freq = self.preprocessor.get_word_frequency(clean_tokens)
-        
-        # Year range
-        year_min, year_max = self.entity_recognizer.extract_year_range(text)
-        
-        features = {
-            'original_text': text,
-            'tokens': tokens,
-            'clean_tokens': clean_tokens,
-            'bigrams': bigrams,
-            'trigrams': trigrams,
-            'word_frequency': word_freq,
-            'entities': entities,
-            'year_range': {
-                'min': year_min,
-                'max': year_max
-            },
-            'has_genre': len(entities['genres']) > 0,
-            'has_year': len(entities['years']) > 0,
-            'has_person': len(entities['people']) > 0,
-            'has_time_expression': len(entities['time_expressions']) > 0,
-            'has_rating_expression': len(entities['rating_expressions']) > 0,
-            'has_popularity_expression': len(entities['popularity_expressions']) > 0,
-            'token_count': len(tokens),
-            'unique_token_count': len(set(tokens))
-        }
-        
-        return features
+    def __init__(self, entity_recognizer: Optional[EntityRecognizer] = None,
+                 preprocessor: Optional[NLPPreprocessor] = None):
+        self.preprocessor = preprocessor or NLPPreprocessor()
+        self.entity_recognizer = entity_recognizer or EntityRecognizer(preprocessor=self.preprocessor)
+    
+    def extract_search_features(self, text: str) -> SearchFeatures:
+        """Extract comprehensive search features, each computed when first read"""
+        return SearchFeatures(self, text)
 
 
 class QueryAnalyzer:
     """Analyze and understand user queries"""
     
-    def __init__(self):
-        self.feature_extractor = FeatureExtractor()
-        self.entity_recognizer = EntityRecognizer()
+    def __init__(self, feature_extractor: Optional[FeatureExtractor] = None):
+        self.feature_extractor = feature_extractor or FeatureExtractor()
+        self.entity_recognizer = self.feature_extractor.entity_recognizer
+        self.rule_engine = DEFAULT_RULE_ENGINE
     
     def analyze_query(self, query: str) -> Dict[str, any]:
         """Comprehensive query analysis"""
         # Extract features
         features = self.feature_extractor.extract_search_features(query)
         
-        # Determine query type
-        query_type = self._determine_query_type(features)
+        # Decide query type, sort order and complexity in one rule pass
+        decision = self._evaluate_rules(features)
         
         # Extract search parameters
-        search_params = self._extract_search_parameters(features)
+        search_params = self._extract_search_parameters(features, decision.sort_by)
         
         # Generate search suggestions
         suggestions = self._generate_suggestions(features)
         
-        # Calculate query complexity
-        complexity = self._calculate_complexity(features)
-        
         return {
             'query': query,
-            'query_type': query_type,
+            'query_type': decision.query_type,
             'search_parameters': search_params,
             'suggestions': suggestions,
-            'complexity': complexity,
+            'complexity': decision.complexity,
             'features': features
         }
     
-    def _determine_query_type(self, features: Dict) -> str:
-        """Determine the type of query"""
-        entities = features['entities']
+    def _evaluate_rules(self, features: Dict) -> RuleDecision:
+        """Run the shared rule tables over the clean tokens and entity flags"""
+        signals = [
+            flag for flag in ('has_genre', 'has_year', 'has_person', 'has_rating_expression',
+                              'has_popularity_expression', 'has_time_expression')
+            if features[flag]
+        ]
+        if features['entities']['titles']:
+            signals.append('has_title')
         
-        if features['has_person']:
-            return 'person_search'
-        elif features['has_genre'] and features['has_year']:
-            return 'genre_year_search'
-        elif features['has_genre']:
-            return 'genre_search'
-        elif features['has_year']:
-            return 'year_search'
-        elif features['has_rating_expression']:
-            return 'rating_search'
-        elif features['has_popularity_expression']:
-            return 'popularity_search'
-        elif features['has_time_expression']:
-            return 'time_based_search'
-        elif len(entities['titles']) > 0:
-            return 'title_search'
-        else:
-            return 'general_search'
-    
-    def _extract_search_parameters(self, features: Dict) -> Dict[str, any]:
+        return self.rule_engine.decide(features['clean_tokens'], signals)
+    
+    def _extract_search_parameters(self, features: Dict, sort_by: Optional[str]) -> Dict[str, any]:
         """Extract structured search parameters"""
         entities = features['entities']
         
@@ -354,23 +534,14 @@ class QueryAnalyzer:
             'genres': entities['genres'],
             'years': entities['years'],
             'year_range': features['year_range'],
-            'people': entities['people'],
+            # People named exactly or after a cue filter the results; sounds-like guesses only rank them
+            'people': [person for person in entities['people'] if person not in entities['sounds_like_people']],
+            'boost_people': entities['sounds_like_people'],
             'titles': entities['titles'],
-            'sort_by': None,
+            'sort_by': sort_by,
             'filters': {}
         }
         
-        # Determine sort order
-        if features['has_rating_expression']:
-            params['sort_by'] = 'rating'
-        elif features['has_popularity_expression']:
-            params['sort_by'] = 'popularity'
-        elif features['has_time_expression']:
-            if any(word in features['clean_tokens'] for word in ['new', 'moi', 'latest', 'nhat']):
-                params['sort_by'] = 'release_date_desc'
-            else:
-                params['sort_by'] = 'release_date_asc'
-        
         # Add filters
         if params['year_range']['min']:
             params['filters']['year_min'] = params['year_range']['min']
@@ -401,38 +572,82 @@ class QueryAnalyzer:
                 suggestions.append(f"Movies starring {person}")
         
         return suggestions[:5]  # Limit to 5 suggestions
+
+
+def _incidence_matrix(token_sets: List[Set[str]], vocabulary: Dict[str, int]) -> sparse.csr_matrix:
+    """Binary (documents x vocab) matrix marking which known tokens each document contains"""
+    indptr = [0]
+    indices = []
+    for tokens in token_sets:
+        indices.extend(vocabulary[token] for token in tokens if token in vocabulary)
+        indptr.append(len(indices))
+    return sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int32)),
+        shape=(len(token_sets), len(vocabulary))
+    )
+
+
+class PreparedQuery(NamedTuple):
+    """A query analyzed once, ready to be scored against many movies"""
+    query: str
+    tokens: Set[str]
+    genres: Set[str]
+    years: Set[str]
+
+
+class MovieTokenIndex:
+    """Title, overview and genre incidence matrices plus years for a movie collection"""
+    
+    def __init__(self, movies: Dict[Any, Dict], preprocessor: NLPPreprocessor):
+        self.movie_ids = list(movies)
+        self.rows = {movie_id: row for row, movie_id in enumerate(self.movie_ids)}
+        
+        title_tokens, overview_tokens, genre_sets, years = [], [], [], []
+        for movie in movies.values():
+            title_tokens.append(set(preprocessor.preprocess(movie['title'], remove_stopwords=True))
+                                if 'title' in movie else set())
+            overview_tokens.append(set(preprocessor.preprocess(movie['overview'], remove_stopwords=True))
+                                   if 'overview' in movie else set())
+            genre_sets.append(set(g.lower() for g in movie['genres']) if 'genres' in movie else set())
+            years.append(str(movie['year']) if 'year' in movie else None)
+        
+        # Title and overview words share one vocabulary so a query maps to one vector
+        self.vocabulary: Dict[str, int] = {}
+        for tokens in title_tokens + overview_tokens:
+            for token in tokens:
+                self.vocabulary.setdefault(token, len(self.vocabulary))
+        self.title_matrix = _incidence_matrix(title_tokens, self.vocabulary)
+        self.overview_matrix = _incidence_matrix(overview_tokens, self.vocabulary)
+        
+        self.genre_vocabulary: Dict[str, int] = {}
+        for genres in genre_sets:
+            for genre in genres:
+                self.genre_vocabulary.setdefault(genre, len(self.genre_vocabulary))
+        self.genre_matrix = _incidence_matrix(genre_sets, self.genre_vocabulary)
+        
+        # Years as codes; -1 marks a movie without one
+        self.year_codes: Dict[str, int] = {}
+        self.years = np.array(
+            [self.year_codes.setdefault(year, len(self.year_codes)) if year is not None else -1 for year in years],
+            dtype=np.int32
+        )
     
-    def _calculate_complexity(self, features: Dict) -> str:
-        """Calculate query complexity"""
-        score = 0
-        
-        # Add points for different features
-        if features['has_genre']:
-            score += 1
-        if features['has_year']:
-            score += 1
-        if features['has_person']:
-            score += 2
-        if features['has_rating_expression']:
-            score += 1
-        if features['has_popularity_expression']:
-            score += 1
-        if len(features['entities']['titles']) > 0:
-            score += 2
-        
-        if score <= 1:
-            return 'simple'
-        elif score <= 3:
-            return 'moderate'
-        else:
-            return 'complex'
+    def __len__(self) -> int:
+        return len(self.movie_ids)
 
 
 class SemanticMatcher:
     """Match queries to movie database using semantic understanding"""
     
-    def __init__(self):
-        self.query_analyzer = QueryAnalyzer()
+    # Score per overlapping title word, genre, year and overview word
+    TITLE_WEIGHT = 3.0
+    GENRE_WEIGHT = 2.0
+    YEAR_WEIGHT = 2.0
+    OVERVIEW_WEIGHT = 0.5
+    
+    def __init__(self, query_analyzer: Optional[QueryAnalyzer] = None):
+        self.query_analyzer = query_analyzer or QueryAnalyzer()
+        self.movie_index: Optional[MovieTokenIndex] = None
         
         # Synonym mappings
         self.synonyms = {
@@ -459,42 +674,82 @@ class SemanticMatcher:
         
         return expanded_queries[:5]  # Limit expansions
     
-    def match_score(self, query: str, movie_data: Dict) -> float:
-        """Calculate match score between query and movie"""
+    def prepare(self, query: str) -> PreparedQuery:
+        """Analyze a query once for scoring against any number of movies"""
         analysis = self.query_analyzer.analyze_query(query)
-        score = 0.0
-        
-        query_tokens = set(analysis['features']['clean_tokens'])
         entities = analysis['features']['entities']
+        return PreparedQuery(
+            query=query,
+            tokens=set(analysis['features']['clean_tokens']),
+            genres=set(entities['genres']),
+            years=set(entities['years'])
+        )
+    
+    def index_movies(self, movies: Dict[Any, Dict]) -> MovieTokenIndex:
+        """Preprocess a movie collection ({movie_id: movie_data}) once for score_many"""
+        self.movie_index = MovieTokenIndex(movies, self.query_analyzer.feature_extractor.preprocessor)
+        return self.movie_index
+    
+    def score_many(self, prepared: PreparedQuery, movie_ids: Optional[Iterable[Any]] = None) -> np.ndarray:
+        """Scores of the indexed movies (all of them, or movie_ids in order) for a prepared query
+        
+        Equal to match_score for each movie, computed with one sparse
+        product per field.
+        """
+        index = self.movie_index
+        if index is None:
+            raise ValueError("No movies indexed. Call index_movies() first.")
+        
+        rows = None if movie_ids is None else np.array([index.rows[movie_id] for movie_id in movie_ids], dtype=np.int64)
+        
+        def overlap(matrix, vocabulary, tokens):
+            query_vector = np.zeros(len(vocabulary), dtype=np.float32)
+            query_vector[[vocabulary[token] for token in tokens if token in vocabulary]] = 1.0
+            if rows is not None:
+                matrix = matrix[rows]
+            return matrix @ query_vector
+        
+        scores = np.zeros(len(index) if rows is None else len(rows), dtype=np.float64)
+        scores += self.TITLE_WEIGHT * overlap(index.title_matrix, index.vocabulary, prepared.tokens)
+        scores += self.OVERVIEW_WEIGHT * overlap(index.overview_matrix, index.vocabulary, prepared.tokens)
+        if prepared.genres:
+            scores += self.GENRE_WEIGHT * overlap(index.genre_matrix, index.genre_vocabulary, prepared.genres)
+        if prepared.years:
+            year_codes = [index.year_codes[year] for year in prepared.years if year in index.year_codes]
+            years = index.years if rows is None else index.years[rows]
+            scores += self.YEAR_WEIGHT * np.isin(years, year_codes)
+        return scores
+    
+    def score_prepared(self, prepared: PreparedQuery, movie_data: Dict) -> float:
+        """Score one movie dict against a prepared query"""
+        preprocessor = self.query_analyzer.feature_extractor.preprocessor
+        score = 0.0
         
         # Match title
         if 'title' in movie_data:
-            title_tokens = set(self.query_analyzer.feature_extractor.preprocessor.preprocess(
-                movie_data['title'], remove_stopwords=True
-            ))
-            title_overlap = len(query_tokens & title_tokens)
-            score += title_overlap * 3.0
+            title_tokens = set(preprocessor.preprocess(movie_data['title'], remove_stopwords=True))
+            score += len(prepared.tokens & title_tokens) * self.TITLE_WEIGHT
         
         # Match genres
-        if 'genres' in movie_data and entities['genres']:
+        if 'genres' in movie_data and prepared.genres:
             movie_genres = set(g.lower() for g in movie_data['genres'])
-            genre_overlap = len(set(entities['genres']) & movie_genres)
-            score += genre_overlap * 2.0
+            score += len(prepared.genres & movie_genres) * self.GENRE_WEIGHT
         
         # Match year
-        if 'year' in movie_data and entities['years']:
-            if str(movie_data['year']) in entities['years']:
-                score += 2.0
+        if 'year' in movie_data and prepared.years:
+            if str(movie_data['year']) in prepared.years:
+                score += self.YEAR_WEIGHT
         
         # Match overview/description
         if 'overview' in movie_data:
-            overview_tokens = set(self.query_analyzer.feature_extractor.preprocessor.preprocess(
-                movie_data['overview'], remove_stopwords=True
-            ))
-            overview_overlap = len(query_tokens & overview_tokens)
-            score += overview_overlap * 0.5
+            overview_tokens = set(preprocessor.preprocess(movie_data['overview'], remove_stopwords=True))
+            score += len(prepared.tokens & overview_tokens) * self.OVERVIEW_WEIGHT
         
         return score
+    
+    def match_score(self, query: str, movie_data: Dict) -> float:
+        """Calculate match score between query and movie"""
+        return self.score_prepared(self.prepare(query), movie_data)
 
 
 # Example usage
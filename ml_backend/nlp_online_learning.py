@@ -0,0 +1,137 @@
+"""
+Online Intent Learning Module
+Updates the intent classifier incrementally from logged production queries
+"""
+
+import os
+import json
+from typing import List, Dict, Tuple, Any, Iterator, Optional
+
+from nlp_intent_classifier import IntentClassifier
+
+
+class QueryLogReader:
+    """Stream query records from a JSON-lines log, remembering how far it has read"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = 0  # byte offset of the first unread line
+
+    def read_batches(self, batch_size: int = 256) -> Iterator[List[Dict[str, Any]]]:
+        """Yield batches of records appended since the last read
+
+        A trailing line without a newline is still being written and is left
+        for the next call. Lines that are not JSON objects are skipped.
+        """
+        if not os.path.exists(self.path):
+            return
+
+        # Start over if the log was truncated or rotated
+        if os.path.getsize(self.path) < self.offset:
+            self.offset = 0
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            batch = []
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self.offset += len(line)
+
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict):
+                    batch.append(record)
+
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+
+            if batch:
+                yield batch
+
+
+class OnlineIntentTrainer:
+    """Feed labelled or weakly-labelled queries into IntentClassifier.partial_fit"""
+
+    def __init__(self, classifier: IntentClassifier, batch_size: int = 256, weak_label_weight: float = 0.5):
+        self.classifier = classifier
+        self.batch_size = batch_size
+        self.weak_label_weight = weak_label_weight
+        self._readers = {}  # log path -> QueryLogReader
+
+    def label_examples(self, records: List[Dict[str, Any]]) -> Tuple[List[List[str]], List[str], List[float], Dict[str, int]]:
+        """Turn log records into training examples
+
+        Records with a known 'intent' are used as-is. Records without one get
+        a weak label when exactly one keyword rule fires, and are skipped otherwise.
+        """
+        documents, labels, weights = [], [], []
+        stats = {'labelled': 0, 'weakly_labelled': 0, 'skipped': 0}
+
+        for record in records:
+            text = record.get('query') or record.get('text')
+            tokens = self.classifier.preprocessor.preprocess(text) if isinstance(text, str) else []
+            if not tokens:
+                stats['skipped'] += 1
+                continue
+
+            intent = record.get('intent')
+            if intent in self.classifier.intent_definitions:
+                weight = float(record.get('weight', 1.0))
+                stats['labelled'] += 1
+            else:
+                intent = self.classifier.unambiguous_rule_intent(tokens)
+                if intent is None:
+                    stats['skipped'] += 1
+                    continue
+                weight = self.weak_label_weight
+                stats['weakly_labelled'] += 1
+
+            documents.append(tokens)
+            labels.append(intent)
+            weights.append(weight)
+
+        return documents, labels, weights, stats
+
+    def learn(self, records: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Update the classifier with one batch of records"""
+        documents, labels, weights, stats = self.label_examples(records)
+        self.classifier.partial_fit(documents, labels, sample_weight=weights)
+        return stats
+
+    def consume(self, log_path: str, max_batches: Optional[int] = None) -> Dict[str, int]:
+        """Learn from every record appended to the log since the last call"""
+        reader = self._readers.setdefault(log_path, QueryLogReader(log_path))
+        totals = {'batches': 0, 'labelled': 0, 'weakly_labelled': 0, 'skipped': 0}
+
+        for batch in reader.read_batches(self.batch_size):
+            stats = self.learn(batch)
+            totals['batches'] += 1
+            for key, value in stats.items():
+                totals[key] += value
+            if max_batches is not None and totals['batches'] >= max_batches:
+                break
+
+        return totals
+
+
+# Example usage
+if __name__ == "__main__":
+    import sys
+
+    classifier = IntentClassifier()
+    classifier.train_from_examples()
+    trainer = OnlineIntentTrainer(classifier)
+
+    if len(sys.argv) > 1:
+        print(trainer.consume(sys.argv[1]))
+    else:
+        print(trainer.learn([
+            {'query': 'phim avatar', 'intent': 'search_by_title'},
+            {'query': 'best horror films'},
+        ]))
+
+    print(classifier.classify_intent("phim avatar"))
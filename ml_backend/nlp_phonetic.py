@@ -0,0 +1,286 @@
+"""
+Phonetic Matching Module
+Vietnamese-accent-aware phonetic keys and a symmetric-deletion index for
+recognizing misheard person names and titles in voice transcripts
+"""
+
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from collections import defaultdict
+from typing import List, Dict, Tuple, Iterable, Iterator, Optional
+
+from nlp_gazetteer import FrontCodedTable, CatalogGazetteer, normalize_name
+
+
+# Letter groups rewritten before coding, longest first. English names read by
+# a Vietnamese speaker (or spelled out by Vietnamese ASR) mostly differ in
+# these: 'ph'/'f', 'ch'/'tr', 'gi'/'z'/'j', 'qu'/'k'/'c'.
+PHONETIC_GROUPS = [
+    ('ngh', 'n'), ('chr', 'k'), ('sch', 's'),
+    ('ch', 'c'), ('tr', 'c'), ('ph', 'f'), ('th', 't'), ('sh', 's'), ('kh', 'k'),
+    ('gh', 'g'), ('ng', 'n'), ('nh', 'n'), ('gi', 'z'), ('qu', 'k'), ('ck', 'k'),
+    ('wh', 'v'),
+]
+PHONETIC_LETTERS = {
+    'c': 'k', 'q': 'k', 'x': 's', 'j': 'z', 'w': 'v',
+}
+VOWELS = set('aeiouy')
+# Dropped after the first sound: vowels, 'h', and the liquids 'l' and 'r',
+# which Vietnamese speakers leave out of final position and clusters
+# ('nolan' -> 'no lan' / 'non', 'christopher' -> 'crít tốp phơ')
+SILENT_AFTER_FIRST = VOWELS | set('hlr')
+
+# Groups are tried before single letters, longest first
+_GROUP_PATTERN = re.compile('|'.join(group for group, _ in PHONETIC_GROUPS) + '|.', re.DOTALL)
+_CODES = {**PHONETIC_LETTERS, **dict(PHONETIC_GROUPS)}
+
+
+def strip_accents(text: str) -> str:
+    """Remove Vietnamese diacritics ('đạo diễn' -> 'dao dien')"""
+    if text.isascii():
+        return text
+    nfd = unicodedata.normalize('NFD', text.replace('đ', 'd').replace('Đ', 'D'))
+    return ''.join(char for char in nfd if unicodedata.category(char) != 'Mn')
+
+
+@lru_cache(maxsize=65536)
+def phonetic_key(text: str) -> str:
+    """Metaphone-style consonant skeleton of a name, ignoring word breaks
+
+    'christopher nolan' -> 'kstfn', 'crystal non' -> 'kstn'
+    """
+    letters = ''.join(char for char in strip_accents(text.lower()) if char.isalnum())
+    codes = [_CODES.get(group, group) for group in _GROUP_PATTERN.findall(letters)]
+
+    key = []
+    for position, code in enumerate(codes):
+        if position == 0:
+            code = 'a' if code in VOWELS else code
+        elif code in SILENT_AFTER_FIRST:
+            continue
+        if not key or key[-1] != code:
+            key.append(code)
+    return ''.join(key)
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, or limit + 1 as soon as it must exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        left = i
+        for j, char_b in enumerate(b, 1):
+            cost = previous[j - 1] + (char_a != char_b)
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if left + 1 < cost:
+                cost = left + 1
+            current.append(cost)
+            left = cost
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """True if a and b differ by at most one insertion, deletion or substitution"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < len(a) and i < len(b) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:]
+    if len(a) > len(b):
+        return a[i + 1:] == b[i:]
+    return a[i:] == b[i + 1:]
+
+
+@lru_cache(maxsize=65536)
+def key_deletions(key: str) -> Tuple[str, ...]:
+    """Every key with one sound removed (the first sound is kept)"""
+    return tuple(dict.fromkeys(key[:i] + key[i + 1:] for i in range(1, len(key))))
+
+
+class PhoneticIndex:
+    """Phonetic key -> names, with one-deletion variants for fuzzy probes
+
+    Lookup is a hash probe per variant of the query key followed by
+    edit-distance verification of the few names found. Small built-in name
+    lists are held in a dict; the catalog index is written to a memory-mapped
+    FrontCodedTable of '<key> <name>' strings.
+    """
+
+    # Entry is keyed by a surname rather than the whole name
+    SURNAME = 8
+    # Shortest full-name key that is indexed and probed with deletions
+    MIN_DELETION_KEY = 4
+    # A match may differ from the name by at most this fraction of its letters
+    MAX_TEXT_DISTANCE = 0.6
+    # The same limit for text no cue word marks as a name
+    UNCUED_TEXT_DISTANCE = 0.2
+
+    def __init__(self, entries: Optional[Dict[str, List[Tuple[str, int]]]] = None,
+                 table: Optional[FrontCodedTable] = None):
+        self._entries = entries if entries is not None else {}
+        self._table = table
+
+    @classmethod
+    def index_entries(cls, names: Iterable[Tuple[str, int]]) -> Iterator[Tuple[str, str, int]]:
+        """Yield (key, name, flags) for a name, its deletion variants and its surname"""
+        for name, flags in names:
+            name = normalize_name(name)
+            key = phonetic_key(name)
+            if not key:
+                continue
+            yield key, name, flags
+            if len(key) >= cls.MIN_DELETION_KEY:
+                for variant in key_deletions(key):
+                    yield variant, name, flags
+
+            words = name.split()
+            if flags & CatalogGazetteer.PERSON and len(words) > 1:
+                surname_key = phonetic_key(words[-1])
+                if surname_key:
+                    yield surname_key, name, flags | cls.SURNAME
+
+    @classmethod
+    def from_names(cls, names: Iterable[Tuple[str, int]]) -> 'PhoneticIndex':
+        """Build an in-memory index from (name, CatalogGazetteer flags) pairs"""
+        entries = defaultdict(list)
+        for key, name, flags in cls.index_entries(names):
+            if (name, flags) not in entries[key]:
+                entries[key].append((name, flags))
+        return cls(dict(entries))
+
+    @classmethod
+    def write(cls, path: str, names: Iterable[Tuple[str, int]]):
+        """Write a memory-mappable index for (name, flags) pairs"""
+        table_entries: Dict[str, int] = {}
+        for key, name, flags in cls.index_entries(names):
+            entry = f"{key} {name}"
+            table_entries[entry] = table_entries.get(entry, 0) | flags
+        FrontCodedTable.write(path, table_entries)
+
+    @classmethod
+    def open(cls, path: str) -> 'PhoneticIndex':
+        return cls(table=FrontCodedTable.open(path))
+
+    @classmethod
+    def load_or_build(cls, path: str, catalog: Optional[CatalogGazetteer]) -> Optional['PhoneticIndex']:
+        """Open the index, rebuilding it from the catalog table if that is newer"""
+        catalog_path = catalog.table.path if catalog is not None else None
+        if os.path.exists(path) and (
+            catalog_path is None or os.path.getmtime(path) >= os.path.getmtime(catalog_path)
+        ):
+            try:
+                return cls.open(path)
+            except ValueError:
+                pass
+        if catalog is None:
+            return None
+        cls.write(path, iter(catalog.table))
+        return cls.open(path)
+
+    def _candidates(self, key: str) -> Iterator[Tuple[str, int]]:
+        if self._table is None:
+            yield from self._entries.get(key, ())
+            return
+        if not self._table.might_extend(key):
+            return
+        prefix = f"{key} "
+        for entry, flags in self._table.scan_prefix(prefix):
+            yield entry[len(prefix):], flags
+
+    def _best(self, text: str, key: str, kinds: int, surname: bool,
+              max_text_distance: float) -> Optional[Tuple[str, int, Tuple[int, int]]]:
+        """Best verified (name, flags, score) for a key and its deletion variants
+
+        Candidates must be within one sound of the key and within
+        max_text_distance of the spelling. They rank by how well the sounds
+        line up word by word, then by spelling distance.
+        """
+        probes = (key,)
+        if surname or len(key) >= self.MIN_DELETION_KEY:
+            probes += key_deletions(key)
+
+        plain = strip_accents(text)
+        words = plain.split()
+        word_keys = [phonetic_key(word) for word in words]
+
+        # Sounds must line up word by word, at most one slip in every word, so
+        # a correctly heard name that is not indexed ('tom hanks') does not
+        # turn into one sharing a word ('tom cruise'); only the candidates
+        # that line up best are spelled out and compared
+        closest, closest_distance = [], None
+        seen = set()
+        for probe in probes:
+            for name, flags in self._candidates(probe):
+                if name in seen or not flags & kinds or bool(flags & self.SURNAME) != surname:
+                    continue
+                seen.add(name)
+
+                target = name.split()[-1] if surname else name
+                if not within_one_edit(key, phonetic_key(target)):
+                    continue
+                target_words = target.split()
+                if len(target_words) == len(words):
+                    target_keys = [phonetic_key(target_word) for target_word in target_words]
+                    if not all(within_one_edit(word_key, target_key)
+                               for word_key, target_key in zip(word_keys, target_keys)):
+                        continue
+                    word_distance = sum(word_key != target_key for word_key, target_key in zip(word_keys, target_keys))
+                else:
+                    word_distance = len(words) + abs(len(target_words) - len(words))
+
+                if closest_distance is None or word_distance < closest_distance:
+                    closest, closest_distance = [], word_distance
+                if word_distance == closest_distance:
+                    closest.append((name, flags, target))
+
+        best = None
+        for name, flags, target in closest:
+            limit = int(max_text_distance * len(target))
+            distance = edit_distance(plain, strip_accents(target), limit)
+            if distance <= limit and (best is None or distance < best[2][1]):
+                best = (name, flags & ~self.SURNAME, (closest_distance, distance))
+        return best
+
+    def match(self, text: str, kinds: int = CatalogGazetteer.PERSON | CatalogGazetteer.TITLE,
+              max_text_distance: Optional[float] = None) -> Optional[Tuple[str, int, Tuple[int, int]]]:
+        """Closest name that sounds like text, as (name, flags, score); lower scores are closer"""
+        text = normalize_name(text)
+        key = phonetic_key(text)
+        if len(key) < 3:
+            return None
+        return self._best(text, key, kinds, False, max_text_distance or self.MAX_TEXT_DISTANCE)
+
+    def match_surname(self, word: str, kinds: int = CatalogGazetteer.PERSON,
+                      max_text_distance: Optional[float] = None) -> Optional[Tuple[str, int, Tuple[int, int]]]:
+        """Closest person whose surname sounds like word ('non' -> christopher nolan)"""
+        word = normalize_name(word)
+        key = phonetic_key(word)
+        if not key:
+            return None
+        return self._best(word, key, kinds, True, max_text_distance or self.MAX_TEXT_DISTANCE)
+
+
+# Example usage
+if __name__ == "__main__":
+    index = PhoneticIndex.from_names([
+        ('christopher nolan', CatalogGazetteer.DIRECTOR),
+        ('steven spielberg', CatalogGazetteer.DIRECTOR),
+        ('tom cruise', CatalogGazetteer.ACTOR),
+    ])
+
+    for name in ['christopher nolan', 'crystal non', 'tom cruz', 'steven spilberg']:
+        print(f"{name!r:20} key={phonetic_key(name)!r:10} -> {index.match(name)}")
+    print('non ->', index.match_surname('non'))
@@ -156,51 +156,55 @@ class StopWordsRemover:
         return [token for token in tokens if token.lower() not in self.all_stopwords]
 
 
+# Vietnamese genre names and their English equivalents
+VIETNAMESE_GENRE_MAP = {
+    'hành động': 'action',
+    'hành đông': 'action',
+    'tình cảm': 'romance',
+    'tình cam': 'romance',
+    'kinh dị': 'horror',
+    'kinh di': 'horror',
+    'hài': 'comedy',
+    'hai': 'comedy',
+    'hài hước': 'comedy',
+    'viễn tưởng': 'sci-fi',
+    'vien tuong': 'sci-fi',
+    'khoa học viễn tưởng': 'sci-fi',
+    'phiêu lưu': 'adventure',
+    'phieu luu': 'adventure',
+    'giả tưởng': 'fantasy',
+    'gia tuong': 'fantasy',
+    'tội phạm': 'crime',
+    'toi pham': 'crime',
+    'chiến tranh': 'war',
+    'chien tranh': 'war',
+    'thể thao': 'sport',
+    'the thao': 'sport',
+    'tài liệu': 'documentary',
+    'tai lieu': 'documentary',
+    'gia đình': 'family',
+    'gia dinh': 'family',
+    'lịch sử': 'history',
+    'lich su': 'history',
+    'âm nhạc': 'music',
+    'am nhac': 'music',
+    'bí ẩn': 'mystery',
+    'bi an': 'mystery',
+    'hồi hộp': 'thriller',
+    'hoi hop': 'thriller',
+    'miền tây': 'western',
+    'mien tay': 'western',
+    'hoạt hình': 'animation',
+    'hoat hinh': 'animation',
+    'hoạt họa': 'animation',
+}
+
+
 class TextNormalizer:
     """Normalize text for NLP processing"""
     
     def __init__(self):
-        self.vietnamese_map = {
-            'hành động': 'action',
-            'hành đông': 'action',
-            'tình cảm': 'romance',
-            'tình cam': 'romance',
-            'kinh dị': 'horror',
-            'kinh di': 'horror',
-            'hài': 'comedy',
-            'hai': 'comedy',
-            'hài hước': 'comedy',
-            'viễn tưởng': 'sci-fi',
-            'vien tuong': 'sci-fi',
-            'khoa học viễn tưởng': 'sci-fi',
-            'phiêu lưu': 'adventure',
-            'phieu luu': 'adventure',
-            'giả tưởng': 'fantasy',
-            'gia tuong': 'fantasy',
-            'tội phạm': 'crime',
-            'toi pham': 'crime',
-            'chiến tranh': 'war',
-            'chien tranh': 'war',
-            'thể thao': 'sport',
-            'the thao': 'sport',
-            'tài liệu': 'documentary',
-            'tai lieu': 'documentary',
-            'gia đình': 'family',
-            'gia dinh': 'family',
-            'lịch sử': 'history',
-            'lich su': 'history',
-            'âm nhạc': 'music',
-            'am nhac': 'music',
-            'bí ẩn': 'mystery',
-            'bi an': 'mystery',
-            'hồi hộp': 'thriller',
-            'hoi hop': 'thriller',
-            'miền tây': 'western',
-            'mien tay': 'western',
-            'hoạt hình': 'animation',
-            'hoat hinh': 'animation',
-            'hoạt họa': 'animation',
-        }
+        self.vietnamese_map = dict(VIETNAMESE_GENRE_MAP)
     
     def normalize(self, text: str) -> str:
         """Normalize Vietnamese text to English equivalents"""
@@ -238,6 +242,11 @@ class NLPPreprocessor:
                    apply_stemming: bool = True, normalize: bool = True) -> List[str]:
         """Full preprocessing pipeline"""
         
+        # Normalize, tokenize and stem in one pass
+        if apply_stemming:
+            return [stem for stem, is_stopword in self.stem_tokens(text, normalize)
+                    if not (remove_stopwords and is_stopword)]
+        
         # Normalize Vietnamese to English
         if normalize:
             text = self.normalizer.normalize(text)
@@ -249,18 +258,23 @@ class NLPPreprocessor:
         if remove_stopwords:
             tokens = self.stopwords_remover.remove(tokens)
         
-        # Apply stemming
-        if apply_stemming:
-            stemmed_tokens = []
-            for token in tokens:
-                if self.tokenizer.is_vietnamese(token):
-                    stemmed_tokens.append(self.vietnamese_stemmer.stem(token))
-                else:
-                    stemmed_tokens.append(self.english_stemmer.stem(token))
-            tokens = stemmed_tokens
-        
         return tokens
     
+    def stem_tokens(self, text: str, normalize: bool = True) -> List[Tuple[str, bool]]:
+        """(stem, is_stopword) for every token, so one pass serves both token lists"""
+        if normalize:
+            text = self.normalizer.normalize(text)
+        
+        stopwords = self.stopwords_remover.all_stopwords
+        stemmed = []
+        for token in self.tokenizer.tokenize(text):
+            if self.tokenizer.is_vietnamese(token):
+                stem = self.vietnamese_stemmer.stem(token)
+            else:
+                stem = self.english_stemmer.stem(token)
+            stemmed.append((stem, token.lower() in stopwords))
+        return stemmed
+    
     def extract_ngrams(self, tokens: List[str], n: int = 2) -> List[str]:
         """Extract n-grams from tokens"""
         ngrams = []
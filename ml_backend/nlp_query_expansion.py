@@ -3,84 +3,272 @@ Query Expansion and Spell Correction Module
 Implements algorithms for improving search queries
 """
 
+import os
 import re
-from typing import List, Dict, Set, Tuple, Optional
+import math
+import heapq
+import unicodedata
+from typing import List, Dict, Set, Tuple, Iterator, NamedTuple, Optional
 from collections import defaultdict, Counter
-from nlp_preprocessing import NLPPreprocessor
+from nlp_preprocessing import NLPPreprocessor, VIETNAMESE_GENRE_MAP
 from nlp_semantic_similarity import LevenshteinDistance
+from nlp_gazetteer import FrontCodedTable
+from nlp_ner import GENRE_MAPPING
+from nlp_translation import (
+    PhraseTranslator, AsyncTranslationClient, CachedTranslator, TranslationCache,
+    TRANSLATION_BACKEND, TRANSLATION_CACHE_PATH, DOMAIN_LEXICON, MODIFIER_LEXICON
+)
+from nlp_language import LanguageDetector, is_syllable
+from nlp_autocomplete import CompletionTrie, normalize_query
 
-# Try to import translator
-try:
-    from googletrans import Translator
-    TRANSLATOR_AVAILABLE = True
-except ImportError:
-    TRANSLATOR_AVAILABLE = False
-    Translator = None
+_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+# Frequency dictionary built from the dataset and query logs (see nlp_spell_dictionary)
+SPELL_DICTIONARY_PATH = os.getenv("SPELL_DICTIONARY_PATH", os.path.join(_DATA_DIR, "spell_dictionary.bin"))
+
+
+# Synonym dictionary; the Vietnamese entries also feed the phrase translator
+SYNONYMS = {
+    'movie': ['film', 'cinema', 'picture', 'motion picture', 'phim'],
+    'film': ['movie', 'cinema', 'picture', 'phim'],
+    'find': ['search', 'look', 'discover', 'tìm', 'tìm kiếm'],
+    'search': ['find', 'look', 'discover', 'tìm', 'tìm kiếm'],
+    'good': ['great', 'excellent', 'amazing', 'wonderful', 'hay', 'tốt'],
+    'bad': ['poor', 'terrible', 'awful', 'horrible', 'tệ', 'xấu'],
+    'new': ['latest', 'recent', 'fresh', 'modern', 'mới', 'mới nhất'],
+    'old': ['classic', 'vintage', 'retro', 'ancient', 'cũ', 'kinh điển'],
+    'popular': ['trending', 'hot', 'viral', 'famous', 'phổ biến', 'nổi tiếng'],
+    'best': ['top', 'greatest', 'finest', 'excellent', 'hay nhất', 'tốt nhất'],
+    'action': ['adventure', 'thriller', 'hành động'],
+    'comedy': ['humor', 'funny', 'hài', 'hài hước'],
+    'horror': ['scary', 'terror', 'frightening', 'kinh dị'],
+    'romance': ['love', 'romantic', 'tình cảm'],
+    'drama': ['theatrical', 'kịch'],
+    'scifi': ['science fiction', 'sci-fi', 'viễn tưởng'],
+    'fantasy': ['magical', 'giả tưởng'],
+}
+
+# More general terms, and more specific terms appended to a general one
+HYPERNYMS = {
+    'action': 'movie',
+    'comedy': 'movie',
+    'horror': 'movie',
+    'romance': 'movie',
+    'thriller': 'movie',
+    'drama': 'movie',
+}
+HYPONYMS = {
+    'movie': ['action', 'comedy', 'horror', 'romance', 'thriller', 'drama'],
+    'good': ['excellent', 'amazing', 'wonderful'],
+    'bad': ['terrible', 'awful', 'horrible'],
+}
+
+# Expansion edge weights; later entries of a synonym or hyponym list decay by RANK_DECAY
+SYNONYM_WEIGHT = 1.0
+HYPERNYM_WEIGHT = 0.6
+HYPONYM_WEIGHT = 0.5
+RANK_DECAY = 0.85
+
+# Common speech-recognition mistakes to fix before translation
+VOICE_ERROR_MAP = {
+    'fim': 'phim',
+    'fim.': 'phim',
+    'fim,': 'phim',
+    'phin': 'phim',
+    'film': 'phim',  # sometimes Vietnamese accent recognized as film
+}
 
 
 class SpellCorrector:
-    """Spell correction using edit distance and frequency"""
+    """Spell correction using edit distance and frequency
     
-    def __init__(self):
+    Symmetric-deletion index: every dictionary word is stored under each
+    string obtained by deleting up to MAX_EDIT_DISTANCE characters from
+    its first PREFIX_LENGTH characters. A misspelling finds its candidates
+    by probing its own deletions, so lookup cost depends on the word
+    length, not on the alphabet, and any Unicode letter can be corrected.
+    
+    The index is built in memory by train(), or read from a dictionary
+    file written by write() (see nlp_spell_dictionary) through a
+    memory-mapped FrontCodedTable of '<deletion> <word>' strings.
+    """
+    
+    MAX_EDIT_DISTANCE = 2
+    # Edits past the prefix leave it unchanged, so indexing only the prefix
+    # bounds the index to ~30 entries per word
+    PREFIX_LENGTH = 7
+    # Dictionary files store frequencies as log-scale buckets, this many per doubling
+    FREQUENCY_STEPS = 8
+    # Shorter words are left alone by correct_text
+    MIN_CORRECTION_LENGTH = 4
+    
+    def __init__(self, table: Optional[FrontCodedTable] = None):
         self.word_frequency = Counter()
         self.vocabulary = set()
+        self._deletes: Dict[str, List[str]] = defaultdict(list)  # deletion -> words that produce it
+        self._table = table
         
     def train(self, documents: List[List[str]]):
         """Train spell corrector with documents"""
         for doc in documents:
-            self.word_frequency.update(doc)
+            self.word_frequency.update(unicodedata.normalize('NFC', word) for word in doc)
+        
+        new_words = self.word_frequency.keys() - self.vocabulary
         self.vocabulary = set(self.word_frequency.keys())
+        for word in new_words:
+            for deletion in self._index_keys(word):
+                self._deletes[deletion].append(word)
     
-    def _edits1(self, word: str) -> Set[str]:
-        """Generate all edits that are one edit away"""
-        letters = 'abcdefghijklmnopqrstuvwxyz'
-        splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
-        
-        # Deletions
-        deletes = [L + R[1:] for L, R in splits if R]
-        
-        # Transpositions
-        transposes = [L + R[1] + R[0] + R[2:] for L, R in splits if len(R) > 1]
-        
-        # Replacements
-        replaces = [L + c + R[1:] for L, R in splits if R for c in letters]
-        
-        # Insertions
-        inserts = [L + c + R for L, R in splits for c in letters]
-        
-        return set(deletes + transposes + replaces + inserts)
+    @classmethod
+    def write(cls, path: str, frequencies: Dict[str, int]):
+        """Write a memory-mappable dictionary for {word: frequency}"""
+        entries: Dict[str, int] = {}
+        for word, frequency in frequencies.items():
+            word = unicodedata.normalize('NFC', word)
+            if not word or ' ' in word or frequency < 1:
+                continue
+            bucket = cls._frequency_bucket(frequency)
+            for deletion in cls._index_keys(word):
+                entries[f"{deletion} {word}"] = bucket
+        FrontCodedTable.write(path, entries)
+    
+    @classmethod
+    def open(cls, path: str) -> 'SpellCorrector':
+        return cls(table=FrontCodedTable.open(path))
+    
+    @classmethod
+    def from_dictionary(cls, path: str) -> 'SpellCorrector':
+        """Open a dictionary file, or an untrained corrector if there is none"""
+        if os.path.exists(path):
+            try:
+                return cls.open(path)
+            except ValueError as e:
+                print(f"⚠️ Could not open spell dictionary {path}: {e}")
+        return cls()
+    
+    @classmethod
+    def _frequency_bucket(cls, frequency: int) -> int:
+        """1..255, rising with log(frequency); 0 marks a missing entry in the table"""
+        return min(255, 1 + int(cls.FREQUENCY_STEPS * math.log2(frequency)))
+    
+    @classmethod
+    def _bucket_frequency(cls, bucket: int) -> int:
+        """Smallest frequency stored in a bucket"""
+        return int(math.ceil(2 ** ((bucket - 1) / cls.FREQUENCY_STEPS)))
+    
+    @property
+    def trained(self) -> bool:
+        return self._table is not None or bool(self.vocabulary)
+    
+    def __contains__(self, word: str) -> bool:
+        if self._table is not None:
+            key = f"{word} {word}"
+            return self._table.might_contain(key) and key in self._table
+        return word in self.vocabulary
     
-    def _edits2(self, word: str) -> Set[str]:
-        """Generate all edits that are two edits away"""
-        return set(e2 for e1 in self._edits1(word) for e2 in self._edits1(e1))
+    def frequency(self, word: str) -> int:
+        """Corpus frequency (lower bound of its bucket for dictionary files), 0 if unknown"""
+        if self._table is not None:
+            key = f"{word} {word}"
+            bucket = self._table.get(key) if self._table.might_contain(key) else 0
+            return self._bucket_frequency(bucket) if bucket else 0
+        return self.word_frequency[word]
     
-    def _known(self, words: Set[str]) -> Set[str]:
-        """Return subset of words that are in vocabulary"""
-        return set(w for w in words if w in self.vocabulary)
+    @classmethod
+    def _index_keys(cls, word: str) -> Set[str]:
+        return cls._deletions(word[:cls.PREFIX_LENGTH], cls.MAX_EDIT_DISTANCE)
+    
+    @staticmethod
+    def _deletions(word: str, depth: int) -> Set[str]:
+        """The word and every string with up to depth characters removed"""
+        found = {word}
+        frontier = found
+        for _ in range(depth):
+            frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+            found = found | frontier
+        return found
+    
+    def _candidates(self, deletion: str) -> Iterator[Tuple[str, int]]:
+        """(word, frequency) for every dictionary word indexed under deletion"""
+        if self._table is None:
+            for word in self._deletes.get(deletion, ()):
+                yield word, self.word_frequency[word]
+            return
+        if not self._table.might_extend(deletion):
+            return
+        prefix = f"{deletion} "
+        for entry, bucket in self._table.scan_prefix(prefix):
+            yield entry[len(prefix):], self._bucket_frequency(bucket)
+    
+    @staticmethod
+    def _distance(a: str, b: str, limit: int) -> int:
+        """Edit distance counting adjacent transpositions as one edit; limit + 1 once it exceeds limit"""
+        # Only the differing middle needs the DP
+        start = 0
+        while start < len(a) and start < len(b) and a[start] == b[start]:
+            start += 1
+        end = 0
+        while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+            end += 1
+        a, b = a[start:len(a) - end], b[start:len(b) - end]
+        if not a or not b:
+            return min(max(len(a), len(b)), limit + 1)
+        if abs(len(a) - len(b)) > limit:
+            return limit + 1
+        
+        previous_previous = None
+        previous = list(range(len(b) + 1))
+        for i in range(1, len(a) + 1):
+            current = [i] + [0] * len(b)
+            for j in range(1, len(b) + 1):
+                cost = 0 if a[i - 1] == b[j - 1] else 1
+                current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+                if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                    current[j] = min(current[j], previous_previous[j - 2] + 1)
+            if min(current) > limit:
+                return limit + 1
+            previous_previous, previous = previous, current
+        return min(previous[-1], limit + 1)
+    
+    def suggestions(self, word: str, max_distance: Optional[int] = None) -> List[Tuple[str, int, int]]:
+        """Known words within max_distance as (word, distance, frequency), closest and most frequent first"""
+        word = unicodedata.normalize('NFC', word)
+        limit = self.MAX_EDIT_DISTANCE if max_distance is None else min(max_distance, self.MAX_EDIT_DISTANCE)
+        
+        # A word within limit edits shares a prefix deletion of at most limit characters from each side
+        candidates = {}
+        for deletion in self._deletions(word[:self.PREFIX_LENGTH], limit):
+            candidates.update(self._candidates(deletion))
+        
+        found = []
+        for candidate, frequency in candidates.items():
+            distance = self._distance(word, candidate, limit)
+            if distance <= limit:
+                found.append((candidate, distance, frequency))
+        found.sort(key=lambda item: (item[1], -item[2], item[0]))
+        return found
     
     def correct(self, word: str) -> str:
-        """Correct spelling of word"""
-        if word in self.vocabulary:
+        """Correct spelling of word: the most frequent known word at the smallest edit distance"""
+        word = unicodedata.normalize('NFC', word)
+        if word in self:
             return word
         
-        # Try edits of distance 1
-        candidates = self._known(self._edits1(word))
-        
-        # If no candidates, try edits of distance 2
-        if not candidates:
-            candidates = self._known(self._edits2(word))
+        # Distance 1 needs far fewer probes, so try it first
+        for max_distance in range(1, self.MAX_EDIT_DISTANCE + 1):
+            candidates = self.suggestions(word, max_distance)
+            if candidates:
+                return candidates[0][0]
         
-        # If still no candidates, return original
-        if not candidates:
-            return word
-        
-        # Return most frequent candidate
-        return max(candidates, key=lambda w: self.word_frequency[w])
+        # If no candidates, return original
+        return word
     
     def correct_text(self, text: str) -> str:
-        """Correct spelling in entire text"""
-        words = text.split()
-        corrected_words = [self.correct(word.lower()) for word in words]
+        """Correct spelling in entire text; numbers and short words are kept as they are"""
+        words = text.lower().split()
+        corrected_words = [
+            self.correct(word) if word.isalpha() and len(word) >= self.MIN_CORRECTION_LENGTH else word
+            for word in words
+        ]
         return ' '.join(corrected_words)
 
 
@@ -125,120 +313,162 @@ class VietnameseSpellCorrector:
         return text_lower
 
 
+class ExpansionEdge(NamedTuple):
+    """One way to expand a term"""
+    term: str
+    weight: float
+    relation: str  # 'synonym' and 'hypernym' replace the word, 'hyponym' is appended
+    rank: int  # position of term in its table entry
+
+
+class ExpansionGraph:
+    """Synonym, hypernym and hyponym tables compiled into weighted term edges
+
+    Each word's edges are sorted by weight once, at compile time. Expanding
+    a query merges the edge lists of its words best-first, so the result is
+    ranked, identical on every run, and no edge past the budget is visited.
+    """
+
+    def __init__(self, edges: Dict[str, List[ExpansionEdge]]):
+        self.edges = edges
+
+    @classmethod
+    def compile(cls, synonyms: Dict[str, List[str]], hypernyms: Dict[str, str],
+                hyponyms: Dict[str, List[str]]) -> 'ExpansionGraph':
+        edges = defaultdict(list)
+        for word, terms in synonyms.items():
+            for rank, term in enumerate(terms):
+                edges[word].append(ExpansionEdge(term, SYNONYM_WEIGHT * RANK_DECAY ** rank, 'synonym', rank))
+        for word, term in hypernyms.items():
+            edges[word].append(ExpansionEdge(term, HYPERNYM_WEIGHT, 'hypernym', 0))
+        for word, terms in hyponyms.items():
+            for rank, term in enumerate(terms):
+                edges[word].append(ExpansionEdge(term, HYPONYM_WEIGHT * RANK_DECAY ** rank, 'hyponym', rank))
+        # Stable sort: equal weights keep table order
+        return cls({word: sorted(word_edges, key=lambda edge: -edge.weight) for word, word_edges in edges.items()})
+
+    def expand(self, query: str, max_total: int = 10, relations: Optional[Set[str]] = None,
+               max_rank: Optional[int] = None) -> List[str]:
+        """The query followed by up to max_total - 1 single-edit expansions, best first"""
+        words = list(re.finditer(r"[\w'-]+", query))
+        present = {match.group().lower() for match in words}
+        present |= {word[:-1] for word in present if word.endswith('s')}
+
+        # One heap entry per matched word: (-weight, word position, edge index)
+        word_edges = []
+        for match in words:
+            word = match.group().lower()
+            plural = False
+            if word not in self.edges and word.endswith('s') and word[:-1] in self.edges:
+                word, plural = word[:-1], True
+            word_edges.append((self.edges.get(word, []), plural))
+        heap = [(-edges[0].weight, position, 0) for position, (edges, _) in enumerate(word_edges) if edges]
+        heapq.heapify(heap)
+
+        expansions = [query]
+        seen = {query}
+        while heap and len(expansions) < max_total:
+            _, position, index = heapq.heappop(heap)
+            edges, plural = word_edges[position]
+            if index + 1 < len(edges):
+                heapq.heappush(heap, (-edges[index + 1].weight, position, index + 1))
+
+            edge = edges[index]
+            if relations is not None and edge.relation not in relations:
+                continue
+            if max_rank is not None and edge.rank >= max_rank:
+                continue
+            if edge.term in present:
+                continue
+            if edge.relation == 'hyponym':
+                expansion = f"{query} {edge.term}"
+            else:
+                # A plural word is replaced by the plural of an English term;
+                # Vietnamese terms, with or without accents, do not inflect
+                term = edge.term + 's' if plural and edge.term.isascii() and not is_syllable(edge.term) else edge.term
+                match = words[position]
+                expansion = query[:match.start()] + term + query[match.end():]
+            if expansion not in seen:
+                seen.add(expansion)
+                expansions.append(expansion)
+        return expansions
+
+
 class QueryExpander:
     """Expand queries with synonyms and related terms"""
     
-    def __init__(self):
-        self.preprocessor = NLPPreprocessor()
+    def __init__(self, preprocessor: Optional[NLPPreprocessor] = None):
+        self.preprocessor = preprocessor or NLPPreprocessor()
         
         # Synonym dictionary
-        self.synonyms = {
-            'movie': ['film', 'cinema', 'picture', 'motion picture', 'phim'],
-            'film': ['movie', 'cinema', 'picture', 'phim'],
-            'find': ['search', 'look', 'discover', 'tìm', 'tìm kiếm'],
-            'search': ['find', 'look', 'discover', 'tìm', 'tìm kiếm'],
-            'good': ['great', 'excellent', 'amazing', 'wonderful', 'hay', 'tốt'],
-            'bad': ['poor', 'terrible', 'awful', 'horrible', 'tệ', 'xấu'],
-            'new': ['latest', 'recent', 'fresh', 'modern', 'mới', 'mới nhất'],
-            'old': ['classic', 'vintage', 'retro', 'ancient', 'cũ', 'kinh điển'],
-            'popular': ['trending', 'hot', 'viral', 'famous', 'phổ biến', 'nổi tiếng'],
-            'best': ['top', 'greatest', 'finest', 'excellent', 'hay nhất', 'tốt nhất'],
-            'action': ['adventure', 'thriller', 'hành động'],
-            'comedy': ['humor', 'funny', 'hài', 'hài hước'],
-            'horror': ['scary', 'terror', 'frightening', 'kinh dị'],
-            'romance': ['love', 'romantic', 'tình cảm'],
-            'drama': ['theatrical', 'kịch'],
-            'scifi': ['science fiction', 'sci-fi', 'viễn tưởng'],
-            'fantasy': ['magical', 'giả tưởng'],
-        }
+        self.synonyms = dict(SYNONYMS)
         
         # Hypernyms (more general terms)
-        self.hypernyms = {
-            'action': 'movie',
-            'comedy': 'movie',
-            'horror': 'movie',
-            'romance': 'movie',
-            'thriller': 'movie',
-            'drama': 'movie',
-        }
+        self.hypernyms = dict(HYPERNYMS)
         
         # Hyponyms (more specific terms)
-        self.hyponyms = {
-            'movie': ['action', 'comedy', 'horror', 'romance', 'thriller', 'drama'],
-            'good': ['excellent', 'amazing', 'wonderful'],
-            'bad': ['terrible', 'awful', 'horrible'],
-        }
+        self.hyponyms = dict(HYPONYMS)
+        
+        self.graph = ExpansionGraph.compile(self.synonyms, self.hypernyms, self.hyponyms)
     
     def expand_with_synonyms(self, query: str, max_expansions: int = 3) -> List[str]:
         """Expand query with synonyms"""
-        tokens = self.preprocessor.preprocess(query, remove_stopwords=False)
-        expanded_queries = [query]
-        
-        for token in tokens:
-            if token in self.synonyms:
-                synonyms = self.synonyms[token][:max_expansions]
-                for syn in synonyms:
-                    expanded_query = query.replace(token, syn)
-                    if expanded_query not in expanded_queries:
-                        expanded_queries.append(expanded_query)
-        
-        return expanded_queries
+        return self.graph.expand(query, max_total=len(self.graph.edges) * max_expansions + 1,
+                                 relations={'synonym'}, max_rank=max_expansions)
     
     def expand_with_hypernyms(self, query: str) -> List[str]:
         """Expand query with more general terms"""
-        tokens = self.preprocessor.preprocess(query, remove_stopwords=False)
-        expanded_queries = [query]
-        
-        for token in tokens:
-            if token in self.hypernyms:
-                hypernym = self.hypernyms[token]
-                expanded_query = query.replace(token, hypernym)
-                if expanded_query not in expanded_queries:
-                    expanded_queries.append(expanded_query)
-        
-        return expanded_queries
+        return self.graph.expand(query, max_total=len(self.graph.edges) + 1, relations={'hypernym'})
     
     def expand_with_hyponyms(self, query: str) -> List[str]:
         """Expand query with more specific terms"""
-        tokens = self.preprocessor.preprocess(query, remove_stopwords=False)
-        expanded_queries = [query]
-        
-        for token in tokens:
-            if token in self.hyponyms:
-                hyponyms = self.hyponyms[token]
-                for hypo in hyponyms:
-                    expanded_query = query + ' ' + hypo
-                    if expanded_query not in expanded_queries:
-                        expanded_queries.append(expanded_query)
-        
-        return expanded_queries
+        return self.graph.expand(query, max_total=sum(map(len, self.hyponyms.values())) + 1, relations={'hyponym'})
     
     def expand_all(self, query: str, max_total: int = 10) -> List[str]:
-        """Expand query using all methods"""
-        all_expansions = set([query])
-        
-        # Add synonym expansions
-        all_expansions.update(self.expand_with_synonyms(query))
-        
-        # Add hypernym expansions
-        all_expansions.update(self.expand_with_hypernyms(query))
-        
-        # Add hyponym expansions
-        all_expansions.update(self.expand_with_hyponyms(query))
-        
-        return list(all_expansions)[:max_total]
+        """Expand query using all methods, best expansions first"""
+        return self.graph.expand(query, max_total)
+
+
+def default_phrase_translator() -> PhraseTranslator:
+    """Phrase translator over the domain lexicon, the genre maps, the
+    Vietnamese synonyms and the voice-error fixes, in that order of priority"""
+    vietnamese_synonyms = {
+        synonym: word
+        for word, synonyms in SYNONYMS.items()
+        for synonym in synonyms
+        if not synonym.isascii()
+    }
+    return PhraseTranslator.from_mappings(
+        DOMAIN_LEXICON, MODIFIER_LEXICON, GENRE_MAPPING, VIETNAMESE_GENRE_MAP, vietnamese_synonyms, VOICE_ERROR_MAP,
+        modifiers=set(MODIFIER_LEXICON) | set(GENRE_MAPPING) | set(VIETNAMESE_GENRE_MAP)
+    )
+
+
+def create_translator(backend: Optional[str] = None, cache_path: str = TRANSLATION_CACHE_PATH):
+    """Translation backend by name: 'phrase' (offline) or 'google' (online, falls back to 'phrase')
+    
+    Online translations go through the shared on-disk cache at cache_path,
+    and a timed-out or failing call (or an open circuit) is answered by the
+    phrase translator. The phrase translator alone is faster than a cache
+    lookup and is not cached.
+    """
+    backend = backend or TRANSLATION_BACKEND
+    phrase_translator = default_phrase_translator()
+    if backend == 'google':
+        try:
+            return CachedTranslator(AsyncTranslationClient(), TranslationCache(cache_path), backend,
+                                    fallback=phrase_translator)
+        except Exception as e:
+            print(f"⚠️ Online translation unavailable ({e}), using the phrase translator")
+    return phrase_translator
 
 
 class QueryTranslator:
     """Translate queries to English for better search results"""
     
-    def __init__(self):
-        self.translator = None
-        if TRANSLATOR_AVAILABLE:
-            try:
-                self.translator = Translator()
-            except:
-                self.translator = None
+    def __init__(self, backend: Optional[str] = None, translator=None, language_detector=None):
+        self.translator = translator or create_translator(backend)
+        self.language_detector = language_detector or LanguageDetector()
         
         # Only remove action words at the beginning, not descriptive words
         self.action_stopwords = {
@@ -247,13 +477,7 @@ class QueryTranslator:
         }
         
         # Common speech-recognition mistakes to fix before translation
-        self.voice_error_map = {
-            'fim': 'phim',
-            'fim.': 'phim',
-            'fim,': 'phim',
-            'phin': 'phim',
-            'film': 'phim',  # sometimes Vietnamese accent recognized as film
-        }
+        self.voice_error_map = dict(VOICE_ERROR_MAP)
     
     def _normalize_voice_errors(self, query: str) -> str:
         text = query
@@ -279,25 +503,20 @@ class QueryTranslator:
         
         return ' '.join(words).strip() if words else query
     
-    def translate_to_english(self, query: str) -> str:
-        """Translate query to English if needed, preserving descriptive content"""
+    def translate_to_english(self, query: str, language: Optional[str] = None) -> str:
+        """Translate query to English if needed, preserving descriptive content
+
+        language ('vi' or 'en') is detected locally when not given; English
+        queries skip the translator.
+        """
+        if language is None:
+            language = self.language_detector.detect(query)
         query = self._normalize_voice_errors(query)
-        if not self.translator:
-            # If translator not available, just clean action words
-            return self.clean_action_words(query)
         
         try:
-            # Detect language first
-            detected = self.translator.detect(query)
-            
-            # If already English, just clean action words
-            if detected.lang.lower() == 'en':
-                return self.clean_action_words(query)
-            
             # Translate to English (translate everything, including descriptions)
-            # This matches the Colab behavior: "tìm phim avatar" -> "Find avatar movies"
-            translated = self.translator.translate(query, dest='en')
-            translated_text = translated.text.strip()
+            # This matches the Colab behavior: "tìm phim avatar" -> "find movie avatar"
+            translated_text = query.strip() if language == 'en' else self.translator.translate(query).strip()
             
             # Now clean action words from the translated text
             # Remove patterns like "find movie", "find film", "search movie" at the beginning
@@ -327,9 +546,9 @@ class QueryTranslator:
 class QueryRewriter:
     """Rewrite queries to improve search results"""
     
-    def __init__(self):
-        self.preprocessor = NLPPreprocessor()
-        self.expander = QueryExpander()
+    def __init__(self, preprocessor: Optional[NLPPreprocessor] = None, expander: Optional[QueryExpander] = None):
+        self.preprocessor = preprocessor or NLPPreprocessor()
+        self.expander = expander or QueryExpander(self.preprocessor)
         
         # Query templates
         self.templates = {
@@ -374,7 +593,7 @@ class QueryRewriter:
         
         elif query_type == 'year_search':
             # Extract year
-            year_pattern = r'\b(19|20)\d{2}\b'
+            year_pattern = r'\b(?:19|20)\d{2}\b'
             years = re.findall(year_pattern, query)
             if years:
                 year = years[0]
@@ -412,8 +631,8 @@ class QueryRewriter:
 class QuerySuggester:
     """Generate query suggestions"""
     
-    def __init__(self):
-        self.preprocessor = NLPPreprocessor()
+    def __init__(self, preprocessor: Optional[NLPPreprocessor] = None):
+        self.preprocessor = preprocessor or NLPPreprocessor()
         self.popular_queries = Counter()
         
         # Predefined popular queries
@@ -429,71 +648,84 @@ class QuerySuggester:
             'classic movies',
             'popular movies'
         ]
+        
+        # Completions of every prefix, ranked by how often the query was made;
+        # a predefined suggestion counts as made once
+        self.completions = CompletionTrie.build((suggestion, 1.0) for suggestion in self.predefined_suggestions)
+        
+        # Inverted index: token -> stored queries containing it. Posting lists
+        # are append-only, so lookups can read them while queries are added.
+        self.postings: Dict[str, List[str]] = defaultdict(list)
     
-    def add_query(self, query: str):
-        """Add query to history"""
-        normalized = self.preprocessor.preprocess(query, remove_stopwords=False)
-        self.popular_queries[' '.join(normalized)] += 1
+    def add_query(self, query: str, weight: float = 1.0):
+        """Add query to history
+        
+        weight is 1 for a plain count; QueryLog passes forward-decayed
+        weights, which only grow over time, so the most popular queries rank
+        first. Not safe for concurrent writers: the service adds queries
+        from the query log thread only.
+        """
+        normalized = normalize_query(query)
+        if normalized:
+            if normalized not in self.popular_queries:
+                # Index a query's tokens once, when it is first seen
+                for token in set(self.preprocessor.preprocess(normalized)):
+                    self.postings[token].append(normalized)
+            self.popular_queries[normalized] += weight
+            self.completions.add(normalized, weight)
     
     def get_suggestions(self, partial_query: str, max_suggestions: int = 5) -> List[str]:
-        """Get query suggestions based on partial input"""
-        suggestions = []
-        partial_lower = partial_query.lower()
-        
-        # Check predefined suggestions
-        for suggestion in self.predefined_suggestions:
-            if suggestion.startswith(partial_lower):
-                suggestions.append(suggestion)
-        
-        # Check popular queries
-        for query, count in self.popular_queries.most_common(20):
-            if query.startswith(partial_lower):
-                suggestions.append(query)
-        
-        # Remove duplicates and limit
-        suggestions = list(dict.fromkeys(suggestions))
-        return suggestions[:max_suggestions]
+        """Get query suggestions based on partial input, most frequent first"""
+        return self.completions.complete(partial_query, max_suggestions)
     
     def get_related_queries(self, query: str, max_related: int = 5) -> List[str]:
-        """Get related queries"""
+        """Get related queries: stored queries sharing the most tokens, then the most popular"""
         tokens = set(self.preprocessor.preprocess(query))
-        related = []
+        normalized = normalize_query(query)
         
-        # Find queries with overlapping tokens
-        for stored_query, count in self.popular_queries.most_common(50):
-            stored_tokens = set(self.preprocessor.preprocess(stored_query))
-            overlap = len(tokens & stored_tokens)
-            
-            if overlap > 0 and stored_query != query:
-                related.append((stored_query, overlap, count))
-        
-        # Sort by overlap and frequency
-        related.sort(key=lambda x: (x[1], x[2]), reverse=True)
-        
-        return [q for q, _, _ in related[:max_related]]
+        # Union of the posting lists, counting how many query tokens each stored query shares
+        overlaps = Counter()
+        for token in tokens:
+            postings = self.postings.get(token)
+            if postings:
+                overlaps.update(postings)
+        overlaps.pop(normalized, None)
+        
+        return heapq.nsmallest(
+            max_related, overlaps,
+            key=lambda stored_query: (-overlaps[stored_query], -self.popular_queries[stored_query], stored_query)
+        )
 
 
 class NLPQueryProcessor:
     """Main query processing pipeline"""
     
-    def __init__(self):
-        self.spell_corrector = SpellCorrector()
+    def __init__(self, preprocessor: Optional[NLPPreprocessor] = None,
+                 query_expander: Optional[QueryExpander] = None,
+                 query_translator: Optional[QueryTranslator] = None,
+                 spell_corrector: Optional[SpellCorrector] = None):
+        self.preprocessor = preprocessor or NLPPreprocessor()
+        self.spell_corrector = spell_corrector or SpellCorrector.from_dictionary(SPELL_DICTIONARY_PATH)
         self.vietnamese_corrector = VietnameseSpellCorrector()
-        self.query_expander = QueryExpander()
-        self.query_rewriter = QueryRewriter()
-        self.query_suggester = QuerySuggester()
-        self.query_translator = QueryTranslator()
-        self.preprocessor = NLPPreprocessor()
+        self.query_expander = query_expander or QueryExpander(self.preprocessor)
+        self.query_rewriter = QueryRewriter(self.preprocessor, self.query_expander)
+        self.query_suggester = QuerySuggester(self.preprocessor)
+        self.query_translator = query_translator or QueryTranslator()
     
     def process_query(self, query: str, query_type: str = None) -> Dict[str, any]:
         """Complete query processing pipeline"""
         # Step 1: Translate to English FIRST (preserves Vietnamese descriptions)
-        translated_query = self.query_translator.translate_to_english(query)
+        language = self.query_translator.language_detector.detect(query)
+        translated_query = self.query_translator.translate_to_english(query, language)
         
         # Step 2: If translation didn't change much, apply spell correction
+        # and translate again only if the correction changed something
         if translated_query == query or not translated_query:
             corrected_query = self.vietnamese_corrector.correct(query)
-            translated_query = self.query_translator.translate_to_english(corrected_query)
+            if self.spell_corrector.trained:
+                corrected_query = self.spell_corrector.correct_text(corrected_query)
+            if corrected_query != query:
+                translated_query = self.query_translator.translate_to_english(corrected_query)
         
         corrected_query = translated_query if translated_query else query
         
@@ -0,0 +1,208 @@
+"""
+Query Log Module
+Records search queries off the request path into an append-only JSON-lines
+log and keeps time-decayed query popularity that survives restarts
+"""
+
+import os
+import json
+import math
+import time
+import queue
+import threading
+from typing import Dict, Optional, Any
+
+from nlp_online_learning import QueryLogReader
+
+
+# A query's popularity halves after this many seconds without new searches
+POPULARITY_HALF_LIFE_SECONDS = float(os.getenv("POPULARITY_HALF_LIFE_DAYS", "7")) * 86400
+# Snapshots older than this many half-lives are rescaled on load
+REBASE_AFTER_HALF_LIVES = 64
+# Rescaled scores below this are dropped
+MIN_SCORE = 1e-3
+
+
+class DecayedPopularity:
+    """Exponential decay kept as forward decay
+
+    A search at time t adds 2 ** ((t - landmark) / half_life) to its query,
+    so stored scores only grow and their order is the order of the decayed
+    counts at any moment. The landmark is the time of the first record, so
+    every process reading the same log arrives at the same scores.
+    """
+
+    def __init__(self, half_life_seconds: float = POPULARITY_HALF_LIFE_SECONDS, landmark: Optional[float] = None):
+        self.rate = math.log(2) / half_life_seconds
+        self.landmark = landmark
+
+    def weight(self, timestamp: float) -> float:
+        if self.landmark is None:
+            self.landmark = timestamp
+        return math.exp(self.rate * (timestamp - self.landmark))
+
+    def decayed(self, score: float, now: Optional[float] = None) -> float:
+        """Decayed count at now of a stored score"""
+        if self.landmark is None:
+            return score
+        now = time.time() if now is None else now
+        return score * math.exp(-self.rate * (now - self.landmark))
+
+
+class QueryLog:
+    """Append-only query log feeding a QuerySuggester
+
+    record() only enqueues, so request threads never wait on the disk. A
+    background thread appends queued records to the log, then folds every
+    line it has not read yet, including lines other workers appended, into
+    the suggester, and periodically snapshots the scores with the log
+    offset they cover. On start the snapshot is loaded and only the log
+    after it is replayed.
+    """
+
+    def __init__(self, path: str, suggester, snapshot_path: Optional[str] = None,
+                 half_life_seconds: float = POPULARITY_HALF_LIFE_SECONDS,
+                 flush_seconds: float = 1.0, snapshot_seconds: float = 300.0):
+        self.path = path
+        self.suggester = suggester
+        self.snapshot_path = snapshot_path or os.path.splitext(path)[0] + ".popularity.json"
+        self.popularity = DecayedPopularity(half_life_seconds)
+        self.flush_seconds = flush_seconds
+        self.snapshot_seconds = snapshot_seconds
+
+        self.reader = QueryLogReader(path)
+        self.records_read = 0
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()  # the background thread vs flush() and close()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_snapshot = time.monotonic()
+
+    def record(self, query: str, **fields: Any):
+        """Queue a query for the log; safe to call from any thread"""
+        if query and query.strip():
+            self._queue.put({'query': query, 'ts': time.time(), **fields})
+
+    def start(self):
+        """Restore the snapshot, replay the log after it and start the writer thread"""
+        self.load_snapshot()
+        self.flush()
+        self._thread = threading.Thread(target=self._run, name="query-log", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+                if time.monotonic() - self._last_snapshot >= self.snapshot_seconds:
+                    self.snapshot()
+            except OSError as e:
+                print(f"⚠️ Query log error: {e}")
+
+    def flush(self) -> int:
+        """Append queued records, then fold all unread log lines in; returns the records folded"""
+        with self._lock:
+            records = []
+            while True:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if records:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # One write per batch; O_APPEND keeps lines from several workers whole
+                data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(data)
+            return self._fold()
+
+    def _fold(self) -> int:
+        folded = 0
+        for batch in self.reader.read_batches():
+            for record in batch:
+                query = record.get('query')
+                if isinstance(query, str):
+                    timestamp = record.get('ts')
+                    timestamp = float(timestamp) if isinstance(timestamp, (int, float)) else time.time()
+                    self.suggester.add_query(query, self.popularity.weight(timestamp))
+                    folded += 1
+        self.records_read += folded
+        return folded
+
+    def snapshot(self):
+        """Write the scores and the log offset they cover, replacing the previous snapshot atomically"""
+        with self._lock:
+            state = {
+                'landmark': self.popularity.landmark,
+                'rate': self.popularity.rate,
+                'offset': self.reader.offset,
+                'scores': dict(self.suggester.popular_queries),
+            }
+            tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_path)
+            self._last_snapshot = time.monotonic()
+
+    def load_snapshot(self) -> bool:
+        """Restore scores and offset; a snapshot ahead of the log (rotated) or unreadable is ignored"""
+        try:
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                state = json.load(f)
+            offset, landmark, scores = int(state['offset']), state['landmark'], state['scores']
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        log_size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if offset > log_size or not math.isclose(state.get('rate', self.popularity.rate), self.popularity.rate):
+            return False
+
+        if landmark is not None:
+            # Move an old landmark forward so new weights stay far from overflow
+            half_lives = (time.time() - landmark) * self.popularity.rate / math.log(2)
+            if half_lives > REBASE_AFTER_HALF_LIVES:
+                scale = math.exp(-self.popularity.rate * (time.time() - landmark))
+                scores = {query: score * scale for query, score in scores.items() if score * scale >= MIN_SCORE}
+                landmark = time.time()
+        self.popularity.landmark = landmark
+        self.reader.offset = offset
+        for query, score in scores.items():
+            self.suggester.add_query(query, score)
+        return True
+
+    def close(self):
+        """Stop the writer thread, write what is queued and snapshot"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        self.snapshot()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'log_path': self.path,
+            'records_read': self.records_read,
+            'offset': self.reader.offset,
+            'queries': len(self.suggester.popular_queries),
+        }
+
+
+# Example usage
+if __name__ == "__main__":
+    import tempfile
+    from nlp_query_expansion import QuerySuggester
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "query_log.jsonl")
+        log = QueryLog(path, QuerySuggester())
+        log.start()
+        for query in ['avatar', 'avatar 2', 'avatar', 'phim hành động']:
+            log.record(query, source='example')
+        log.close()
+        print(f"✅ {log.stats()}")
+
+        restored = QueryLog(path, QuerySuggester())
+        restored.start()
+        print(f"🔁 after restart: {restored.suggester.get_suggestions('av')}")
+        restored.close()
@@ -0,0 +1,156 @@
+"""
+Rule Engine Module
+Declarative rule tables for intent, query type, sort order and complexity,
+compiled into a token -> signal bitmask index
+"""
+
+from typing import List, Dict, Tuple, Iterable, NamedTuple, Optional
+
+
+# ===== Rule Tables =====
+
+# Signals raised by tokens. The year signal is raised by any 4-digit token.
+SIGNAL_KEYWORDS = {
+    'genre_keyword': {'action', 'comedy', 'horror', 'romance', 'thriller', 'drama', 'scifi'},
+    'popularity_keyword': {'popular', 'trending', 'hot', 'pho', 'bien'},
+    'rating_keyword': {'best', 'top', 'hay', 'nhat', 'good', 'great'},
+    'similarity_keyword': {'similar', 'like', 'tuong', 'tu', 'giong'},
+    'actor_keyword': {'actor', 'actress', 'dien', 'vien', 'starring', 'cast'},
+    'new_release_keyword': {'new', 'moi', 'latest', 'nhat'},
+}
+
+# Signals supplied by the caller from recognized entities
+ENTITY_SIGNALS = [
+    'has_genre', 'has_year', 'has_person', 'has_rating_expression',
+    'has_popularity_expression', 'has_time_expression', 'has_title',
+]
+
+# Ordered (required signals, result) tables; the first row whose signals are all present wins
+INTENT_RULES = [
+    (('year_token',), 'search_by_year'),
+    (('genre_keyword',), 'search_by_genre'),
+    (('popularity_keyword',), 'search_popular'),
+    (('rating_keyword',), 'search_high_rating'),
+    (('similarity_keyword',), 'search_similar'),
+    (('actor_keyword',), 'search_by_actor'),
+]
+DEFAULT_INTENT = 'search_by_title'
+
+QUERY_TYPE_RULES = [
+    (('has_person',), 'person_search'),
+    (('has_genre', 'has_year'), 'genre_year_search'),
+    (('has_genre',), 'genre_search'),
+    (('has_year',), 'year_search'),
+    (('has_rating_expression',), 'rating_search'),
+    (('has_popularity_expression',), 'popularity_search'),
+    (('has_time_expression',), 'time_based_search'),
+    (('has_title',), 'title_search'),
+]
+DEFAULT_QUERY_TYPE = 'general_search'
+
+SORT_RULES = [
+    (('has_rating_expression',), 'rating'),
+    (('has_popularity_expression',), 'popularity'),
+    (('has_time_expression', 'new_release_keyword'), 'release_date_desc'),
+    (('has_time_expression',), 'release_date_asc'),
+]
+
+COMPLEXITY_WEIGHTS = {
+    'has_genre': 1,
+    'has_year': 1,
+    'has_person': 2,
+    'has_rating_expression': 1,
+    'has_popularity_expression': 1,
+    'has_title': 2,
+}
+# (max score, level) in ascending order; anything above is 'complex'
+COMPLEXITY_LEVELS = [(1, 'simple'), (3, 'moderate')]
+
+
+class RuleDecision(NamedTuple):
+    """Everything the rule tables decide for one set of signals"""
+    intents: Tuple[str, ...]  # every matching intent rule, in priority order
+    intent: str
+    query_type: str
+    sort_by: Optional[str]
+    complexity: str
+
+
+class RuleEngine:
+    """Evaluate the rule tables with one pass over the tokens"""
+
+    def __init__(self):
+        signal_names = ['year_token'] + list(SIGNAL_KEYWORDS) + ENTITY_SIGNALS
+        self.signal_bits = {name: 1 << i for i, name in enumerate(signal_names)}
+        self._year_bit = self.signal_bits['year_token']
+
+        # Token -> bitmask of every signal the token raises
+        self.token_index: Dict[str, int] = {}
+        for signal, keywords in SIGNAL_KEYWORDS.items():
+            for keyword in keywords:
+                self.token_index[keyword] = self.token_index.get(keyword, 0) | self.signal_bits[signal]
+
+        self._intent_rules = self._compile(INTENT_RULES)
+        self._query_type_rules = self._compile(QUERY_TYPE_RULES)
+        self._sort_rules = self._compile(SORT_RULES)
+        self._complexity_weights = [(self.signal_bits[name], weight) for name, weight in COMPLEXITY_WEIGHTS.items()]
+
+        # The signal space is small, so decisions are memoized per bitmask
+        self._decisions: Dict[int, RuleDecision] = {}
+
+    def _compile(self, rules: List[Tuple[Tuple[str, ...], str]]) -> List[Tuple[int, str]]:
+        compiled = []
+        for signals, result in rules:
+            mask = 0
+            for signal in signals:
+                mask |= self.signal_bits[signal]
+            compiled.append((mask, result))
+        return compiled
+
+    def signal_mask(self, tokens: Iterable[str], signals: Iterable[str] = ()) -> int:
+        """OR together the signals raised by the tokens and the named extra signals"""
+        mask = 0
+        for signal in signals:
+            mask |= self.signal_bits[signal]
+        for token in tokens:
+            mask |= self.token_index.get(token, 0)
+            if len(token) == 4 and token.isdigit():
+                mask |= self._year_bit
+        return mask
+
+    def decide_mask(self, mask: int) -> RuleDecision:
+        """Apply every rule table to a signal bitmask"""
+        decision = self._decisions.get(mask)
+        if decision is not None:
+            return decision
+
+        intents = tuple(result for required, result in self._intent_rules if mask & required == required)
+        query_type = next(
+            (result for required, result in self._query_type_rules if mask & required == required),
+            DEFAULT_QUERY_TYPE
+        )
+        sort_by = next(
+            (result for required, result in self._sort_rules if mask & required == required),
+            None
+        )
+
+        score = sum(weight for bit, weight in self._complexity_weights if mask & bit)
+        complexity = next((level for max_score, level in COMPLEXITY_LEVELS if score <= max_score), 'complex')
+
+        decision = RuleDecision(
+            intents=intents,
+            intent=intents[0] if intents else DEFAULT_INTENT,
+            query_type=query_type,
+            sort_by=sort_by,
+            complexity=complexity
+        )
+        self._decisions[mask] = decision
+        return decision
+
+    def decide(self, tokens: Iterable[str], signals: Iterable[str] = ()) -> RuleDecision:
+        """Decide intent, query type, sort order and complexity together"""
+        return self.decide_mask(self.signal_mask(tokens, signals))
+
+
+# Rule tables are read-only, so one compiled engine is shared by every component
+DEFAULT_RULE_ENGINE = RuleEngine()
@@ -4,7 +4,7 @@ Implements various similarity algorithms for text comparison
 """
 
 import math
-from typing import List, Dict, Set, Tuple
+from typing import List, Dict, Set, Tuple, Optional
 from collections import Counter
 from nlp_preprocessing import NLPPreprocessor, TFIDFVectorizer
 
@@ -220,8 +220,8 @@ class WordEmbedding:
 class SemanticSimilarityCalculator:
     """Main class for calculating semantic similarity"""
     
-    def __init__(self):
-        self.preprocessor = NLPPreprocessor()
+    def __init__(self, preprocessor: Optional[NLPPreprocessor] = None):
+        self.preprocessor = preprocessor or NLPPreprocessor()
         self.tfidf = TFIDFVectorizer()
         self.word_embedding = None
         
@@ -283,8 +283,8 @@ class SemanticSimilarityCalculator:
 class FuzzyMatcher:
     """Fuzzy string matching for movie titles"""
     
-    def __init__(self):
-        self.preprocessor = NLPPreprocessor()
+    def __init__(self, preprocessor: Optional[NLPPreprocessor] = None):
+        self.preprocessor = preprocessor or NLPPreprocessor()
     
     def fuzzy_match(self, query: str, candidates: List[str], threshold: float = 0.6) -> List[Tuple[str, float]]:
         """Fuzzy match query against candidates"""
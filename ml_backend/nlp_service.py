@@ -8,23 +8,32 @@ from pathlib import Path
 from typing import List, Dict, Optional, Any
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from functools import lru_cache
 import time
 
 # Import custom NLP modules
-from nlp_preprocessing import NLPPreprocessor, TFIDFVectorizer
-from nlp_intent_classifier import IntentClassifier
-from nlp_ner import QueryAnalyzer, SemanticMatcher
-from nlp_semantic_similarity import SemanticSimilarityCalculator, FuzzyMatcher
-from nlp_query_expansion import NLPQueryProcessor
+from nlp_online_learning import OnlineIntentTrainer
+from nlp_ner import CATALOG_GAZETTEER_PATH, PHONETIC_INDEX_PATH
+from nlp_gazetteer import CatalogGazetteer
+from nlp_phonetic import PhoneticIndex
+from nlp_query_expansion import SPELL_DICTIONARY_PATH
+from nlp_spell_dictionary import load_or_build_dictionary
+from nlp_components import default_registry, peak_rss_mb
+from nlp_query_log import QueryLog
 from hybrid_search_engine import HybridSearchEngine
 
 BASE_DIR = Path(__file__).resolve().parent
 DEFAULT_DATA_DIR = BASE_DIR / "data"
 DEFAULT_DATASET_PATH = DEFAULT_DATA_DIR / "rotten_tomatoes_ENRICHED.csv"
+DEFAULT_INTENT_MODEL_PATH = DEFAULT_DATA_DIR / "intent_model.npz"
+INTENT_BATCH_MAX_SIZE = int(os.getenv("INTENT_BATCH_MAX_SIZE", "10000"))
+INTENT_CASCADE = os.getenv("INTENT_CASCADE", "0").lower() in ("1", "true", "yes")
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", str(DEFAULT_INTENT_MODEL_PATH))
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", str(DEFAULT_DATA_DIR / "query_log.jsonl"))
+QUERY_LOG_SNAPSHOT_SECONDS = float(os.getenv("QUERY_LOG_SNAPSHOT_SECONDS", "300"))
 
 
 # ===== Pydantic Models =====
@@ -38,6 +47,21 @@ class TextAnalysisRequest(BaseModel):
     text: str = Field(..., description="Text to analyze")
 
 
+class IntentBatchRequest(BaseModel):
+    texts: List[str] = Field(..., description="Texts to classify")
+
+
+class IntentExample(BaseModel):
+    query: str = Field(..., description="Query text")
+    intent: Optional[str] = Field(None, description="Intent label; omit to use a rule-based weak label")
+
+
+class IntentLearnRequest(BaseModel):
+    examples: List[IntentExample] = Field(default_factory=list, description="Extra examples to learn from")
+    consume_log: bool = Field(True, description="Also learn from queries appended to the query log")
+    save: bool = Field(True, description="Persist the updated model artifact")
+
+
 class SimilarityRequest(BaseModel):
     text1: str = Field(..., description="First text")
     text2: str = Field(..., description="Second text")
@@ -73,6 +97,12 @@ class IntentClassificationResponse(BaseModel):
     details: Dict
 
 
+class IntentBatchResponse(BaseModel):
+    results: List[IntentClassificationResponse]
+    count: int
+    processing_time_ms: float
+
+
 class SimilarityResponse(BaseModel):
     similarities: Dict[str, float]
     most_similar_method: str
@@ -93,9 +123,29 @@ class QueryExpansionResponse(BaseModel):
     suggestions: List[str]
 
 
+class AutocompleteResponse(BaseModel):
+    query: str
+    suggestions: List[str]
+    processing_time_ms: float
+
+
+class TitleSuggestion(BaseModel):
+    title: str
+    year: Optional[int] = None
+    popularity: float
+    exact: bool
+
+
+class TitleTypeaheadResponse(BaseModel):
+    query: str
+    suggestions: List[TitleSuggestion]
+    processing_time_ms: float
+
+
 class HybridSearchRequest(BaseModel):
     query: str = Field(..., description="Search query")
     top_k: Optional[int] = Field(5, description="Number of results to return")
+    apply_filters: Optional[bool] = Field(True, description="Filter and sort by the genres, years, people and sort order found in the query")
 
 
 class HybridSearchResponse(BaseModel):
@@ -103,6 +153,9 @@ class HybridSearchResponse(BaseModel):
     intent: str
     alpha: float
     results: List[Dict[str, Any]]
+    total: int = 0
+    facets: Optional[Dict[str, Any]] = None
+    search_parameters: Optional[Dict[str, Any]] = None
     processing_time_ms: float
 
 
@@ -110,11 +163,13 @@ class HybridSearchResponse(BaseModel):
 
 NLP_PREPROCESSOR = None
 INTENT_CLASSIFIER = None
+INTENT_TRAINER = None
 QUERY_ANALYZER = None
 SEMANTIC_MATCHER = None
 SIMILARITY_CALCULATOR = None
 FUZZY_MATCHER = None
 QUERY_PROCESSOR = None
+QUERY_LOG = None
 HYBRID_SEARCH_ENGINE = None
 
 
@@ -122,35 +177,81 @@ HYBRID_SEARCH_ENGINE = None
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize NLP models on startup"""
-    global NLP_PREPROCESSOR, INTENT_CLASSIFIER, QUERY_ANALYZER
+    global NLP_PREPROCESSOR, INTENT_CLASSIFIER, INTENT_TRAINER, QUERY_ANALYZER
     global SEMANTIC_MATCHER, SIMILARITY_CALCULATOR, FUZZY_MATCHER, QUERY_PROCESSOR
-    global HYBRID_SEARCH_ENGINE
+    global QUERY_LOG, HYBRID_SEARCH_ENGINE
 
     print("\n" + "=" * 60)
     print("Initializing NLP Service...")
     print("=" * 60 + "\n")
+    startup_start = time.perf_counter()
+
+    # Components are built once here and shared between everything that uses them
+    registry = default_registry(intent_cascade=INTENT_CASCADE)
 
     print("Loading NLP Preprocessor...")
-    NLP_PREPROCESSOR = NLPPreprocessor()
+    NLP_PREPROCESSOR = registry.get('preprocessor')
 
     print("Loading Intent Classifier...")
-    INTENT_CLASSIFIER = IntentClassifier()
-    INTENT_CLASSIFIER.train_from_examples()
+    INTENT_CLASSIFIER = registry.get('intent_classifier')
+    if INTENT_CLASSIFIER.load_or_train(INTENT_MODEL_PATH):
+        print(f"✅ Intent model loaded from: {INTENT_MODEL_PATH}")
+    else:
+        print(f"✅ Intent model trained and saved to: {INTENT_MODEL_PATH}")
+    INTENT_TRAINER = OnlineIntentTrainer(INTENT_CLASSIFIER)
+
+    # Entity recognizers memory-map these tables, so build them before any of them
+    print("Loading Catalog Gazetteer...")
+    try:
+        catalog = CatalogGazetteer.load_or_build(
+            CATALOG_GAZETTEER_PATH, os.getenv("MOVIE_DATASET_PATH", str(DEFAULT_DATASET_PATH))
+        )
+        if catalog is not None:
+            print(f"✅ {len(catalog)} catalog people and titles: {CATALOG_GAZETTEER_PATH}")
+            PhoneticIndex.load_or_build(PHONETIC_INDEX_PATH, catalog)
+            print(f"✅ Phonetic name index: {PHONETIC_INDEX_PATH}")
+        else:
+            print("⚠️ No dataset or catalog gazetteer found. Using built-in entity dictionaries only.")
+    except Exception as e:
+        print(f"⚠️ Could not build catalog gazetteer ({e}). Using built-in entity dictionaries only.")
+
+    # Built once from the dataset and query logs; later startups only memory-map it
+    print("Loading Spell Dictionary...")
+    try:
+        spell_corrector = load_or_build_dictionary(
+            SPELL_DICTIONARY_PATH, os.getenv("MOVIE_DATASET_PATH", str(DEFAULT_DATASET_PATH)), [QUERY_LOG_PATH]
+        )
+        registry.register('spell_corrector', lambda r: spell_corrector)
+        if spell_corrector.trained:
+            print(f"✅ Spell dictionary: {SPELL_DICTIONARY_PATH}")
+        else:
+            print("⚠️ No dataset, query log or spell dictionary found. Spell correction is disabled.")
+    except Exception as e:
+        print(f"⚠️ Could not build spell dictionary ({e}). Spell correction is disabled.")
 
     print("Loading Query Analyzer...")
-    QUERY_ANALYZER = QueryAnalyzer()
+    QUERY_ANALYZER = registry.get('query_analyzer')
 
     print("Loading Semantic Matcher...")
-    SEMANTIC_MATCHER = SemanticMatcher()
+    SEMANTIC_MATCHER = registry.get('semantic_matcher')
 
     print("Loading Similarity Calculator...")
-    SIMILARITY_CALCULATOR = SemanticSimilarityCalculator()
+    SIMILARITY_CALCULATOR = registry.get('similarity_calculator')
 
     print("Loading Fuzzy Matcher...")
-    FUZZY_MATCHER = FuzzyMatcher()
+    FUZZY_MATCHER = registry.get('fuzzy_matcher')
 
     print("Loading Query Processor...")
-    QUERY_PROCESSOR = NLPQueryProcessor()
+    QUERY_PROCESSOR = registry.get('query_processor')
+
+    # Searches are appended to the query log; suggestions are rebuilt from its snapshot and tail
+    print("Loading Query Log...")
+    QUERY_LOG = QueryLog(QUERY_LOG_PATH, QUERY_PROCESSOR.query_suggester, snapshot_seconds=QUERY_LOG_SNAPSHOT_SECONDS)
+    try:
+        QUERY_LOG.start()
+        print(f"✅ {QUERY_LOG.records_read} logged queries replayed: {QUERY_LOG_PATH}")
+    except OSError as e:
+        print(f"⚠️ Could not read query log ({e}). Popular queries start empty.")
 
     # Initialize Hybrid Search Engine (optional - requires dataset)
     print("\n" + "=" * 60)
@@ -159,7 +260,9 @@ async def lifespan(app: FastAPI):
     try:
         data_dir = os.getenv("HYBRID_DATA_DIR", str(DEFAULT_DATA_DIR))
         dataset_path = os.getenv("MOVIE_DATASET_PATH", str(DEFAULT_DATASET_PATH))
-        HYBRID_SEARCH_ENGINE = HybridSearchEngine(data_dir=data_dir)
+        HYBRID_SEARCH_ENGINE = HybridSearchEngine(
+            data_dir=data_dir, translator=registry.get('translator'), language_detector=registry.get('language_detector')
+        )
         
         # Ensure dataset exists
         if os.path.exists(dataset_path):
@@ -189,11 +292,21 @@ async def lifespan(app: FastAPI):
         print("   Hybrid search will be disabled")
         HYBRID_SEARCH_ENGINE = None
 
-    print("\n✅ NLP Service ready!\n")
+    startup_seconds = time.perf_counter() - startup_start
+    rss_mb = peak_rss_mb()
+    rss = f", peak RSS {rss_mb:.0f} MB" if rss_mb is not None else ""
+    print(f"\n✅ NLP Service ready in {startup_seconds:.2f}s{rss}\n")
 
     yield
 
     print("\n🔴 Shutting down NLP Service...")
+    try:
+        QUERY_LOG.close()
+    except OSError as e:
+        print(f"⚠️ Could not write query log ({e})")
+    translator = registry.get('translator')
+    if hasattr(translator, 'close'):
+        translator.close()
 
 
 # ===== FastAPI App =====
@@ -266,10 +379,15 @@ def root():
             "voice_search": "/api/nlp/voice-search",
             "hybrid_search": "/api/nlp/hybrid-search",
             "intent_classification": "/api/nlp/intent",
+            "intent_classification_batch": "/api/nlp/intent/batch",
+            "intent_metrics": "/api/nlp/intent/metrics",
+            "intent_learn": "/api/nlp/intent/learn",
             "query_analysis": "/api/nlp/analyze",
             "similarity": "/api/nlp/similarity",
             "fuzzy_match": "/api/nlp/fuzzy-match",
             "query_expansion": "/api/nlp/expand-query",
+            "autocomplete": "/api/nlp/autocomplete",
+            "title_typeahead": "/api/nlp/title-typeahead",
             "preprocess": "/api/nlp/preprocess"
         }
     }
@@ -339,6 +457,7 @@ def process_voice_search(request: VoiceSearchRequest):
             normalized_text,
             normalized_lang
         )
+        QUERY_LOG.record(normalized_text, source='voice_search')
 
         final_response = cached_response.model_copy(
             update={"original_text": request.voice_text}
@@ -367,7 +486,15 @@ def hybrid_search(request: HybridSearchRequest):
         )
     
     try:
-        results = HYBRID_SEARCH_ENGINE.search_hybrid(request.query, top_k=request.top_k)
+        search_parameters = None
+        if request.apply_filters and QUERY_ANALYZER is not None:
+            search_parameters = QUERY_ANALYZER.analyze_query(request.query)['search_parameters']
+        
+        search = HYBRID_SEARCH_ENGINE.search_with_facets(
+            request.query, top_k=request.top_k, search_parameters=search_parameters
+        )
+        results = search['results']
+        QUERY_LOG.record(request.query, source='hybrid_search')
         
         end_time = time.perf_counter()
         processing_time_ms = (end_time - start_time) * 1000
@@ -384,6 +511,9 @@ def hybrid_search(request: HybridSearchRequest):
             intent=intent,
             alpha=alpha,
             results=results,
+            total=search['total'],
+            facets=search['facets'],
+            search_parameters=search_parameters,
             processing_time_ms=processing_time_ms
         )
     
@@ -404,7 +534,8 @@ def classify_intent(request: TextAnalysisRequest):
                 'naive_bayes': result['naive_bayes'],
                 'svm': result['svm'],
                 'rule_based': result['rule_based'],
-                'tokens': result['tokens']
+                'tokens': result['tokens'],
+                'stage': result['stage']
             }
         )
 
@@ -412,6 +543,76 @@ def classify_intent(request: TextAnalysisRequest):
         raise HTTPException(status_code=500, detail=f"Intent classification error: {str(e)}")
 
 
+@app.get("/api/nlp/intent/metrics")
+def intent_metrics():
+    return {
+        "cascade_enabled": INTENT_CLASSIFIER.cascade,
+        **INTENT_CLASSIFIER.cascade_metrics()
+    }
+
+
+@app.post("/api/nlp/intent/batch", response_model=IntentBatchResponse)
+def classify_intent_batch(request: IntentBatchRequest):
+    if len(request.texts) > INTENT_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(request.texts)} texts (max {INTENT_BATCH_MAX_SIZE})"
+        )
+
+    start_time = time.perf_counter()
+
+    try:
+        results = INTENT_CLASSIFIER.classify_batch(request.texts)
+
+        return IntentBatchResponse(
+            results=[
+                IntentClassificationResponse(
+                    intent=result['intent'],
+                    confidence=result['confidence'],
+                    details={
+                        'naive_bayes': result['naive_bayes'],
+                        'svm': result['svm'],
+                        'rule_based': result['rule_based'],
+                        'tokens': result['tokens'],
+                        'stage': result['stage']
+                    }
+                )
+                for result in results
+            ],
+            count=len(results),
+            processing_time_ms=(time.perf_counter() - start_time) * 1000
+        )
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch intent classification error: {str(e)}")
+
+
+@app.post("/api/nlp/intent/learn")
+def learn_intent(request: IntentLearnRequest):
+    """Incrementally update the intent models and swap them in without a restart"""
+    try:
+        stats = {'batches': 0, 'labelled': 0, 'weakly_labelled': 0, 'skipped': 0}
+
+        if request.examples:
+            example_stats = INTENT_TRAINER.learn([example.model_dump() for example in request.examples])
+            stats['batches'] += 1
+            for key, value in example_stats.items():
+                stats[key] += value
+
+        if request.consume_log:
+            for key, value in INTENT_TRAINER.consume(QUERY_LOG_PATH).items():
+                stats[key] += value
+
+        learned = stats['labelled'] + stats['weakly_labelled']
+        if request.save and learned:
+            INTENT_CLASSIFIER.save_model(INTENT_MODEL_PATH)
+
+        return {"learned": learned, "saved": bool(request.save and learned), **stats}
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Intent learning error: {str(e)}")
+
+
 # ===== Query Analysis =====
 
 @app.post("/api/nlp/analyze")
@@ -496,6 +697,39 @@ def expand_query(request: QueryExpansionRequest):
         raise HTTPException(status_code=500, detail=f"Query expansion error: {str(e)}")
 
 
+# ===== Autocomplete =====
+
+@app.get("/api/nlp/autocomplete", response_model=AutocompleteResponse)
+def autocomplete(q: str = Query("", description="Text typed so far"),
+                 limit: int = Query(5, ge=1, le=10, description="Number of suggestions")):
+    """Most frequent past queries starting with q; one trie step per character of q"""
+    start_time = time.perf_counter()
+    suggestions = QUERY_PROCESSOR.query_suggester.get_suggestions(q, max_suggestions=limit)
+    return AutocompleteResponse(
+        query=q,
+        suggestions=suggestions,
+        processing_time_ms=(time.perf_counter() - start_time) * 1000
+    )
+
+
+@app.get("/api/nlp/title-typeahead", response_model=TitleTypeaheadResponse)
+def title_typeahead(q: str = Query("", description="Title typed or spoken so far"),
+                    limit: int = Query(5, ge=1, le=10, description="Number of titles")):
+    """Catalog titles completing q, allowing one typing error, most popular first"""
+    if HYBRID_SEARCH_ENGINE is None or HYBRID_SEARCH_ENGINE.title_typeahead is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Title typeahead is not available. Please ensure the dataset is loaded."
+        )
+    start_time = time.perf_counter()
+    suggestions = HYBRID_SEARCH_ENGINE.title_typeahead.suggest(q, limit=limit)
+    return TitleTypeaheadResponse(
+        query=q,
+        suggestions=suggestions,
+        processing_time_ms=(time.perf_counter() - start_time) * 1000
+    )
+
+
 # ===== Preprocess =====
 
 @app.post("/api/nlp/preprocess")
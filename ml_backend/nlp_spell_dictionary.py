@@ -0,0 +1,146 @@
+"""
+Spell Dictionary Module
+Streams the movie dataset and query logs through a bounded term counter and
+writes the frequency dictionary SpellCorrector loads at startup
+"""
+
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import List, Dict, Tuple, Iterable, Iterator, Optional
+
+import pandas as pd
+
+from nlp_online_learning import QueryLogReader
+from nlp_query_expansion import SpellCorrector
+
+
+# Dataset columns with text worth learning spellings from
+DATASET_TEXT_COLUMNS = ('movie_title', 'movie_info', 'critics_consensus', 'genres', 'keywords', 'directors', 'actors')
+# Runs of letters in any script; digits and punctuation split words
+WORD_PATTERN = re.compile(r'[^\W\d_]+')
+MIN_WORD_LENGTH = 2
+MAX_WORD_LENGTH = 30
+
+
+class TermCounter:
+    """Word counts in bounded memory
+
+    When more than max_terms distinct words are held, every word whose count
+    is at or below a threshold is dropped and the threshold rises, so rare
+    words are forgotten and frequent ones keep (almost) exact counts.
+    """
+
+    def __init__(self, max_terms: int = 500_000):
+        self.max_terms = max_terms
+        self.counts = Counter()
+        self.prune_threshold = 0
+        self.prunes = 0
+
+    def update(self, words: Iterable[str]):
+        self.counts.update(words)
+        if len(self.counts) > self.max_terms:
+            self.prune()
+
+    def prune(self):
+        """Drop rare words until at most half of max_terms remain"""
+        while len(self.counts) > self.max_terms // 2:
+            self.prune_threshold += 1
+            for word in [word for word, count in self.counts.items() if count <= self.prune_threshold]:
+                del self.counts[word]
+        self.prunes += 1
+
+    def most_common(self, n: Optional[int] = None, min_count: int = 1) -> List[Tuple[str, int]]:
+        return [(word, count) for word, count in self.counts.most_common(n) if count >= min_count]
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase NFC words of letters only"""
+    text = unicodedata.normalize('NFC', text.lower())
+    return [word for word in WORD_PATTERN.findall(text) if MIN_WORD_LENGTH <= len(word) <= MAX_WORD_LENGTH]
+
+
+def iter_dataset_texts(dataset_path: str, chunksize: int = 2000) -> Iterator[str]:
+    """Yield the text cells of the dataset CSV a chunk of rows at a time"""
+    chunks = pd.read_csv(dataset_path, usecols=lambda column: column in DATASET_TEXT_COLUMNS,
+                         chunksize=chunksize, dtype=str)
+    for chunk in chunks:
+        for column in chunk.columns:
+            for text in chunk[column].dropna():
+                yield text
+
+
+def iter_log_texts(log_paths: Iterable[str]) -> Iterator[str]:
+    """Yield the query of every record in JSON-lines query logs"""
+    for path in log_paths:
+        for batch in QueryLogReader(path).read_batches():
+            for record in batch:
+                text = record.get('query') or record.get('text')
+                if isinstance(text, str):
+                    yield text
+
+
+def count_terms(texts: Iterable[str], counter: Optional[TermCounter] = None) -> TermCounter:
+    if counter is None:
+        counter = TermCounter()
+    for text in texts:
+        counter.update(tokenize(text))
+    return counter
+
+
+def build_dictionary(output_path: str, dataset_path: Optional[str] = None, log_paths: Iterable[str] = (),
+                     max_words: int = 50_000, min_count: int = 2) -> Dict[str, int]:
+    """Count words in the dataset and logs and write the max_words most frequent"""
+    counter = TermCounter()
+    if dataset_path is not None and os.path.exists(dataset_path):
+        count_terms(iter_dataset_texts(dataset_path), counter)
+    count_terms(iter_log_texts(log_paths), counter)
+
+    frequencies = dict(counter.most_common(max_words, min_count=min_count))
+    SpellCorrector.write(output_path, frequencies)
+    return frequencies
+
+
+def load_or_build_dictionary(output_path: str, dataset_path: Optional[str] = None,
+                             log_paths: Iterable[str] = ()) -> SpellCorrector:
+    """Open the dictionary, rebuilding it first if the dataset is newer
+
+    Logs are read whenever the dictionary is built, but only a newer
+    dataset triggers a rebuild. Without either, the corrector is untrained.
+    """
+    log_paths = [path for path in log_paths if os.path.exists(path)]
+    dataset_exists = dataset_path is not None and os.path.exists(dataset_path)
+    if os.path.exists(output_path):
+        if not dataset_exists or os.path.getmtime(output_path) >= os.path.getmtime(dataset_path):
+            try:
+                return SpellCorrector.open(output_path)
+            except ValueError:
+                pass
+    if dataset_exists or log_paths:
+        build_dictionary(output_path, dataset_path if dataset_exists else None, log_paths)
+        return SpellCorrector.open(output_path)
+    return SpellCorrector()
+
+
+# Example usage
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) < 3:
+        print("Usage: python nlp_spell_dictionary.py <dataset.csv> <output.bin> [query_log.jsonl ...]")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    words = build_dictionary(sys.argv[2], sys.argv[1], sys.argv[3:])
+    print(f"✅ {len(words)} words written to {sys.argv[2]} in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    corrector = SpellCorrector.open(sys.argv[2])
+    print(f"✅ Opened in {(time.perf_counter() - start) * 1000:.2f}ms")
+    for word in ['moive', 'horor', 'christpher', 'avengrs']:
+        print(f"{word} -> {corrector.correct(word)}")
@@ -0,0 +1,461 @@
+"""
+Query Translation Module
+Offline Vietnamese-to-English phrase-table translation for movie search
+queries, with Google Translate as an optional online backend
+"""
+
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+import unicodedata
+from typing import List, Dict, Tuple, Iterable, Optional
+
+from nlp_gazetteer import AhoCorasickMatcher
+
+# httpx is only needed for TRANSLATION_BACKEND=google
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    httpx = None
+
+
+_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# 'phrase' (offline, default) or 'google' (Google Translate, needs network access)
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "phrase")
+# Endpoint of the online backend (the one googletrans calls) and its per-call deadline in seconds
+TRANSLATION_API_URL = os.getenv("TRANSLATION_API_URL", "https://translate.googleapis.com/translate_a/single")
+TRANSLATION_TIMEOUT = float(os.getenv("TRANSLATION_TIMEOUT", "1.5"))
+# Online translations, shared by every component and worker process (see TranslationCache)
+TRANSLATION_CACHE_PATH = os.getenv("TRANSLATION_CACHE_PATH", os.path.join(_DATA_DIR, "translation_cache.sqlite"))
+
+# Movie-domain Vietnamese -> English. An empty translation drops the phrase.
+DOMAIN_LEXICON = {
+    # Requests and fillers
+    'tìm': 'find', 'tìm kiếm': 'search', 'tim kiem': 'search',
+    'xem': 'watch', 'coi': 'watch', 'gợi ý': 'recommend', 'goi y': 'recommend',
+    'cho tôi': '', 'cho toi': '', 'tôi muốn': '', 'toi muon': '', 'giúp tôi': '', 'giup toi': '',
+    'làm ơn': '', 'lam on': '', 'bạn có thể': '', 'hãy': '', 'những': '', 'các': '', 'nào': '',
+    'năm': '', 'nam': '',
+
+    # Movies and the people in them
+    'phim': 'movie', 'bộ phim': 'movie', 'bo phim': 'movie', 'phim lẻ': 'movie', 'phim le': 'movie',
+    'phim bộ': 'series', 'phim bo': 'series', 'phim truyền hình': 'tv series',
+    'phần tiếp theo': 'sequel', 'phần': 'part', 'tập': 'episode', 'mùa': 'season',
+    'đạo diễn': 'director', 'dao dien': 'director', 'đạo diễn bởi': 'directed by',
+    'diễn viên': 'actor', 'dien vien': 'actor', 'nữ diễn viên': 'actress', 'diễn viên chính': 'lead actor',
+    'đóng vai chính': 'starring', 'thủ vai': 'starring', 'đóng': 'starring', 'ca sĩ': 'singer',
+    'nhân vật': 'character', 'câu chuyện': 'story', 'cốt truyện': 'plot', 'nội dung': 'plot',
+    'kết thúc': 'ending', 'thập niên': 'decade', 'thế kỷ': 'century',
+
+    # Plot words
+    'người nhện': 'spider-man', 'người sắt': 'iron man', 'người dơi': 'batman',
+    'ma cà rồng': 'vampire', 'xác sống': 'zombie', 'thây ma': 'zombie', 'quái vật': 'monster',
+    'người ngoài hành tinh': 'alien', 'ngoài hành tinh': 'alien', 'khủng long': 'dinosaur',
+    'rô bốt': 'robot', 'người máy': 'robot', 'trí tuệ nhân tạo': 'artificial intelligence',
+    'du hành thời gian': 'time travel', 'du hanh thoi gian': 'time travel', 'du hành vũ trụ': 'space travel',
+    'vũ trụ': 'space', 'không gian': 'space', 'trái đất': 'earth', 'hành tinh': 'planet',
+    'thế giới': 'world', 'tương lai': 'future', 'quá khứ': 'past', 'giấc mơ': 'dream',
+    'chiến binh': 'warrior', 'sát thủ': 'assassin', 'cảnh sát': 'police', 'thám tử': 'detective',
+    'điệp viên': 'spy', 'gián điệp': 'spy', 'vụ cướp': 'heist', 'cướp': 'robbery', 'tên trộm': 'thief',
+    'trộm': 'thief', 'kẻ giết người': 'killer', 'kẻ sát nhân': 'killer', 'giết người': 'murder',
+    'băng đảng': 'gang', 'nhà tù': 'prison', 'vượt ngục': 'prison escape', 'trả thù': 'revenge',
+    'báo thù': 'revenge', 'sống sót': 'survival', 'thảm họa': 'disaster', 'ngày tận thế': 'apocalypse',
+    'tận thế': 'apocalypse', 'thế chiến': 'world war', 'thế chiến thứ hai': 'world war ii',
+    'tình yêu': 'love', 'tình bạn': 'friendship', 'cậu bé': 'boy', 'cô bé': 'girl', 'cô gái': 'girl',
+    'chàng trai': 'young man', 'người đàn ông': 'man', 'đàn ông': 'man', 'người phụ nữ': 'woman',
+    'phụ nữ': 'woman', 'trẻ em': 'kids', 'thiếu nhi': 'kids', 'học sinh': 'student', 'sinh viên': 'student',
+    'trường học': 'school', 'bác sĩ': 'doctor', 'nhà khoa học': 'scientist', 'vua': 'king',
+    'nữ hoàng': 'queen', 'công chúa': 'princess', 'hoàng tử': 'prince', 'phù thủy': 'wizard',
+    'pháp sư': 'wizard', 'phép thuật': 'magic', 'ma thuật': 'magic', 'rồng': 'dragon',
+    'con chó': 'dog', 'chó': 'dog', 'con mèo': 'cat', 'mèo': 'cat', 'cá mập': 'shark', 'nhện': 'spider',
+    'biển': 'sea', 'đại dương': 'ocean', 'hòn đảo': 'island', 'đảo': 'island', 'rừng': 'forest',
+    'thành phố': 'city', 'thị trấn': 'town', 'ngôi nhà': 'house', 'con tàu': 'ship', 'máy bay': 'plane',
+    'xe hơi': 'car', 'ô tô': 'car', 'đua xe': 'racing', 'bóng đá': 'football', 'võ thuật': 'martial arts',
+    'áo giáp': 'armor', 'bộ giáp': 'armor', 'bộ đồ': 'suit', 'màu đỏ': 'red', 'đỏ': 'red',
+    'đen': 'black', 'trắng': 'white', 'bị': '', 'cắn': 'bites', 'bị cắn': 'bitten', 'trở thành': 'becomes', 'cái chết': 'death',
+
+    # Function words
+    'của': 'by', 'bởi': 'by', 'về': 'about', 'với': 'with', 'có': 'with',
+    'và': 'and', 'hoặc': 'or', 'trong': 'in', 'từ': 'from', 'đến': 'to', 'tới': 'to', 'cho': 'for',
+    'giống': 'like', 'giống như': 'like', 'như': 'like', 'tương tự': 'similar to', 'một': 'a',
+    'trước': 'before', 'sau': 'after', 'không': 'not',
+}
+
+# Adjective-like phrases; Vietnamese puts them after the noun they describe
+MODIFIER_LEXICON = {
+    'hay': 'good', 'hay nhất': 'best', 'hay nhat': 'best', 'tốt nhất': 'best', 'tot nhat': 'best',
+    'tuyệt vời': 'great', 'xuất sắc': 'excellent', 'đáng xem': 'must-see',
+    'nổi tiếng': 'famous', 'noi tieng': 'famous', 'phổ biến': 'popular', 'pho bien': 'popular',
+    'được yêu thích': 'popular', 'thịnh hành': 'trending', 'đánh giá cao': 'top rated',
+    'mới': 'new', 'moi': 'new', 'mới nhất': 'latest', 'moi nhat': 'latest', 'gần đây': 'recent',
+    'cũ': 'old', 'kinh điển': 'classic', 'kinh dien': 'classic', 'cổ điển': 'classic',
+    'tệ': 'bad', 'dở': 'bad', 'tệ nhất': 'worst', 'buồn': 'sad', 'cảm động': 'touching',
+    'đáng sợ': 'scary', 'ghê rợn': 'creepy', 'vui nhộn': 'funny', 'hấp dẫn': 'exciting',
+    'ly kỳ': 'thrilling', 'đang chiếu': 'now playing', 'sắp chiếu': 'upcoming', 'chiếu rạp': 'theatrical',
+    'siêu anh hùng': 'superhero', 'sieu anh hung': 'superhero', 'ma': 'ghost',
+    'hàn quốc': 'korean', 'han quoc': 'korean', 'hàn': 'korean', 'nhật bản': 'japanese',
+    'nhat ban': 'japanese', 'nhật': 'japanese', 'trung quốc': 'chinese', 'trung quoc': 'chinese',
+    'hồng kông': 'hong kong', 'đài loan': 'taiwanese', 'thái lan': 'thai', 'thái': 'thai',
+    'ấn độ': 'indian', 'mỹ': 'american', 'âu mỹ': 'western', 'nước anh': 'british', 'pháp': 'french',
+    'đức': 'german', 'nga': 'russian', 'tây ban nha': 'spanish', 'việt nam': 'vietnamese',
+    'viet nam': 'vietnamese', 'việt': 'vietnamese',
+}
+
+# Translations that head a noun phrase: 'phim hành động mới' -> 'new action movie'
+HEAD_NOUNS = {'movie', 'series', 'tv series'}
+
+
+def _normalize(text: str) -> str:
+    return unicodedata.normalize('NFC', text.lower())
+
+
+class PhraseTranslator:
+    """Offline Vietnamese -> English translation by longest phrase match
+
+    The phrase table is one Aho-Corasick automaton. Decoding takes the
+    longest phrase starting leftmost, then the longest after it, and so on;
+    words not in the table (names, titles, English) are copied. A head noun
+    such as 'phim' moves after the modifiers that follow it, reversing
+    their order as English does.
+    """
+
+    def __init__(self, phrases: Dict[str, str], modifiers: Iterable[str] = ()):
+        self.phrases = phrases
+        self.modifiers = {_normalize(phrase) for phrase in modifiers}
+        self._matcher = AhoCorasickMatcher()
+        for phrase, translation in phrases.items():
+            self._matcher.add(phrase, translation)
+        self._matcher.build()
+
+    @classmethod
+    def from_mappings(cls, *mappings: Dict[str, str], modifiers: Iterable[str] = ()) -> 'PhraseTranslator':
+        """Merge phrase -> translation maps; earlier maps win
+
+        A translation that is itself a phrase of the table (a voice-error
+        fix such as 'fim' -> 'phim') is translated through it.
+        """
+        phrases: Dict[str, str] = {}
+        for mapping in mappings:
+            for phrase, translation in mapping.items():
+                phrases.setdefault(_normalize(phrase), translation)
+        for phrase, translation in phrases.items():
+            phrases[phrase] = phrases.get(_normalize(translation), translation)
+        return cls(phrases, modifiers)
+
+    def segment(self, text: str) -> List[Tuple[str, Optional[str]]]:
+        """Split text into (source, translation) segments; untranslated words have translation None"""
+        text = _normalize(text)
+        # Longest phrase at each start (matches come by start, shortest first)
+        longest = {}
+        for start, end, phrase, payloads in self._matcher.find_all(text):
+            longest[start] = (end, phrase, payloads[0])
+
+        segments = []
+        position = 0
+        for start, (end, phrase, translation) in longest.items():
+            if start < position:
+                continue
+            segments.extend((word, None) for word in text[position:start].split())
+            segments.append((phrase, translation))
+            position = end
+        segments.extend((word, None) for word in text[position:].split())
+        return segments
+
+    def translate(self, text: str) -> str:
+        segments = self.segment(text)
+        words = []
+        i = 0
+        while i < len(segments):
+            source, translation = segments[i]
+            if translation not in HEAD_NOUNS:
+                words.append(source if translation is None else translation)
+                i += 1
+                continue
+
+            # Modifiers after the head (dropped phrases included) go before it, last first
+            end = i + 1
+            while end < len(segments) and (segments[end][0] in self.modifiers or segments[end][1] == ''):
+                end += 1
+            words.extend(modifier for _, modifier in reversed(segments[i + 1:end]))
+            words.append(translation)
+            i = end
+        return ' '.join(' '.join(words).split())
+
+    def __len__(self) -> int:
+        return len(self.phrases)
+
+
+class TranslationError(Exception):
+    """The online backend could not translate in time; callers fall back to offline translation"""
+
+
+class CircuitBreaker:
+    """Stops calling a failing service for a while
+
+    Closed: calls go through. After failure_threshold consecutive failures
+    it opens and calls are refused for reset_seconds. Then it is half-open:
+    one trial call is let through, and its outcome closes or reopens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at < self.reset_seconds:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class AsyncTranslationClient:
+    """Google Translate client with a deadline per call and a circuit breaker
+
+    One background event loop owns a pooled httpx.AsyncClient, so every
+    call, from any thread, reuses the same keep-alive connections. One
+    request returns both the detected language and the translation;
+    English text comes back unchanged. A call that errors or misses its
+    deadline raises TranslationError, and so does every call while the
+    breaker is open, without touching the network.
+    """
+
+    def __init__(self, url: str = TRANSLATION_API_URL, timeout: float = TRANSLATION_TIMEOUT,
+                 breaker: Optional[CircuitBreaker] = None, max_connections: int = 10):
+        if not HTTPX_AVAILABLE:
+            raise ImportError("httpx is not installed")
+        self.url = url
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.max_connections = max_connections
+        self.requests = 0
+        self.failures = 0
+        self._client = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="translation-client", daemon=True).start()
+            return self._loop
+
+    async def _request(self, text: str) -> Tuple[str, str]:
+        """(translation, detected language) from one request"""
+        if self._client is None:
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+        self.requests += 1
+        response = await self._client.get(self.url, params={'client': 'gtx', 'sl': 'auto', 'tl': 'en', 'dt': 't', 'q': text})
+        response.raise_for_status()
+        data = response.json()
+        translation = ''.join(segment[0] for segment in data[0] if segment and segment[0])
+        return translation, data[2]
+
+    async def _translate(self, text: str) -> str:
+        if not self.breaker.allow():
+            raise TranslationError("circuit open")
+        try:
+            translation, language = await asyncio.wait_for(self._request(text), self.timeout)
+        except Exception as e:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise TranslationError(f"{type(e).__name__}: {e}") from e
+        self.breaker.record_success()
+        return text if language == 'en' else translation
+
+    def translate(self, text: str) -> str:
+        """Translate from a synchronous caller, waiting at most the deadline"""
+        future = asyncio.run_coroutine_threadsafe(self._translate(text), self._event_loop())
+        return future.result()
+
+    async def translate_async(self, text: str) -> str:
+        """Translate from a coroutine on any event loop"""
+        future = asyncio.run_coroutine_threadsafe(self._translate(text), self._event_loop())
+        return await asyncio.wrap_future(future)
+
+    def translate_many(self, texts: List[str]) -> List[Optional[str]]:
+        """Translate concurrently; texts that fail come back as None"""
+        async def translate_all():
+            results = await asyncio.gather(*(self._translate(text) for text in texts), return_exceptions=True)
+            return [None if isinstance(result, Exception) else result for result in results]
+        return asyncio.run_coroutine_threadsafe(translate_all(), self._event_loop()).result()
+
+    def close(self):
+        """Close the pooled connections and stop the event loop"""
+        with self._loop_lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), loop).result()
+            self._client = None
+        loop.call_soon_threadsafe(loop.stop)
+
+
+def cache_key(text: str) -> str:
+    """Lowercase NFC text with single spaces, so re-spaced or re-cased queries share an entry"""
+    return ' '.join(_normalize(text).split())
+
+
+class TranslationCache:
+    """Translations on disk in SQLite, keyed by backend and normalized source text
+
+    The database runs in WAL mode, so every worker process can read it
+    while another writes. Entries expire after ttl_seconds. Every
+    prune_every writes, expired entries are deleted and the oldest are
+    dropped until at most max_entries remain. Lookups never write, so a
+    hit costs one indexed read.
+    """
+
+    def __init__(self, path: str = TRANSLATION_CACHE_PATH, ttl_seconds: float = 30 * 24 * 3600,
+                 max_entries: int = 100_000, prune_every: int = 1000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.prune_every = prune_every
+        self._writes = 0
+        self._local = threading.local()  # sqlite3 connections are per thread
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "backend TEXT NOT NULL, source TEXT NOT NULL, translation TEXT NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (backend, source))"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS translations_created_at ON translations (created_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # Autocommit; wait for another process's write instead of failing
+            connection = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, backend: str, text: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT translation FROM translations WHERE backend = ? AND source = ? AND created_at >= ?",
+            (backend, cache_key(text), time.time() - self.ttl_seconds)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, backend: str, text: str, translation: str):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO translations (backend, source, translation, created_at) VALUES (?, ?, ?, ?)",
+            (backend, cache_key(text), translation, time.time())
+        )
+        self._writes += 1
+        if self._writes % self.prune_every == 0:
+            self.prune()
+
+    def prune(self):
+        """Delete expired entries, then the oldest beyond max_entries"""
+        connection = self._connection()
+        connection.execute("DELETE FROM translations WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        connection.execute(
+            "DELETE FROM translations WHERE rowid IN ("
+            "SELECT rowid FROM translations ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+
+class CachedTranslator:
+    """Translator that answers repeated texts from a TranslationCache
+
+    When the backend raises TranslationError the fallback translates
+    instead, and that translation is not cached. A cache that cannot be
+    read or written (disk full, locked too long) only costs the lookup.
+    """
+
+    def __init__(self, translator, cache: TranslationCache, backend: str, fallback=None):
+        self.translator = translator
+        self.cache = cache
+        self.backend = backend
+        self.fallback = fallback
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def translate(self, text: str) -> str:
+        try:
+            cached = self.cache.get(self.backend, text)
+        except sqlite3.Error as e:
+            print(f"⚠️ Translation cache read failed: {e}")
+            cached = None
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        try:
+            translation = self.translator.translate(text)
+        except TranslationError:
+            if self.fallback is None:
+                raise
+            self.fallbacks += 1
+            return self.fallback.translate(text)
+        try:
+            self.cache.put(self.backend, text, translation)
+        except sqlite3.Error as e:
+            print(f"⚠️ Translation cache write failed: {e}")
+        return translation
+
+    def close(self):
+        if hasattr(self.translator, 'close'):
+            self.translator.close()
+
+
+# Example usage
+if __name__ == "__main__":
+    translator = PhraseTranslator.from_mappings(DOMAIN_LEXICON, MODIFIER_LEXICON, modifiers=MODIFIER_LEXICON)
+    print(f"{len(translator)} phrases")
+    for query in ["tìm phim hành động mới nhất", "phim kinh dị hàn quốc hay nhất",
+                  "phim của đạo diễn christopher nolan", "best comedy films"]:
+        print(f"{query!r} -> {translator.translate(query)!r}")
@@ -3,15 +3,31 @@ Test script to demonstrate all NLP algorithms
 Run this to see how each algorithm works
 """
 
+import os
 import sys
+import tempfile
+import numpy as np
+import pandas as pd
 from nlp_preprocessing import NLPPreprocessor, TFIDFVectorizer
 from nlp_intent_classifier import IntentClassifier
-from nlp_ner import QueryAnalyzer, SemanticMatcher
+from nlp_online_learning import OnlineIntentTrainer
+from nlp_ner import QueryAnalyzer, SemanticMatcher, EntityRecognizer, SearchFeatures
+from nlp_rules import RuleEngine
+from nlp_gazetteer import AhoCorasickMatcher, CatalogGazetteer, FrontCodedTable
+from nlp_phonetic import PhoneticIndex, phonetic_key
+from nlp_catalog_index import CatalogIndex, popcount
+from nlp_components import default_registry
 from nlp_semantic_similarity import (
     LevenshteinDistance, JaccardSimilarity, CosineSimilarity,
     NGramSimilarity, SemanticSimilarityCalculator, FuzzyMatcher
 )
-from nlp_query_expansion import NLPQueryProcessor
+from nlp_query_expansion import (
+    NLPQueryProcessor, SpellCorrector, QueryTranslator, QueryExpander, QuerySuggester, default_phrase_translator
+)
+from nlp_translation import TranslationCache, CachedTranslator, AsyncTranslationClient, CircuitBreaker
+from nlp_language import LanguageDetector, telex_syllable
+from nlp_autocomplete import CompletionTrie, TitleTypeahead
+from nlp_query_log import QueryLog
 
 
 def print_section(title):
@@ -21,6 +37,17 @@ def print_section(title):
     print("="*70)
 
 
+def synthetic_cast():
+    """About 1650 common first name + surname pairs, the size of a real catalog's cast"""
+    first_names = ("tom tim amy william james john mary anna david michael sarah emma chris peter paul "
+                   "mark kate lisa steve robert jack daniel laura helen george alice frank henry grace nick").split()
+    surnames = ("walker night mitchell fox hanks smith jones brown miller davis wilson moore taylor anderson "
+                "thomas jackson white harris martin thompson garcia clark lewis young king wright hill green "
+                "adams baker nelson carter roberts turner phillips campbell parker evans edwards collins stewart "
+                "morris murphy cook rogers reed bell ward cox wood gray watson brooks kelly price").split()
+    return [f"{first} {surname}" for first in first_names for surname in surnames]
+
+
 def test_preprocessing():
     """Test preprocessing algorithms"""
     print_section("1. TEXT PREPROCESSING")
@@ -45,6 +72,11 @@ def test_preprocessing():
         processed = preprocessor.preprocess(text)
         print(f"   Processed: {processed}")
         
+        # One stemming pass gives both token lists
+        stemmed = preprocessor.stem_tokens(text)
+        assert [stem for stem, _ in stemmed] == preprocessor.preprocess(text, remove_stopwords=False)
+        assert [stem for stem, is_stopword in stemmed if not is_stopword] == processed
+        
         # N-grams
         bigrams = preprocessor.extract_ngrams(processed, n=2)
         print(f"   Bigrams: {bigrams[:3]}...")
@@ -120,6 +152,144 @@ def test_intent_classification():
         print(f"   Tokens: {result['tokens']}")
 
 
+def test_naive_bayes_batch():
+    """Test batch Naive Bayes scoring against single-document prediction"""
+    print_section("3b. NAIVE BAYES BATCH PREDICTION")
+    
+    classifier = IntentClassifier()
+    classifier.train_from_examples()
+    naive_bayes = classifier.naive_bayes
+    
+    documents = [
+        classifier.preprocessor.preprocess(query)
+        for query in ["Find action movies", "Popular movies 2024", "Best comedy films", ""]
+    ]
+    
+    batch_results = naive_bayes.predict_batch(documents)
+    
+    for document, (batch_intent, batch_confidence) in zip(documents, batch_results):
+        intent, confidence = naive_bayes.predict(document)
+        print(f"\n🎯 Tokens: {document}")
+        print(f"   Single: {intent} ({confidence:.4f})  Batch: {batch_intent} ({batch_confidence:.4f})")
+        assert batch_intent == intent
+        assert abs(batch_confidence - confidence) < 1e-5
+
+
+def test_svm_batch():
+    """Test vectorized SVM training and sparse batch inference"""
+    print_section("3c. SVM MINI-BATCH TRAINING")
+    
+    classifier = IntentClassifier()
+    classifier.train_from_examples()
+    svm = classifier.svm
+    
+    print(f"\n📐 Weights: {svm.weights.shape[0]} classes x {svm.weights.shape[1]} features")
+    
+    documents = [
+        classifier.preprocessor.preprocess(query)
+        for query in ["Popular movies 2024", "Movies similar to Avengers", "Tom Cruise movies"]
+    ]
+    
+    for document, (batch_intent, _) in zip(documents, svm.predict_batch(documents)):
+        intent, confidence = svm.predict(document)
+        print(f"   {document}: {intent} ({confidence:.2f})")
+        assert batch_intent == intent
+
+
+def test_intent_model_artifact():
+    """Test saving and loading the binary intent model artifact"""
+    print_section("3d. INTENT MODEL ARTIFACT")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_path = os.path.join(tmp_dir, "intent_model.npz")
+        
+        trained = IntentClassifier()
+        assert not trained.load_or_train(model_path)
+        print(f"\n💾 Saved artifact: {os.path.getsize(model_path)} bytes")
+        
+        loaded = IntentClassifier()
+        assert loaded.load_or_train(model_path)
+        
+        query = "Best comedy films"
+        assert loaded.classify_intent(query)['intent'] == trained.classify_intent(query)['intent']
+        print(f"   Loaded model agrees on '{query}'")
+        
+        # A truncated artifact is retrained and replaced instead of failing startup
+        with open(model_path, 'rb') as f:
+            data = f.read()
+        with open(model_path, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        assert not IntentClassifier().load_or_train(model_path)
+        assert IntentClassifier().load_or_train(model_path)
+        print("   Truncated artifact retrained")
+
+
+def test_intent_classify_batch():
+    """Test batch intent classification keeps input order"""
+    print_section("3e. BATCH INTENT CLASSIFICATION")
+    
+    classifier = IntentClassifier()
+    queries = ["Best comedy films", "Popular movies 2024", "Tom Cruise movies", "Best comedy films"]
+    
+    results = classifier.classify_batch(queries)
+    
+    assert len(results) == len(queries)
+    for query, result in zip(queries, results):
+        print(f"\n🎯 {query}: {result['intent']} ({result['confidence']:.2f})")
+        assert result['intent'] == classifier.classify_intent(query)['intent']
+
+
+def test_intent_cascade():
+    """Test cascade classification exits early on unambiguous rule matches"""
+    print_section("3f. CASCADE INTENT CLASSIFICATION")
+    
+    classifier = IntentClassifier(cascade=True)
+    
+    unambiguous = classifier.classify_intent("Find action movies")
+    print(f"\n⚡ 'Find action movies': {unambiguous['intent']} (stage: {unambiguous['stage']})")
+    assert unambiguous['stage'] == 'rules'
+    assert unambiguous['naive_bayes'] is None
+    
+    ambiguous = classifier.classify_intent("Tom Cruise movies")
+    print(f"   'Tom Cruise movies': {ambiguous['intent']} (stage: {ambiguous['stage']})")
+    assert ambiguous['stage'] == 'models'
+    
+    metrics = classifier.cascade_metrics()
+    print(f"   Exit rates: {metrics['exit_rates']}")
+    assert metrics['exits'] == {'rules': 1, 'models': 1}
+
+
+def test_online_intent_learning():
+    """Test incremental intent learning from a query log"""
+    print_section("3g. ONLINE INTENT LEARNING")
+    
+    import json
+    
+    classifier = IntentClassifier()
+    classifier.train_from_examples()
+    trainer = OnlineIntentTrainer(classifier, batch_size=50)
+    models_before = classifier._models
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = os.path.join(tmp_dir, "query_log.jsonl")
+        with open(log_path, "w", encoding="utf-8") as f:
+            for _ in range(100):
+                f.write(json.dumps({"query": "avatar pandora", "intent": "search_by_title"}) + "\n")
+            f.write(json.dumps({"query": "top rated films"}) + "\n")
+        
+        stats = trainer.consume(log_path)
+        print(f"\n📥 First pass: {stats}")
+        assert stats['labelled'] == 100 and stats['weakly_labelled'] == 1
+        
+        # Already-consumed lines are not learned twice
+        assert trainer.consume(log_path)['batches'] == 0
+    
+    result = classifier.classify_intent("avatar pandora")
+    print(f"   'avatar pandora' -> {result['intent']}")
+    assert result['intent'] == 'search_by_title'
+    assert classifier._models is not models_before
+
+
 def test_ner():
     """Test Named Entity Recognition"""
     print_section("4. NAMED ENTITY RECOGNITION (NER)")
@@ -147,6 +317,167 @@ def test_ner():
         for param, value in result['search_parameters'].items():
             if value:
                 print(f"      {param}: {value}")
+    
+    # Whole four-digit years, not the century group
+    assert analyzer.analyze_query("Find action movies from 2024")['features']['entities']['years'] == ['2024']
+    assert analyzer.analyze_query("phim từ 1999 đến 2003")['features']['entities']['years'] == ['1999', '2003']
+
+
+def test_rule_engine():
+    """Test the compiled rule engine decides everything in one pass"""
+    print_section("4b. COMPILED RULE ENGINE")
+    
+    engine = RuleEngine()
+    
+    decision = engine.decide(['best', 'action', '2024'], ['has_genre', 'has_year', 'has_rating_expression'])
+    print(f"\n⚙️ {decision}")
+    assert decision.intents == ('search_by_year', 'search_by_genre', 'search_high_rating')
+    assert decision.query_type == 'genre_year_search'
+    assert decision.sort_by == 'rating'
+    assert decision.complexity == 'moderate'
+    
+    decision = engine.decide(['new'], ['has_time_expression'])
+    print(f"   {decision}")
+    assert decision.intent == 'search_by_title'
+    assert decision.sort_by == 'release_date_desc'
+
+
+def test_gazetteer():
+    """Test single-pass whole-word dictionary matching"""
+    print_section("4c. AHO-CORASICK GAZETTEER")
+    
+    matcher = AhoCorasickMatcher()
+    matcher.add('ma', ('genres', 'horror'))
+    matcher.add('vien tuong', ('genres', 'fantasy'))
+    matcher.add('khoa hoc vien tuong', ('genres', 'scifi'))
+    
+    matches = matcher.find_all("phim ma khoa hoc vien tuong")
+    print(f"\n🔤 {[(phrase, payloads) for _, _, phrase, payloads in matches]}")
+    assert [phrase for _, _, phrase, _ in matches] == ['ma', 'khoa hoc vien tuong', 'vien tuong']
+    
+    # Short keys never match inside longer words
+    assert matcher.find_all("spider man") == []
+    
+    recognizer = QueryAnalyzer().entity_recognizer
+    entities = recognizer.extract_entities("phim của đạo diễn crystal non")
+    print(f"   'phim của đạo diễn crystal non' -> people: {entities['people']}")
+    assert entities['people'] == ['christopher nolan']
+
+
+def test_catalog_gazetteer():
+    """Test the memory-mapped catalog people/title table"""
+    print_section("4d. CATALOG GAZETTEER (FRONT-CODED TABLE)")
+    
+    entries = CatalogGazetteer.collect_entries(
+        titles=['The Dark Knight', 'The Dark Knight Rises', 'Up', 'Inception'],
+        directors=['Christopher Nolan', 'Christopher Nolan', 'Pete Docter', 'Christopher Nolan'],
+        actors=['Christian Bale, Heath Ledger', 'Christian Bale, Tom Hardy', 'Ed Asner', 'Leonardo DiCaprio']
+    )
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'catalog.bin')
+        FrontCodedTable.write(path, entries, block_size=4)
+        table = FrontCodedTable.open(path)
+        
+        print(f"\n📚 {len(table)} names, {os.path.getsize(path)} bytes")
+        assert dict(iter(table)) == entries
+        assert table.get('christopher nolan') == CatalogGazetteer.DIRECTOR
+        assert table.get('christian bale') == CatalogGazetteer.ACTOR
+        assert table.probe('the dark') == (0, True)
+        assert 'the dark knight' in table and 'the dark' not in table
+        
+        recognizer = EntityRecognizer(catalog_path=path)
+        for query, people, titles in [
+            ("phim the dark knight rises cua christopher nolan", ['christopher nolan'], ['the dark knight rises']),
+            ("heath ledger joker", ['heath ledger'], []),
+            ("up", [], ['up']),
+            ("what's up", [], []),
+        ]:
+            entities = recognizer.extract_entities(query)
+            print(f"   '{query}' -> people: {entities['people']}, titles: {entities['titles']}")
+            assert entities['people'] == people
+            assert entities['titles'] == titles
+        
+        del recognizer, table
+
+
+def test_phonetic_index():
+    """Test sounds-like lookup of misheard names"""
+    print_section("4e. PHONETIC NAME INDEX")
+    
+    for heard, name in [("crystal non", "christopher nolan"), ("no lan", "nolan"), ("quốc", "cuoc")]:
+        print(f"\n🔊 {heard!r} -> {phonetic_key(heard)!r}, {name!r} -> {phonetic_key(name)!r}")
+    assert phonetic_key("no lan") == phonetic_key("nolan")
+    assert phonetic_key("quốc") == phonetic_key("cuoc")
+    
+    names = [
+        ('christopher nolan', CatalogGazetteer.DIRECTOR),
+        ('steven spielberg', CatalogGazetteer.DIRECTOR),
+        ('heath ledger', CatalogGazetteer.ACTOR),
+        ('the dark knight', CatalogGazetteer.TITLE),
+    ]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'phonetic.bin')
+        PhoneticIndex.write(path, names)
+        for index in (PhoneticIndex.from_names(names), PhoneticIndex.open(path)):
+            assert index.match("crystal non")[0] == 'christopher nolan'
+            assert index.match("heath leger")[0] == 'heath ledger'
+            assert index.match("the dark night", CatalogGazetteer.TITLE)[0] == 'the dark knight'
+            assert index.match("the dark night", CatalogGazetteer.PERSON) is None
+            assert index.match_surname("spilberg")[0] == 'steven spielberg'
+            assert index.match("phim hay") is None
+            # A correctly spelled name that is not indexed must not borrow a shared first name
+            assert index.match("christopher reeve") is None
+        del index
+    
+    recognizer = EntityRecognizer()
+    for query, people in [
+        ("phim của đạo diễn non", ['christopher nolan']),
+        ("dien vien tom holand", ['tom holland']),
+        ("phim hanh dong hay nhat", []),
+        ("movies with tom hanks", []),  # not in the dictionaries; not 'tom cruise'
+        ("phim co tom hanks", []),
+    ]:
+        entities = recognizer.extract_entities(query)
+        print(f"   '{query}' -> people: {entities['people']}")
+        assert entities['people'] == people
+    
+    # Against a catalog-sized cast list ordinary queries must not turn into people
+    cast = [(name, CatalogGazetteer.ACTOR) for name in synthetic_cast()]
+    recognizer.phonetic_indexes.append(PhoneticIndex.from_names(cast))
+    print(f"\n👥 {len(cast)} cast names")
+    for query, people in [
+        ("new movies this week", []),
+        ("dark movies at night", []),
+        ("good movies to watch tonight", []),
+        ("tim phim hay", []),
+        ("movies like the dark knight", []),
+        ("movies with tom hanks", ['tom hanks']),
+        ("dien vien tim walkr", ['tim walker']),
+        ("starring emma wotson", ['emma watson']),
+    ]:
+        entities = recognizer.extract_entities(query)
+        print(f"   '{query}' -> people: {entities['people']}")
+        assert entities['people'] == people
+
+
+def test_lazy_search_features():
+    """Test that search features are computed only when read"""
+    print_section("4f. LAZY SEARCH FEATURES")
+    
+    analyzer = QueryAnalyzer()
+    features = analyzer.feature_extractor.extract_search_features("phim hành động hay nhất 2023")
+    
+    assert features['has_genre'] and features['has_year']
+    computed = list(dict.keys(features))
+    print(f"\n⚡ Computed after reading has_genre/has_year: {computed}")
+    assert 'bigrams' not in computed and 'word_frequency' not in computed
+    
+    everything = features.to_dict()
+    print(f"   All features: {sorted(everything)}")
+    assert set(everything) == set(SearchFeatures.FEATURE_NAMES)
+    assert dict(features) == everything
+    assert features['token_count'] == len(features['tokens'])
 
 
 def test_similarity():
@@ -186,6 +517,122 @@ def test_similarity():
         print(f"   Cosine Similarity: {cos_sim:.4f}")
 
 
+def test_semantic_batch_scoring():
+    """Test prepared-query scoring over an indexed movie collection"""
+    print_section("5b. BATCH SEMANTIC MATCHING")
+    
+    matcher = SemanticMatcher()
+    movies = {
+        'tdk': {'title': 'The Dark Knight', 'overview': 'Batman fights the Joker in Gotham city',
+                'genres': ['Action', 'Crime'], 'year': 2008},
+        'conj': {'title': 'The Conjuring', 'overview': 'A haunted house and a family in danger',
+                 'genres': ['Horror'], 'year': 2013},
+        'note': {'title': 'The Notebook', 'overview': 'A love story', 'genres': ['Romance']},
+    }
+    matcher.index_movies(movies)
+    
+    for query in ["dark knight action 2008", "phim kinh di haunted house", "love story"]:
+        prepared = matcher.prepare(query)
+        scores = matcher.score_many(prepared)
+        print(f"\n🎬 '{query}' -> {dict(zip(movies, scores.tolist()))}")
+        assert scores.tolist() == [matcher.match_score(query, movie) for movie in movies.values()]
+    
+    subset = matcher.score_many(matcher.prepare("dark knight action 2008"), ['note', 'tdk'])
+    assert subset[1] > subset[0] == 0.0
+    
+    # The year in the query earns the year bonus
+    assert matcher.prepare("dark knight action 2008").years == {'2008'}
+    with_year = matcher.score_many(matcher.prepare("batman 2008"))
+    without_year = matcher.score_many(matcher.prepare("batman"))
+    assert with_year[0] - without_year[0] == matcher.YEAR_WEIGHT and with_year[1] == without_year[1]
+
+
+def test_catalog_filters():
+    """Test structured filters, sorts and facets over the catalog"""
+    print_section("5c. CATALOG FILTERS, SORTS & FACETS")
+    
+    catalog = pd.DataFrame({
+        'movie_title': ['Inception', 'The Dark Knight', 'Toy Story', 'Heat', 'Tenet'],
+        'genres': ['Action & Adventure, Science Fiction & Fantasy', 'Action & Adventure, Drama',
+                   'Animation, Comedy, Kids & Family', 'Action & Adventure, Mystery & Suspense',
+                   'Action & Adventure, Science Fiction & Fantasy'],
+        'directors': ['Christopher Nolan', 'Christopher Nolan', 'John Lasseter', 'Michael Mann', 'Christopher Nolan'],
+        'actors': ['Leonardo DiCaprio', 'Christian Bale, Heath Ledger', 'Tom Hanks', 'Al Pacino', 'John David Washington'],
+        'original_release_date': ['2010-07-16', '2008-07-18', '1995-11-22', '1995-12-15', None],
+        'tomatometer_rating': [87, 94, 100, 87, 69],
+    })
+    index = CatalogIndex.from_dataframe(catalog)
+    
+    def titles(rows):
+        return list(catalog['movie_title'][rows])
+    
+    analyzer = QueryAnalyzer()
+    params = analyzer.analyze_query("phim hành động hay nhất từ 2000 đến 2020")['search_parameters']
+    bitmap = index.filter(params)
+    ranked = index.sorted_rows(bitmap, params['sort_by'])
+    print(f"\n🎬 genres={params['genres']} years={params['year_range']} sort_by={params['sort_by']}")
+    print(f"   -> {titles(ranked)}")
+    assert titles(ranked) == ['The Dark Knight', 'Inception']
+    
+    nolan = index.filter({'people': ['christopher nolan'], 'genres': ['sci-fi']})
+    assert titles(index.rows(nolan)) == ['Inception', 'Tenet']
+    assert titles(index.sorted_rows(nolan, 'release_date_asc')) == ['Inception', 'Tenet']
+    assert popcount(index.filter({'people': ['christopher nolan', 'tom hanks']})) == 0
+    # A person the catalog does not know is ignored instead of emptying the results
+    assert titles(index.rows(index.filter({'people': ['christopher nolan', 'tom cruise']}))) == \
+        ['Inception', 'The Dark Knight', 'Tenet']
+    assert popcount(index.filter({'people': ['tom cruise']})) == len(catalog)
+    
+    # Only exact or cued people filter; a sounds-like guess must not shrink a large catalog
+    cast = synthetic_cast()
+    large = pd.DataFrame({
+        'movie_title': [f"Movie {i}" for i in range(3000)],
+        'genres': ['Drama'] * 3000,
+        'directors': [cast[i % len(cast)].title() for i in range(3000)],
+        'actors': [f"{cast[(i * 7) % len(cast)].title()}, {cast[(i * 13) % len(cast)].title()}" for i in range(3000)],
+    })
+    large_index = CatalogIndex.from_dataframe(large)
+    large_analyzer = QueryAnalyzer()
+    large_analyzer.entity_recognizer.phonetic_indexes.append(
+        PhoneticIndex.from_names((name, CatalogGazetteer.PERSON) for name in cast))
+    for query, people, boost_people in [
+        ("new movies this week", [], []),
+        ("tom hank movies", [], ['tom hanks']),
+        ("dien vien tim walkr", ['tim walker'], []),
+    ]:
+        params = large_analyzer.analyze_query(query)['search_parameters']
+        print(f"   '{query}' -> people={params['people']} boost_people={params['boost_people']}")
+        assert params['people'] == people and params['boost_people'] == boost_people
+        expected = popcount(large_index.people_bitmap(people)) if people else len(large)
+        assert popcount(large_index.filter(params)) == expected
+    assert 0 < popcount(large_index.people_bitmap(['tom hanks'])) < len(large)
+    assert large_index.people_bitmap(['tom cruise']) is None
+    
+    facets = index.facets(index.filter({'genres': ['action']}))
+    print(f"   action facets: {facets}")
+    assert facets['total'] == 4
+    assert facets['genres']['action adventure'] == 4 and facets['genres']['science fiction fantasy'] == 2
+    assert facets['years'] == {1995: 1, 2008: 1, 2010: 1}
+
+    # The query picks the movies, sort_by only orders them
+    plots = ['A thief steals secrets by entering dreams', 'Batman faces the Joker in Gotham',
+             'Toys come to life when nobody watches', 'A detective hunts a crew of bank robbers',
+             'An agent inverts time to stop a war']
+    preprocessor = NLPPreprocessor()
+    vectorizer = TFIDFVectorizer()
+    vectorizer.fit([preprocessor.preprocess(plot) for plot in plots])
+    rows = index.rows(index.filter({'genres': ['action']}))
+    query = vectorizer.transform(preprocessor.preprocess("best movies about dreams, time and war"))
+    scores = np.array([vectorizer.cosine_similarity(query, vectorizer.transform(preprocessor.preprocess(plots[row])))
+                       for row in rows])
+    best = titles(rows[index.top_positions(rows, scores, 2, 'rating')])
+    print(f"   dreams, time and war by rating: {best}")
+    assert best == ['Inception', 'Tenet']
+    assert titles(rows[index.top_positions(rows, scores, 2)]) == ['Tenet', 'Inception']
+    # Sorting the filtered rows alone would return the best rated action movies instead
+    assert titles(index.sorted_rows(index.filter({'genres': ['action']}), 'rating', 2)) == ['The Dark Knight', 'Inception']
+
+
 def test_fuzzy_matching():
     """Test fuzzy matching"""
     print_section("6. FUZZY MATCHING")
@@ -234,6 +681,469 @@ def test_query_expansion():
         print(f"   Rewritten Queries:")
         for rew_query in result['rewritten_queries'][:3]:
             print(f"      - {rew_query}")
+    
+    # Year rewrites use the whole year
+    assert 'movies from 2024' in processor.query_rewriter.rewrite("action movies 2024", 'year_search')
+
+
+def test_spell_corrector():
+    """Test symmetric-deletion spell correction"""
+    print_section("7b. SPELL CORRECTION (SYMMETRIC DELETION INDEX)")
+    
+    corrector = SpellCorrector()
+    corrector.train([
+        ['christopher', 'nolan', 'movie', 'movie', 'movies', 'horror', 'comedy'],
+        ['phim', 'phim', 'hành', 'động', 'kinh', 'dị', 'hài'],
+    ])
+    
+    for word, expected in [
+        ("christpher", "christopher"),  # one deletion
+        ("chrstpher", "christopher"),   # two deletions
+        ("moive", "movie"),             # transposition
+        ("hanh", "hành"),               # Vietnamese diacritic
+        ("đông", "động"),
+        ("xyzxyz", "xyzxyz"),           # nothing close enough
+    ]:
+        corrected = corrector.correct(word)
+        print(f"\n✏️  {word!r} -> {corrected!r}  {corrector.suggestions(word)[:3]}")
+        assert corrected == expected
+    
+    # Ties on distance go to the more frequent word
+    assert corrector.suggestions("movi")[0] == ('movie', 1, 2)
+    assert corrector.correct_text("Chrstpher Nolan moive") == "christopher nolan movie"
+
+
+def test_spell_dictionary():
+    """Test the persisted spell dictionary built from the dataset and query logs"""
+    print_section("7c. SPELL DICTIONARY (STREAMED COUNTS, MEMORY-MAPPED)")
+
+    import json
+    from nlp_spell_dictionary import TermCounter, count_terms, build_dictionary, load_or_build_dictionary
+
+    # Rare words are pruned first; frequent ones keep exact counts
+    rare_words = [f"rare{first}{second}" for first in "abcdef" for second in "abcdef"]
+    counter = count_terms(["movie"] * 50 + rare_words, TermCounter(max_terms=20))
+    print(f"\n🧮 {len(counter)} terms kept after {counter.prunes} prunes")
+    assert counter.prunes > 0 and len(counter) <= 20
+    assert counter.most_common(1) == [('movie', 50)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dataset_path = os.path.join(tmp_dir, "movies.csv")
+        log_path = os.path.join(tmp_dir, "query_log.jsonl")
+        dictionary_path = os.path.join(tmp_dir, "spell_dictionary.bin")
+
+        pd.DataFrame({
+            'movie_title': ['Inception', 'Interstellar', 'The Dark Knight'],
+            'movie_info': ['A thief enters dreams in this movie', 'A movie about space travel', 'Batman movie'],
+            'directors': ['Christopher Nolan', 'Christopher Nolan', 'Christopher Nolan'],
+            'tomatometer_rating': [87, 73, 94],
+        }).to_csv(dataset_path, index=False)
+        with open(log_path, "w", encoding="utf-8") as f:
+            for query in ["phim kinh dị", "phim hài 2023", "phim kinh dị mới"]:
+                f.write(json.dumps({"query": query}) + "\n")
+
+        words = build_dictionary(dictionary_path, dataset_path, [log_path], min_count=2)
+        print(f"\n📚 {len(words)} words: {sorted(words)}")
+        assert 'movie' in words and 'nolan' in words and 'phim' in words
+        assert 'inception' not in words  # seen once
+        assert '2023' not in words
+
+        corrector = SpellCorrector.open(dictionary_path)
+        assert corrector.trained and 'movie' in corrector
+        assert corrector.frequency('movie') >= corrector.frequency('nolan') > 0
+        for word, expected in [("moive", "movie"), ("christpher", "christopher"), ("dị", "dị")]:
+            print(f"✏️  {word!r} -> {corrector.correct(word)!r}")
+            assert corrector.correct(word) == expected
+        assert corrector.correct_text("Moive nolan 2023") == "movie nolan 2023"
+
+        # An up-to-date dictionary is opened as it is, not rebuilt
+        modified = os.path.getmtime(dictionary_path)
+        assert load_or_build_dictionary(dictionary_path, dataset_path, [log_path]).trained
+        assert os.path.getmtime(dictionary_path) == modified
+
+        # Without a dictionary or anything to build one from, the corrector stays untrained
+        assert not SpellCorrector.from_dictionary(os.path.join(tmp_dir, "missing.bin")).trained
+        assert not load_or_build_dictionary(os.path.join(tmp_dir, "other.bin")).trained
+
+
+def test_phrase_translator():
+    """Test offline Vietnamese -> English phrase-table translation"""
+    print_section("7d. OFFLINE PHRASE TRANSLATION")
+
+    translator = default_phrase_translator()
+    print(f"\n📖 {len(translator)} phrases")
+
+    for query, expected in [
+        ("phim hành động", "action movie"),
+        ("phim kinh dị hàn quốc hay nhất", "best korean horror movie"),    # modifiers before the head
+        ("phim khoa học viễn tưởng", "scifi movie"),                       # longest phrase wins
+        ("fim ma thái lan", "thai ghost movie"),                           # voice error, then phrase
+        ("phim của đạo diễn christopher nolan", "movie by director christopher nolan"),
+        ("tom cruise action movies", "tom cruise action movies"),          # English is left alone
+    ]:
+        translated = translator.translate(query)
+        print(f"🌐 {query!r} -> {translated!r}")
+        assert translated == expected
+
+    # Only whole words match ('ma' is not found inside 'man')
+    assert translator.translate("iron man") == "iron man"
+
+    query_translator = QueryTranslator(backend='phrase')
+    assert query_translator.translate_to_english("tìm phim hành động mới nhất") == "latest action movie"
+    assert query_translator.translate_to_english("tìm phim avatar") == "avatar"
+
+
+def test_translation_cache():
+    """Test the on-disk translation cache shared between translators and processes"""
+    print_section("7e. TRANSLATION CACHE")
+
+    class CountingBackend:
+        def __init__(self):
+            self.calls = 0
+
+        def translate(self, text):
+            self.calls += 1
+            return f"translated {text.strip().lower()}"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "translation_cache.sqlite")
+        backend = CountingBackend()
+        translator = CachedTranslator(backend, TranslationCache(path), 'google')
+
+        # Re-cased and re-spaced queries share an entry
+        for query in ["phim hành động", "Phim  hành động ", "phim hành động"]:
+            translator.translate(query)
+        print(f"\n💾 {backend.calls} backend call(s), {translator.hits} hit(s)")
+        assert backend.calls == 1 and translator.hits == 2
+
+        # Another component (or worker process) opening the same file reuses the entry
+        other_backend = CountingBackend()
+        other = CachedTranslator(other_backend, TranslationCache(path), 'google')
+        assert other.translate("phim hành động") == "translated phim hành động"
+        assert other_backend.calls == 0
+        # Entries are per backend
+        assert TranslationCache(path).get('other', "phim hành động") is None
+
+        # Expired entries are misses
+        assert TranslationCache(path, ttl_seconds=-1).get('google', "phim hành động") is None
+
+        # The size cap keeps the newest entries
+        capped = TranslationCache(path, max_entries=3, prune_every=5)
+        for i in range(10):
+            capped.put('google', f"query {i}", f"translation {i}")
+        capped.prune()
+        print(f"   {len(capped)} entries after pruning to 3")
+        assert len(capped) == 3 and capped.get('google', "query 9") == "translation 9"
+
+
+def test_translation_client():
+    """Test the online translation client against a local stub server"""
+    print_section("7f. ONLINE TRANSLATION CLIENT (DEADLINE + CIRCUIT BREAKER)")
+
+    import json
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from urllib.parse import urlparse, parse_qs
+
+    # Answers like translate.googleapis.com; 'mode' simulates a slow or failing upstream
+    stub = {'mode': 'ok', 'requests': 0, 'connections': set()}
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+
+        def do_GET(self):
+            stub['requests'] += 1
+            stub['connections'].add(self.client_address)
+            if stub['mode'] == 'slow':
+                time.sleep(0.5)
+            status = 500 if stub['mode'] == 'error' else 200
+            text = parse_qs(urlparse(self.path).query)['q'][0]
+            language = 'vi' if 'phim' in text else 'en'
+            body = json.dumps([[[f"EN({text})", text]], None, language]).encode('utf-8')
+            try:
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except ConnectionError:
+                pass  # the client gave up after its deadline
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/translate_a/single"
+    client = AsyncTranslationClient(url=url, timeout=0.2, breaker=CircuitBreaker(failure_threshold=2, reset_seconds=0.3))
+
+    try:
+        # Detection and translation come from one request; English is returned as it is
+        assert client.translate("phim hay") == "EN(phim hay)"
+        assert client.translate("good movies") == "good movies"
+        assert client.translate_many(["phim một", "phim hai", "phim ba"]) == ["EN(phim một)", "EN(phim hai)", "EN(phim ba)"]
+        print(f"\n🌐 {stub['requests']} requests over {len(stub['connections'])} pooled connection(s)")
+        assert len(stub['connections']) <= 3 < stub['requests']
+
+        # A slow upstream costs at most the deadline, then the phrase translator answers
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            translator = CachedTranslator(client, TranslationCache(os.path.join(tmp_dir, "cache.sqlite")), 'google',
+                                          fallback=default_phrase_translator())
+            stub['mode'] = 'slow'
+            start = time.perf_counter()
+            assert translator.translate("phim kinh dị") == "horror movie"
+            elapsed = time.perf_counter() - start
+            print(f"⏱️  slow upstream answered by the fallback in {elapsed * 1000:.0f} ms")
+            assert elapsed < 0.45 and translator.fallbacks == 1
+
+            # The second failure opens the breaker; open calls do not reach the server
+            stub['mode'] = 'error'
+            assert translator.translate("phim hài") == "comedy movie"
+            assert client.breaker.state == CircuitBreaker.OPEN
+            requests = stub['requests']
+            for _ in range(5):
+                assert translator.translate("phim ma") == "ghost movie"
+            assert stub['requests'] == requests
+            assert len(translator.cache) == 0  # fallback translations are not cached
+
+            # After reset_seconds one trial call goes through and closes the breaker
+            stub['mode'] = 'ok'
+            time.sleep(0.35)
+            assert client.breaker.state == CircuitBreaker.HALF_OPEN
+            assert translator.translate("phim ma") == "EN(phim ma)"
+            assert client.breaker.state == CircuitBreaker.CLOSED
+            print(f"🔌 breaker closed again after {client.failures} failures")
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+
+
+def test_language_detection():
+    """Test local language detection and the translator skip for English"""
+    print_section("7g. LOCAL LANGUAGE DETECTION")
+
+    import time
+
+    detector = LanguageDetector()
+    cases = {
+        "tìm phim hành động mới nhất": 'vi',
+        "tim phim hanh dong moi nhat": 'vi',
+        "phim kinh di thai lan": 'vi',
+        "phimf hanhf ddoongj": 'vi',  # Telex typed without an IME
+        "Find action movies from 2024": 'en',
+        "movies like the dark knight": 'en',
+        "tom hanks": 'en',
+        "avatar": 'en',
+    }
+    for query, language in cases.items():
+        print(f"{detector.detect(query)}  {query}")
+        assert detector.detect(query) == language
+    assert telex_syllable("ddoongj") == "dong" and telex_syllable("movie") is None
+
+    start = time.perf_counter()
+    for _ in range(200):
+        for query in cases:
+            detector.detect(query)
+    per_query = (time.perf_counter() - start) / (200 * len(cases))
+    print(f"\n⚡ {per_query * 1e6:.1f}µs per detection")
+
+    # English queries never reach the translator
+    class CountingTranslator:
+        calls = 0
+
+        def translate(self, text):
+            CountingTranslator.calls += 1
+            return default_phrase_translator().translate(text)
+
+    translator = QueryTranslator(translator=CountingTranslator(), language_detector=detector)
+    processor = NLPQueryProcessor(query_translator=translator)
+    assert processor.process_query("horror movies")["corrected_query"] == "horror"
+    assert CountingTranslator.calls == 0
+    assert translator.translate_to_english("phim kinh dị") == "horror movie"
+    assert CountingTranslator.calls == 1
+
+
+def test_expansion_graph():
+    """Test the compiled, ranked query expansion graph"""
+    print_section("7h. COMPILED EXPANSION GRAPH")
+
+    expander = QueryExpander()
+    query = "good action movies"
+    expansions = expander.expand_all(query, max_total=5)
+    for expansion in expansions:
+        print(f"   - {expansion}")
+
+    # Original first, then the strongest edges; the cut is the same on every run
+    assert expansions == ["good action movies", "great action movies", "good adventure movies",
+                          "good action films", "excellent action movies"]
+    assert QueryExpander().expand_all(query, max_total=5) == expansions
+    assert expander.expand_all(query, max_total=3) == expansions[:3]
+
+    # Whole words only, and terms already in the query are not added again
+    assert expander.expand_all("Goodfellas") == ["Goodfellas"]
+    assert "horror movies scary" in expander.expand_all("horror movies scary")
+    assert all("scary scary" not in expansion for expansion in expander.expand_all("horror movies scary", 20))
+    assert expander.expand_with_hypernyms("horror movies") == ["horror movies"]
+    assert expander.expand_with_hyponyms("good movie")[1:3] == ["good movie excellent", "good movie action"]
+
+
+def test_completion_trie():
+    """Test top-k completions stored on trie nodes"""
+    print_section("7i. TOP-K COMPLETION TRIE")
+
+    trie = CompletionTrie(top_k=3)
+    for query, count in [("avatar", 5), ("avengers endgame", 9), ("alien", 2), ("action movies", 7),
+                         ("phim hành động", 4), ("phim hài", 6)]:
+        trie.add(query, count)
+
+    for prefix in ["a", "av", "phim h", "phim ha", "x"]:
+        print(f"   {prefix!r:10} -> {trie.complete(prefix)}")
+    assert trie.complete("a") == ["avengers endgame", "action movies", "avatar"]  # top 3 only
+    assert trie.complete("av", limit=1) == ["avengers endgame"]
+    assert trie.complete("  AV ") == ["avengers endgame", "avatar"]
+    assert trie.complete("phim ha") == ["phim hài", "phim hành động"]  # accents are optional
+    assert trie.complete("x") == []
+
+    # A query that climbs past the others enters every top list on its path
+    trie.add("alien", 10)
+    assert trie.complete("a") == ["alien", "avengers endgame", "action movies"]
+    assert trie.complete("al") == ["alien"]
+
+    # The suggester ranks history by frequency ahead of predefined suggestions
+    suggester = NLPQueryProcessor().query_suggester
+    for _ in range(3):
+        suggester.add_query("Horror Movies 2023")
+    assert suggester.get_suggestions("horror")[0] == "horror movies 2023"
+    assert "horror movies" in suggester.get_suggestions("hor")
+
+
+def test_query_log():
+    """Test the persistent query log and its decayed popularity"""
+    print_section("7j. PERSISTENT QUERY LOG")
+
+    import json
+    import threading
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "query_log.jsonl")
+        day = 86400
+
+        # Two workers share one log; each sees what the other recorded
+        worker_a = QueryLog(path, QuerySuggester(), half_life_seconds=7 * day)
+        worker_b = QueryLog(path, QuerySuggester(), half_life_seconds=7 * day)
+        threads = [threading.Thread(target=lambda: [worker_a.record("avatar") for _ in range(100)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        worker_b.record("avengers endgame", source='test')
+        worker_a.flush()
+        worker_b.flush()
+        worker_a.flush()
+        assert worker_a.records_read == worker_b.records_read == 401
+        assert worker_a.suggester.popular_queries == worker_b.suggester.popular_queries
+
+        # Records are plain JSON lines with a "query" key, readable by QueryLogReader
+        with open(path, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        assert len(records) == 401 and all('query' in record and 'ts' in record for record in records)
+
+        # A burst of searches three weeks ago ranks below a few searches today
+        now = records[-1]['ts']
+        with open(path, 'a', encoding='utf-8') as f:
+            for _ in range(5):
+                f.write(json.dumps({'query': 'avatar 2', 'ts': now + 21 * day}) + '\n')
+        worker_a.flush()
+        print(f"   av -> {worker_a.suggester.get_suggestions('av')}")
+        assert worker_a.suggester.get_suggestions('av')[:2] == ["avatar", "avatar 2"]
+        decayed = worker_a.popularity.decayed(worker_a.suggester.popular_queries["avatar"], now=now + 21 * day)
+        print(f"   'avatar' 400 searches, 3 half-lives later: {decayed:.1f}")
+        assert abs(decayed - 50) < 0.5
+
+        # Restart: the snapshot is loaded and only the log after it is replayed
+        worker_a.close()
+        worker_b.record("alien")
+        worker_b.close()
+        restarted = QueryLog(path, QuerySuggester(), half_life_seconds=7 * day)
+        restarted.start()
+        restarted.close()
+        print(f"   restart replayed {restarted.records_read} record(s) after the snapshot")
+        assert restarted.records_read <= 1
+        assert restarted.suggester.get_suggestions('av') == ["avatar", "avatar 2", "avengers endgame"]
+        assert "alien" in restarted.suggester.get_suggestions('al')
+
+
+def test_related_queries():
+    """Test related queries from the inverted token index"""
+    print_section("7k. RELATED QUERIES (INVERTED INDEX)")
+
+    suggester = QuerySuggester()
+    for query, weight in [("horror movies 2023", 3), ("best horror films", 5), ("comedy movies", 2),
+                          ("horror comedy", 1), ("scary horror movies", 1), ("avatar", 8)]:
+        suggester.add_query(query, weight)
+    suggester.add_query("Horror Movies 2023")  # seen again: counted, not indexed twice
+    assert suggester.postings["horror"].count("horror movies 2023") == 1
+
+    related = suggester.get_related_queries("horror movies")
+    print(f"   horror movies -> {related}")
+    # Two shared tokens beat one; equal overlap goes to the more popular query
+    assert related == ["horror movies 2023", "scary horror movies", "best horror films", "comedy movies", "horror comedy"]
+    assert suggester.get_related_queries("horror movies 2023", max_related=2) == ["scary horror movies", "best horror films"]
+    assert suggester.get_related_queries("tom hanks") == []
+
+    # Only the incoming query is preprocessed, however many queries are stored
+    calls = []
+    preprocess = suggester.preprocessor.preprocess
+    suggester.preprocessor.preprocess = lambda text, *args, **kwargs: calls.append(text) or preprocess(text, *args, **kwargs)
+    try:
+        suggester.get_related_queries("comedy")
+    finally:
+        suggester.preprocessor.preprocess = preprocess
+    assert calls == ["comedy"]
+
+
+def test_title_typeahead():
+    """Test fuzzy-prefix completion of catalog titles"""
+    print_section("7l. CATALOG TITLE TYPEAHEAD")
+
+    import time
+
+    catalog = pd.DataFrame({
+        'movie_title': ['Avatar', 'Avatar: The Way of Water', 'The Avengers', 'Amélie', 'Halloween', 'Halloween',
+                        'The Dark Knight', 'The Dark Knight Rises', 'Spider-Man', None],
+        'tmdb_popularity': [120.5, 300.2, 95.0, 20.1, 50.0, 60.0, 80.7, 70.2, 90.0, 10.0],
+        'original_release_date': ['2009-12-18', '2022-12-16', '2012-05-04', '2001-04-25', '1978-10-25',
+                                  '2018-10-19', '2008-07-18', '2012-07-20', '2002-05-03', None],
+    })
+    typeahead = TitleTypeahead.from_dataframe(catalog, scan_limit=2)  # small limit so some prefixes are precomputed
+    assert "the " in typeahead.heavy and "the d" not in typeahead.heavy
+
+    def titles(text, limit=5):
+        return [suggestion['title'] for suggestion in typeahead.suggest(text, limit)]
+
+    for text in ["ava", "avatr", "the dark knigt", "halow", "spiderman", "ame"]:
+        print(f"   {text!r:18} -> {titles(text)}")
+
+    # Exact completions by popularity, then prefixes one edit away
+    assert titles("ava") == ["Avatar: The Way of Water", "Avatar"]
+    assert titles("avatr") == ["Avatar: The Way of Water", "Avatar"]  # deletion
+    assert titles("the dark knigt") == ["The Dark Knight", "The Dark Knight Rises"]  # deletion
+    assert titles("the dakr") == ["The Dark Knight", "The Dark Knight Rises"]  # swap
+    assert titles("spiderman") == ["Spider-Man"]  # missing space
+    assert titles("ame") == ["Amélie"]  # accents and punctuation are ignored
+    assert titles("the ", limit=2) == ["The Avengers", "The Dark Knight"]
+    suggestions = typeahead.suggest("av")
+    assert [s['exact'] for s in suggestions] == [True, True] and suggestions[0]['year'] == 2022
+    assert [s['year'] for s in typeahead.suggest("halloween")] == [2018, 1978]
+    assert typeahead.suggest("") == [] and titles("zz") == []
+    assert titles("xa") == []  # no fuzzy matching below three letters
+
+    start = time.perf_counter()
+    for _ in range(200):
+        typeahead.suggest("the dark knigt")
+    print(f"\n⚡ {(time.perf_counter() - start) / 200 * 1000:.3f} ms per fuzzy lookup")
 
 
 def test_complete_pipeline():
@@ -281,6 +1191,28 @@ def test_complete_pipeline():
     print(f"   Sort By: {analysis['search_parameters']['sort_by']}")
 
 
+def test_component_registry():
+    """Test that service components share one preprocessor and entity recognizer"""
+    print_section("8b. SHARED COMPONENT REGISTRY")
+    
+    registry = default_registry()
+    analyzer = registry.get('query_analyzer')
+    matcher = registry.get('semantic_matcher')
+    processor = registry.get('query_processor')
+    preprocessor = registry.get('preprocessor')
+    
+    for name, seconds in registry.build_seconds.items():
+        print(f"   {name:20} {seconds * 1000:6.2f} ms")
+    
+    assert registry.get('query_analyzer') is analyzer
+    assert matcher.query_analyzer is analyzer
+    assert analyzer.entity_recognizer is analyzer.feature_extractor.entity_recognizer
+    assert analyzer.entity_recognizer.preprocessor is preprocessor
+    assert processor.query_rewriter.expander is processor.query_expander
+    assert registry.get('fuzzy_matcher').preprocessor is preprocessor
+    assert analyzer.analyze_query("phim hành động 2023")['query_type'] == 'genre_year_search'
+
+
 def main():
     """Run all tests"""
     print("\n" + "🚀 "*35)
@@ -292,11 +1224,36 @@ def main():
         test_preprocessing()
         test_tfidf()
         test_intent_classification()
+        test_naive_bayes_batch()
+        test_svm_batch()
+        test_intent_model_artifact()
+        test_intent_classify_batch()
+        test_intent_cascade()
+        test_online_intent_learning()
         test_ner()
+        test_rule_engine()
+        test_gazetteer()
+        test_catalog_gazetteer()
+        test_phonetic_index()
+        test_lazy_search_features()
         test_similarity()
+        test_semantic_batch_scoring()
+        test_catalog_filters()
         test_fuzzy_matching()
         test_query_expansion()
+        test_spell_corrector()
+        test_spell_dictionary()
+        test_phrase_translator()
+        test_translation_cache()
+        test_translation_client()
+        test_language_detection()
+        test_expansion_graph()
+        test_completion_trie()
+        test_query_log()
+        test_related_queries()
+        test_title_typeahead()
         test_complete_pipeline()
+        test_component_registry()
         
         print("\n" + "✅ "*35)
         print("  ALL TESTS COMPLETED SUCCESSFULLY!")